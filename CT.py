@@ -1,29 +1,23 @@
 #!/usr/bin/env python3
 # Choclotube Optimizado - Versión Mejorada
-import os, re, threading, signal, sys, base64, subprocess, platform
-import nest_asyncio; nest_asyncio.apply()
-import yt_dlp
-import webview
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-from urllib.parse import urlparse, parse_qs
-
-# Ocultar terminal al abrir la ventana (solo Windows)
-if platform.system() == "Windows":
-    import ctypes
-    ctypes.windll.user32.ShowWindow(ctypes.windll.kernel32.GetConsoleWindow(), 0)
+import os, re, threading, signal, sys, subprocess, platform, asyncio, sqlite3, time, json, gzip, hashlib
+import argparse, itertools, base64, random, bisect, uuid, logging, logging.handlers, contextvars, atexit
+import queue, multiprocessing, heapq, types, shutil, abc
+from collections import OrderedDict, deque
+from contextlib import contextmanager, asynccontextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Verificar e instalar dependencias necesarias
+# Verificar e instalar dependencias necesarias. Sólo con --install-deps: al
+# importar el módulo (uvicorn CT:app) no se toca pip ni se importa nada de más.
 def install_dependencies():
     required_packages = {
         'yt_dlp': 'yt-dlp',
         'webview': 'pywebview',
         'fastapi': 'fastapi',
         'uvicorn': 'uvicorn',
-        'nest_asyncio': 'nest-asyncio'
+        'httpx': 'httpx'
     }
     
     for module, package in required_packages.items():
@@ -33,12 +27,173 @@ def install_dependencies():
             print(f"Instalando {package}...")
             subprocess.check_call([sys.executable, "-m", "pip", "install", package])
 
-# Instalar dependencias antes de continuar
-install_dependencies()
+if __name__ == "__main__" and "--install-deps" in sys.argv:
+    install_dependencies()
+
+# Ejecutado como script, este módulo también es "CT": así lo que importe CT
+# (uvicorn con CT:app, los benchmarks) no lo vuelve a cargar por separado
+if __name__ == "__main__":
+    sys.modules.setdefault("CT", sys.modules[__name__])
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response, FileResponse
+from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.cors import CORSMiddleware
+import uvicorn
+import httpx
+from urllib.parse import urlparse, parse_qs
+
+try:
+    import brotli  # Opcional: variantes .br de los assets
+except ImportError:
+    brotli = None
+
+# yt_dlp trae cientos de extractores y tarda en importarse: se carga recién en
+# la primera extracción (o en segundo plano al arrancar, ver on_startup), así
+# el servidor puede atender "/" enseguida
+_yt_dlp = None
+_yt_dlp_lock = threading.Lock()
+
+def load_yt_dlp():
+    global _yt_dlp
+    if _yt_dlp is None:
+        with _yt_dlp_lock:
+            if _yt_dlp is None:
+                import yt_dlp
+                _yt_dlp = yt_dlp
+    return _yt_dlp
+
+# Registro (logging) estructurado: los mensajes se encolan y un hilo aparte los
+# escribe, así una consola lenta (o escondida, en Windows) no frena las
+# peticiones. Cada línea lleva el ID de la petición que la originó; los
+# mensajes de depuración se pueden muestrear y tienen un tope por segundo.
+LOG_LEVEL = os.environ.get("CHOCLOTUBE_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("CHOCLOTUBE_LOG_FORMAT", "text")  # text | json
+LOG_FILE = os.environ.get("CHOCLOTUBE_LOG_FILE")
+LOG_DEBUG_SAMPLE = float(os.environ.get("CHOCLOTUBE_LOG_DEBUG_SAMPLE", "1"))
+LOG_DEBUG_RATE = int(os.environ.get("CHOCLOTUBE_LOG_DEBUG_RATE", "50"))
+
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+# No calcular datos que el formato no usa: archivo/línea de quien loguea (es
+# lo más caro de armar cada registro) ni proceso (ver "Optimization" en la
+# documentación de logging)
+logging._srcfile = None
+logging.logProcesses = False
+logging.logMultiprocessing = False
+logging.logThreads = False
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+class DebugSampler:
+    # Deja pasar una fracción de los DEBUG y como mucho `rate` por segundo por
+    # cada mensaje (se agrupan por plantilla, sin formatear). También loguean
+    # los hilos del executor: las ventanas y `dropped` van con lock.
+    def __init__(self, sample: float, rate: int):
+        self.sample = sample
+        self.rate = rate
+        self._windows = {}
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def allow(self, msg) -> bool:
+        with self._lock:
+            if self.sample < 1 and self._random.random() >= self.sample:
+                self.dropped += 1
+                return False
+            if self.rate > 0:
+                second = int(time.monotonic())
+                window = self._windows.get(msg)
+                if window is None or window[0] != second:
+                    if len(self._windows) > 1024:
+                        self._windows.clear()
+                    window = self._windows[msg] = [second, 0]
+                window[1] += 1
+                if window[1] > self.rate:
+                    self.dropped += 1
+                    return False
+            return True
+
+class SampledLogger(logging.Logger):
+    # El muestreo se decide antes de armar el LogRecord (lo más caro de cada
+    # mensaje): un DEBUG descartado sólo cuesta esta llamada
+    def __init__(self, name: str, sampler: DebugSampler):
+        super().__init__(name)
+        self.sampler = sampler
+
+    def debug(self, msg, *args, **kwargs):
+        if self.isEnabledFor(logging.DEBUG) and self.sampler.allow(msg):
+            self._log(logging.DEBUG, msg, args, **kwargs)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # QueueHandler.prepare arma el mensaje y formatea la línea entera (fecha
+    # incluida) en el hilo que loguea, y después copia el registro. Acá se
+    # encola tal cual y todo eso lo hace el hilo del listener: por eso los
+    # argumentos de un mensaje no tienen que modificarse después de loguearlo.
+    def prepare(self, record):
+        return record
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def setup_logging(name: str = "choclotube", level: str = LOG_LEVEL, stream=None,
+                  sample: float = LOG_DEBUG_SAMPLE, rate: int = LOG_DEBUG_RATE):
+    if LOG_FILE and stream is None:
+        handler = logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
+    else:
+        handler = logging.StreamHandler(stream or sys.stderr)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(message)s"))
+    listener = logging.handlers.QueueListener(queue.SimpleQueue(), handler)
+    queue_handler = DeferredQueueHandler(listener.queue)
+    # El ID de la petición se toma en el hilo que loguea, antes de encolar
+    queue_handler.addFilter(RequestIdFilter())
+    sampler = DebugSampler(sample, rate)
+    # Fuera del árbol de logging.getLogger: nadie más lo pide por nombre
+    logger = SampledLogger(name, sampler)
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    listener.start()
+    atexit.register(listener.stop)
+    return logger, sampler, listener
+
+log, log_sampler, log_listener = setup_logging()
 
 # Configuración inicial
-os.makedirs("downloads", exist_ok=True)
-app = FastAPI()
+os.makedirs("downloads", exist_ok=True)  # También la usa la caché local de audio
+DATA_DIR = os.environ.get("CHOCLOTUBE_DATA_DIR", "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+# Procesos del servidor (ver run_server). Con `--workers`, run_server lo deja
+# en el entorno para que cada worker sepa que no está solo
+SERVER_WORKERS = int(os.environ.get("CHOCLOTUBE_WORKERS", "1"))
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Arranque y apagado del servidor: on_startup y on_shutdown, al final del
+    # archivo, junto a todo lo que ponen en marcha y cierran
+    on_startup()
+    try:
+        yield
+    finally:
+        await on_shutdown()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -47,20 +202,124 @@ app.add_middleware(
     allow_headers=["*"]
 )
 app.mount("/downloads", StaticFiles(directory="downloads"), name="downloads")
-app.mount("/static", StaticFiles(directory="."), name="static")  # Para servir archivos locales
 
-# Convertir logo.jpg a base64 para el favicon
-def get_image_base64(image_path):
+# Asigna a cada petición un ID de correlación (o respeta el X-Request-ID que
+# mande el cliente) y lo devuelve en la respuesta
+class RequestIdMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rid = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        if not re.match(r"^[\w-]{1,64}$", rid):
+            rid = uuid.uuid4().hex[:12]
+        token = request_id_var.set(rid)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", rid.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
+
+app.add_middleware(RequestIdMiddleware)
+
+# Frontend como archivos estáticos con hash en el nombre: static/index.html es
+# un shell chico y app.css, app.js y las imágenes se sirven desde /assets con
+# ETag fuerte, Cache-Control immutable y variantes gzip/brotli ya comprimidas.
+# Las imágenes no se leen al arrancar: su hash sale de tamaño y fecha.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+ASSET_SOURCES = {
+    # Primero las imágenes: el CSS y el HTML apuntan a ellas
+    "logo.jpg": os.path.join(BASE_DIR, "logo.jpg"),
+    "fondo.jpg": os.path.join(BASE_DIR, "fondo.jpg"),
+    "app.css": os.path.join(STATIC_DIR, "app.css"),
+    "virtual-list.js": os.path.join(STATIC_DIR, "virtual-list.js"),
+    "playlist-model.js": os.path.join(STATIC_DIR, "playlist-model.js"),
+    "app.js": os.path.join(STATIC_DIR, "app.js"),
+}
+ASSET_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".jpg": "image/jpeg",
+}
+TEXT_ASSETS = {".css", ".js", ".html"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+def compress_variants(body: bytes) -> dict:
+    variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return variants
+
+def build_assets():
+    assets, hashed = {}, {}
+    for name, path in ASSET_SOURCES.items():
+        stem, ext = os.path.splitext(name)
+        try:
+            if ext in TEXT_ASSETS:
+                with open(path, encoding="utf-8") as f:
+                    text = f.read()
+                # Reescribir /assets/<nombre> a la versión con hash
+                for ref, entry in assets.items():
+                    text = text.replace(f"/assets/{ref}", entry["url"])
+                body = text.encode("utf-8")
+                digest = hashlib.sha256(body).hexdigest()[:12]
+                entry = {"variants": compress_variants(body)}
+            else:
+                st = os.stat(path)
+                digest = hashlib.sha256(f"{name}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:12]
+                entry = {"path": path}
+        except OSError as e:
+            log.error("Error al procesar el archivo %s: %s", path, e)
+            continue
+        entry.update({
+            "etag": f'"{digest}"',
+            "url": f"/assets/{stem}.{digest}{ext}",
+            "content_type": ASSET_TYPES.get(ext, "application/octet-stream"),
+        })
+        assets[name] = entry
+        hashed[f"{stem}.{digest}{ext}"] = entry
+    
     try:
-        with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            return f"data:image/jpeg;base64,{encoded_string}"
-    except Exception as e:
-        print(f"Error al procesar la imagen {image_path}: {e}")
-        return ""
+        with open(os.path.join(STATIC_DIR, "index.html"), encoding="utf-8") as f:
+            shell = f.read()
+    except OSError as e:
+        log.error("Error al procesar el archivo index.html: %s", e)
+        shell = "<!DOCTYPE html><title>Choclotube</title>"
+    for ref, entry in assets.items():
+        shell = shell.replace(f"/assets/{ref}", entry["url"])
+    body = shell.encode("utf-8")
+    index_entry = {
+        "variants": compress_variants(body),
+        "etag": f'"{hashlib.sha256(body).hexdigest()[:12]}"',
+        "content_type": ASSET_TYPES[".html"],
+    }
+    return assets, hashed, index_entry
 
-# Obtener la imagen del logo en base64
-logo_image = get_image_base64("logo.jpg")
+ASSETS, HASHED_ASSETS, INDEX_PAGE = build_assets()
+
+def asset_response(entry: dict, request: Request, cache_control: str):
+    headers = {"ETag": entry["etag"], "Cache-Control": cache_control}
+    if entry["etag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    if "path" in entry:
+        return FileResponse(entry["path"], media_type=entry["content_type"], headers=headers)
+    
+    accepted = {token.split(";")[0].strip() for token in request.headers.get("accept-encoding", "").lower().split(",")}
+    headers["Vary"] = "Accept-Encoding"
+    for encoding in ("br", "gzip"):
+        if encoding in accepted and encoding in entry["variants"]:
+            headers["Content-Encoding"] = encoding
+            return Response(entry["variants"][encoding], media_type=entry["content_type"], headers=headers)
+    return Response(entry["variants"]["identity"], media_type=entry["content_type"], headers=headers)
 
 # Funciones auxiliares
 def fmt(t): 
@@ -96,1334 +355,2771 @@ def sanitize(raw: str) -> str:
     
     raise ValueError(f"ID de YouTube no detectado en: {raw}")
 
-def ydl_get(url: str, opts: dict):
-    with yt_dlp.YoutubeDL(opts) as ydl:
-        return ydl.extract_info(url, download=False)
-
-HTML = f"""<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Choclotube</title>
-    <link rel="icon" type="image/jpeg" href="{logo_image}">
-    <style>
-        :root {{
-            --primary: #FFD700;         /* Amarillo maíz */
-            --primary-light: #FFEA00;   /* Amarillo más claro */
-            --primary-dark: #D4AF37;    /* Amarillo más oscuro para contraste */
-            --secondary: #4CAF50;       /* Verde hojas de maíz */
-            --secondary-light: #81C784; /* Verde más claro */
-            --background: rgba(0, 0, 0, 0.85);      /* Fondo negro con transparencia */
-            --surface: rgba(26, 26, 26, 0.8);         /* Gris muy oscuro con transparencia */
-            --surface-alt: rgba(45, 45, 45, 0.8);     /* Gris oscuro con transparencia */
-            --text: #e0e0e0;            /* Texto gris claro */
-            --text-secondary: #aaaaaa;  /* Texto secundario */
-            --text-on-yellow: #333333;  /* Texto sobre fondo amarillo */
-            --text-on-green: #FFFFFF;   /* Texto sobre fondo verde */
-            --error: #FFA000;           /* Amarillo oscuro para errores */
-            --success: #4CAF50;         /* Verde para éxito */
-        }}
-        
-        * {{
-            box-sizing: border-box;
-            margin: 0;
-            padding: 0;
-        }}
-        
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background: var(--background);
-            color: var(--text);
-            padding: 20px;
-            margin: 0;
-            display: flex;
-            justify-content: center;
-            min-height: 100vh;
-            position: relative;
-            padding-bottom: 80px; /* Espacio para el logo */
-            user-select: text; /* Permitir selección de texto */
-        }}
-        
-        /* Imagen de fondo con transparencia */
-        body::before {{
-            content: "";
-            background-image: url("/static/fondo.jpg");
-            background-size: cover;
-            background-position: center;
-            background-repeat: no-repeat;
-            background-attachment: fixed;
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            z-index: -1;
-            opacity: 0.2; /* Ajusta la transparencia según sea necesario */
-        }}
-        
-        .logo-container {{
-            position: fixed;
-            bottom: 20px;
-            left: 20px;
-            z-index: 1000;
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            background: var(--surface);
-            padding: 10px 15px;
-            border-radius: 16px;
-            box-shadow: 0 4px 15px rgba(255, 215, 0, 0.3);
-            transition: transform 0.3s ease;
-        }}
-        
-        .logo-container:hover {{
-            transform: translateY(-5px);
-        }}
-        
-        .logo {{
-            height: 50px;
-            width: auto;
-            border-radius: 8px;
-            box-shadow: 0 2px 8px rgba(0, 0, 0, 0.3);
-            transition: transform 0.3s ease;
-        }}
-        
-        .logo:hover {{
-            transform: scale(1.05);
-        }}
-        
-        .logo-text {{
-            font-size: 20px;
-            font-weight: 700;
-            color: var(--primary-light);
-            text-shadow: 0 2px 5px rgba(255, 215, 0, 0.3);
-        }}
-        
-        .container {{
-            display: flex;
-            gap: 25px;
-            max-width: 1400px;
-            width: 100%;
-        }}
-        
-        .column {{
-            flex: 1;
-            display: flex;
-            flex-direction: column;
-            gap: 20px;
-        }}
-        
-        .panel {{
-            background: var(--surface);
-            border-radius: 16px;
-            padding: 20px;
-            box-shadow: 0 4px 20px rgba(0, 0, 0, 0.3);
-            transition: transform 0.3s ease, box-shadow 0.3s ease;
-        }}
-        
-        .panel:hover {{
-            transform: translateY(-5px);
-            box-shadow: 0 8px 30px rgba(0, 0, 0, 0.4);
-        }}
-        
-        .title {{
-            color: var(--primary-light);
-            font-weight: 600;
-            font-size: 18px;
-            margin-bottom: 15px;
-            padding-bottom: 10px;
-            border-bottom: 2px solid var(--surface-alt);
-        }}
-        
-        .playlist {{
-            max-height: 400px;
-            overflow-y: auto;
-            border-radius: 12px;
-            background: var(--surface-alt);
-            padding: 0;
-            margin: 0;
-        }}
-        
-        .track {{
-            padding: 15px;
-            border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-            cursor: pointer;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            color: var(--text);
-            transition: background 0.2s ease;
-        }}
-        
-        .track:hover {{
-            background: rgba(255, 215, 0, 0.2);
-        }}
-        
-        .track.playing {{
-            background: var(--primary);
-            font-weight: 600;
-            color: var(--text-on-yellow);
-        }}
-        
-        .track.next {{
-            background: var(--secondary);
-            font-weight: 600;
-            color: var(--text-on-green);
-        }}
-        
-        .track.loading {{
-            background: var(--secondary-light);
-            font-weight: 600;
-            color: var(--text-on-green);
-        }}
-        
-        .controls {{
-            display: flex;
-            justify-content: center;
-            gap: 15px;
-            margin-top: 20px;
-        }}
-        
-        .controls button {{
-            font-size: 20px;
-            padding: 12px 20px;
-            cursor: pointer;
-            background: var(--surface-alt);
-            border: none;
-            border-radius: 50%;
-            color: var(--text);
-            width: 60px;
-            height: 60px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            transition: all 0.3s ease;
-            box-shadow: 0 2px 10px rgba(0, 0, 0, 0.2);
-        }}
-        
-        .controls button:hover {{
-            background: var(--primary);
-            color: var(--text-on-yellow);
-            transform: scale(1.1);
-        }}
-        
-        textarea {{
-            width: 100%;
-            height: 120px;
-            resize: vertical;
-            font-family: 'Courier', monospace, console;
-            font-size: 14px;
-            background: var(--surface-alt);
-            color: var(--text);
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            border-radius: 12px;
-            padding: 15px;
-            box-sizing: border-box;
-            transition: border 0.3s ease;
-        }}
-        
-        textarea:focus {{
-            outline: none;
-            border: 1px solid var(--primary-light);
-        }}
-        
-        .add-button {{
-            font-size: 16px;
-            padding: 15px;
-            margin-top: 15px;
-            cursor: pointer;
-            background: var(--secondary);
-            color: var(--text-on-yellow);
-            border: none;
-            border-radius: 12px;
-            width: 100%;
-            font-weight: 500;
-            transition: all 0.3s ease;
-            box-shadow: 0 4px 15px rgba(255, 215, 0, 0.3);
-        }}
-        
-        .add-button:hover {{
-            background: var(--primary-light);
-            transform: translateY(-3px);
-            box-shadow: 0 6px 20px rgba(255, 215, 0, 0.4);
-        }}
-        
-        .search-box {{
-            display: flex;
-            gap: 10px;
-            margin-bottom: 15px;
-        }}
-        
-        .search-box input {{
-            flex: 1;
-            padding: 12px 15px;
-            font-size: 16px;
-            background: var(--surface-alt);
-            color: var(--text);
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            border-radius: 12px;
-            transition: border 0.3s ease;
-        }}
-        
-        .search-box input:focus {{
-            outline: none;
-            border: 1px solid var(--primary-light);
-        }}
-        
-        .search-box button {{
-            padding: 12px 20px;
-            font-size: 16px;
-            cursor: pointer;
-            background: var(--secondary);
-            color: var(--text-on-yellow);
-            border: none;
-            border-radius: 12px;
-            font-weight: 500;
-            transition: all 0.3s ease;
-        }}
-        
-        .search-box button:hover {{
-            background: var(--primary-light);
-        }}
-        
-        .results {{
-            max-height: 300px;
-            overflow-y: auto;
-            border-radius: 12px;
-            background: var(--surface-alt);
-        }}
-        
-        .result-item {{
-            display: flex;
-            align-items: center;
-            padding: 12px;
-            border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-            gap: 15px;
-            transition: background 0.2s ease;
-        }}
-        
-        .result-item:hover {{
-            background: rgba(255, 215, 0, 0.1);
-        }}
-        
-        .result-item img {{
-            width: 80px;
-            height: 45px;
-            object-fit: cover;
-            border-radius: 8px;
-            flex-shrink: 0;
-        }}
-        
-        .result-info {{
-            flex: 1;
-            overflow: hidden;
-        }}
-        
-        .result-title {{
-            font-size: 15px;
-            font-weight: 500;
-            white-space: nowrap;
-            overflow: hidden;
-            text-overflow: ellipsis;
-            margin-bottom: 5px;
-            color: var(--text);
-        }}
-        
-        .result-duration {{
-            font-size: 13px;
-            color: var(--text-secondary);
-        }}
-        
-        .result-add {{
-            background: var(--secondary);
-            color: var(--text-on-green);
-            border: none;
-            border-radius: 8px;
-            padding: 8px 12px;
-            cursor: pointer;
-            font-size: 14px;
-            font-weight: 500;
-            transition: all 0.3s ease;
-        }}
-        
-        .result-add:hover {{
-            background: var(--secondary-light);
-            transform: scale(1.05);
-        }}
-        
-        .current-info {{
-            margin-top: 20px;
-        }}
-        
-        #audioPlayer {{
-            width: 100%;
-            margin-top: 20px;
-            border-radius: 12px;
-            height: 40px;
-        }}
-        
-        .progress-container {{
-            width: 100%;
-            height: 12px;
-            background: var(--surface-alt);
-            border-radius: 10px;
-            margin: 20px 0;
-            position: relative;
-            cursor: pointer;
-            overflow: hidden;
-        }}
-        
-        .progress-bar {{
-            height: 100%;
-            background: var(--primary);
-            border-radius: 10px;
-            width: 0%;
-            transition: width 0.3s ease;
-        }}
-        
-        .time-info {{
-            display: flex;
-            justify-content: space-between;
-            font-size: 16px;
-            margin-bottom: 15px;
-            font-weight: 400;
-            color: var(--text);
-        }}
-        
-        .delete-btn {{
-            background: var(--error);
-            color: var(--text-on-yellow);
-            border: none;
-            border-radius: 8px;
-            padding: 5px 8px;
-            cursor: pointer;
-            font-size: 14px;
-            margin-left: 10px;
-            transition: all 0.3s ease;
-        }}
-        
-        .delete-btn:hover {{
-            background: var(--primary-dark);
-            transform: scale(1.1);
-        }}
-        
-        .loading {{
-            text-align: center;
-            padding: 30px;
-            color: var(--text-secondary);
-            font-size: 16px;
-        }}
-        
-        .now-playing {{
-            background: var(--surface-alt);
-            border-radius: 16px;
-            padding: 20px;
-            margin-bottom: 20px;
-        }}
-        
-        .now-playing-title {{
-            font-size: 24px;
-            font-weight: 600;
-            margin-bottom: 15px;
-            color: var(--primary-light);
-        }}
-        
-        .now-playing-time {{
-            font-size: 20px;
-            font-weight: 700;
-            color: var(--secondary);
-            text-align: center;
-            margin: 20px 0;
-        }}
-        
-        .next-track {{
-            background: var(--surface-alt);
-            border-radius: 16px;
-            padding: 20px;
-        }}
-        
-        .next-track-title {{
-            font-size: 20px;
-            font-weight: 600;
-            margin-bottom: 10px;
-            color: var(--primary-light);
-        }}
-        
-        .next-track-info {{
-            font-size: 18px;
-            color: var(--text);
-        }}
-        
-        .time-remaining {{
-            font-size: 32px;
-            font-weight: 700;
-            color: var(--secondary);
-            text-align: center;
-            margin: 20px 0;
-        }}
-        
-        /* Menú contextual */
-        .context-menu {{
-            display: none;
-            position: fixed;
-            background: var(--surface);
-            border-radius: 8px;
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.3);
-            z-index: 1000;
-            padding: 5px 0;
-            min-width: 150px;
-        }}
-        
-        .context-menu-item {{
-            padding: 8px 20px;
-            cursor: pointer;
-            color: var(--text);
-            transition: background 0.2s ease;
-        }}
-        
-        .context-menu-item:hover {{
-            background: var(--primary);
-            color: var(--text-on-yellow);
-        }}
-        
-        /* Responsive Design */
-        @media (max-width: 1200px) {{
-            .container {{
-                flex-direction: column;
-            }}
-        }}
-        
-        @media (max-width: 768px) {{
-            .container {{
-                padding: 10px;
-            }}
-            
-            .logo-container {{
-                bottom: 10px;
-                left: 10px;
-                padding: 8px 12px;
-            }}
-            
-            .logo {{
-                height: 40px;
-            }}
-            
-            .logo-text {{
-                font-size: 16px;
-            }}
-            
-            .panel {{
-                padding: 15px;
-            }}
-            
-            .controls button {{
-                width: 50px;
-                height: 50px;
-                font-size: 18px;
-            }}
-            
-            .now-playing-title {{
-                font-size: 20px;
-            }}
-            
-            .now-playing-time {{
-                font-size: 20px;
-            }}
-            
-            .time-remaining {{
-                font-size: 20px;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <!-- Columna Izquierda: Búsqueda y Agregador -->
-        <div class="column">
-            <div class="panel">
-                <div class="title">Buscar en YT</div>
-                <div class="search-box">
-                    <input id="searchInput" placeholder="Buscar canciones..." onkeypress="if(event.key==='Enter') search()">
-                    <button onclick="search()">Buscar</button>
-                </div>
-                <div id="searchResults" class="results" style="display:none"></div>
-            </div>
-            
-            <div class="panel">
-                <div class="title">Pegar Enlaces</div>
-                <textarea id="url" placeholder="Podés pegar un choclo de enlaces..."></textarea>
-                <button class="add-button" onclick="add()">Agregar</button>
-            </div>
-        </div>
-        
-        <!-- Columna Derecha: Lista y Reproductor -->
-        <div class="column">
-            <div class="panel">
-                <div class="title">Lista de Reproducción</div>
-                <ul id="sortable" class="playlist"></ul>
-                <div class="time-info">
-                    <span id="totaltime">Total: --:--</span>
-                    <span id="lefttime">Restante: --:--</span>
-                </div>
-                <div class="controls">
-                    <button onclick="prev()">⏮️</button>
-                    <button onclick="togglePlay()">⏯️</button>
-                    <button onclick="stop()">⏹️</button>
-                    <button onclick="next()">⏭️</button>
-                </div>
-            </div>
-            
-            <div class="now-playing">
-                <div class="title">Reproducción Actual</div>
-                <div id="current" class="now-playing-title">Ninguna pista</div>
-                <div id="timeRemaining" class="time-remaining">--:--</div>
-                <div class="progress-container" id="progress-container">
-                    <div class="progress-bar" id="progress-bar"></div>
-                </div>
-                <audio id="audioPlayer" controls></audio>
-            </div>
-            
-            <div class="next-track">
-                <div class="title">Pista Siguiente</div>
-                <div id="nexttrack" class="next-track-info">Ninguna pista seleccionada</div>
-            </div>
-        </div>
-    </div>
-
-    <div class="logo-container">
-        <img src="/static/logo.jpg" alt="Choclotube Logo" class="logo">
-        <div class="logo-text">Choclotube</div>
-    </div>
-    
-    <!-- Menú contextual para copiar/pegar -->
-    <div id="contextMenu" class="context-menu">
-        <div class="context-menu-item" id="copyOption">Copiar</div>
-        <div class="context-menu-item" id="pasteOption">Pegar</div>
-    </div>
-
-    <script src="https://cdn.jsdelivr.net/npm/sortablejs@1.15.0/Sortable.min.js"></script>
-    <script>
-        let playlist = [], current = -1, nextTrack = -1;
-        let audio = document.getElementById("audioPlayer");
-        let paused = false;
-        
-        // Sistema de estados del reproductor
-        const PlayerState = {{
-            IDLE: 'idle',
-            LOADING: 'loading',
-            PLAYING: 'playing',
-            ERROR: 'error'
-        }};
-        
-        let playerState = PlayerState.IDLE;
-        
-        // Formateo de tiempo
-        function fmt(t) {{
-            let m = Math.floor(t / 60), s = Math.floor(t % 60);
-            return String(m).padStart(2, "0") + ":" + String(s).padStart(2, "0");
-        }}
-        
-        // Extraer IDs de YouTube (corregido)
-        function extractYouTubeIDs(text) {{
-            // Expresión regular mejorada para detectar todos los formatos de URL de YouTube
-            const regex = /(?:youtube\\.com\\/watch\\?v=|youtu\\.be\\/|youtube\\.com\\/embed\\/|youtube\\.com\\/shorts\\/|youtube\\.com\\/live\\/)([a-zA-Z0-9_-]{{11}})/g;
-            const ids = [];
-            let match;
-            
-            while ((match = regex.exec(text)) !== null) {{
-                // Evitar duplicados
-                if (!ids.includes(match[1])) {{
-                    ids.push(match[1]);
-                }}
-            }}
-            
-            return ids;
-        }}
-        
-        // Función para agregar video por ID - MEJORADA
-        function addVideoById(id) {{
-            if (!playlist.some(t => t.id === id)) {{
-                let idx = playlist.length;
-                playlist.push({{
-                    id, 
-                    title: `Cargando... (${{id}})`, 
-                    duration: 0, 
-                    audio_url: ""
-                }});
-                render();
-                
-                // Usar el endpoint combinado como en c0.py
-                fetch("/extract_audio", {{
-                    method: "POST",
-                    headers: {{"Content-Type": "application/json"}},
-                    body: JSON.stringify({{url: `https://youtube.com/watch?v=${{id}}`}})
-                }})
-                .then(r => r.json())
-                .then(d => {{
-                    if (d.error) {{
-                        playlist[idx].title = `Error: ${{id}}`;
-                        console.error(`Error al procesar video ${{id}}:`, d.error);
-                    }} else {{
-                        playlist[idx].title = d.title;
-                        playlist[idx].duration = d.duration;
-                        playlist[idx].audio_url = d.audio_url;
-                    }}
-                    render();
-                    updateTotalTime();
-                    
-                    // Actualizar siguiente pista si es necesario
-                    if (nextTrack === -1 && playlist.length > 1) {{
-                        if (current === playlist.length - 2) {{
-                            nextTrack = playlist.length - 1;
-                            document.getElementById("nexttrack").textContent = playlist[nextTrack].title;
-                        }} else if (current === -1) {{
-                            nextTrack = 0;
-                            document.getElementById("nexttrack").textContent = playlist[nextTrack].title;
-                        }}
-                    }}
-                }})
-                .catch(error => {{
-                    console.error(`Error de red al agregar video ${{id}}:`, error);
-                    playlist[idx].title = `Error de red: ${{id}}`;
-                    render();
-                }});
-            }}
-        }}
-        
-        // Agregar enlaces
-        function add() {{
-            const input = document.getElementById("url");
-            const text = input.value.trim();
-            
-            if (!text) {{
-                alert("Por favor, ingresa al menos un enlace o ID de YouTube");
-                return;
-            }}
-            
-            // Si es un ID directo (11 caracteres), agregarlo directamente
-            if (/^[a-zA-Z0-9_-]{{11}}$/.test(text)) {{
-                addVideoById(text);
-                input.value = "";
-                return;
-            }}
-            
-            // Extraer IDs de URLs completas
-            const ids = extractYouTubeIDs(text);
-            
-            if (ids.length === 0) {{
-                alert("No se detectaron enlaces válidos de YouTube. Por favor, verifica los enlaces.");
-                return;
-            }}
-            
-            // Mostrar mensaje de carga
-            const originalText = input.value;
-            input.value = `Agregando ${{ids.length}} video(s)...`;
-            input.disabled = true;
-            
-            let addedCount = 0;
-            
-            // Procesar cada ID
-            ids.forEach(id => {{
-                if (!playlist.some(t => t.id === id)) {{
-                    let idx = playlist.length;
-                    playlist.push({{
-                        id, 
-                        title: `Cargando... (${{id}})`, 
-                        duration: 0, 
-                        audio_url: ""
-                    }});
-                    addedCount++;
-                    render();
-                    
-                    // Usar el endpoint combinado como en c0.py
-                    fetch("/extract_audio", {{
-                        method: "POST",
-                        headers: {{"Content-Type": "application/json"}},
-                        body: JSON.stringify({{url: `https://youtube.com/watch?v=${{id}}`}})
-                    }})
-                    .then(r => r.json())
-                    .then(d => {{
-                        if (d.error) {{
-                            playlist[idx].title = `Error: ${{id}}`;
-                            console.error(`Error al procesar video ${{id}}:`, d.error);
-                        }} else {{
-                            playlist[idx].title = d.title;
-                            playlist[idx].duration = d.duration;
-                            playlist[idx].audio_url = d.audio_url;
-                        }}
-                        render();
-                        updateTotalTime();
-                        
-                        // Actualizar siguiente pista si es necesario
-                        if (nextTrack === -1 && playlist.length > 1) {{
-                            if (current === playlist.length - 2) {{
-                                nextTrack = playlist.length - 1;
-                                document.getElementById("nexttrack").textContent = playlist[nextTrack].title;
-                            }} else if (current === -1) {{
-                                nextTrack = 0;
-                                document.getElementById("nexttrack").textContent = playlist[nextTrack].title;
-                            }}
-                        }}
-                        
-                        // Si es el último video, restaurar el input
-                        addedCount--;
-                        if (addedCount === 0) {{
-                            input.value = "";
-                            input.disabled = false;
-                            input.focus();
-                        }}
-                    }})
-                    .catch(error => {{
-                        console.error(`Error de red al agregar video ${{id}}:`, error);
-                        playlist[idx].title = `Error de red: ${{id}}`;
-                        render();
-                        
-                        // Si es el último video, restaurar el input
-                        addedCount--;
-                        if (addedCount === 0) {{
-                            input.value = "";
-                            input.disabled = false;
-                            input.focus();
-                        }}
-                    }});
-                }} else {{
-                    // El video ya está en la lista
-                    addedCount--;
-                    if (addedCount === 0) {{
-                        input.value = "";
-                        input.disabled = false;
-                        input.focus();
-                    }}
-                }}
-            }});
-            
-            // Si no se agregó ningún video nuevo (todos ya existían)
-            if (addedCount === 0) {{
-                input.value = "";
-                input.disabled = false;
-                input.focus();
-            }}
-        }}
-        
-        // Búsqueda en YouTube optimizada
-        document.getElementById("searchInput").addEventListener("keypress", function(e) {{
-            if (e.key === "Enter") search();
-        }});
-        
-        function search() {{
-            let q = document.getElementById("searchInput").value.trim();
-            if (!q) return;
-            
-            let results = document.getElementById("searchResults");
-            results.style.display = "block";
-            results.innerHTML = "<div class='loading'>Cargando...</div>";
-            
-            fetch("/search_yt", {{
-                method: "POST",
-                headers: {{"Content-Type": "application/json"}},
-                body: JSON.stringify({{query: q}})
-            }})
-            .then(r => r.json())
-            .then(d => {{
-                console.log("Respuesta de búsqueda:", d); // Debug en consola
-                results.innerHTML = "";
-                
-                if (d.error) {{
-                    results.innerHTML = `<div style='padding:20px;color:var(--error)'>Error: ${{d.error}}</div>`;
-                    return;
-                }}
-                
-                if (!d || !Array.isArray(d) || d.length === 0) {{
-                    results.innerHTML = "<div style='padding:20px;color:var(--text-secondary)'>No se encontraron resultados.</div>";
-                    return;
-                }}
-                
-                d.forEach(item => {{
-                    let div = document.createElement("div");
-                    div.className = "result-item";
-                    div.innerHTML = `
-                        <img src="${{item.thumbnail}}">
-                        <div class="result-info">
-                            <div class="result-title">${{item.title}}</div>
-                            <div class="result-duration">${{item.duration_string || fmt(item.duration)}}</div>
-                        </div>
-                        <button class="result-add" onclick="addFromSearch('${{item.id}}')">Agregar</button>
-                    `;
-                    results.appendChild(div);
-                }});
-            }})
-            .catch(error => {{
-                console.error("Error en búsqueda:", error);
-                results.innerHTML = `<div style='padding:20px;color:var(--error)'>Error de red: ${{error}}</div>`;
-            }});
-        }}
-        
-        function addFromSearch(id) {{
-            // Agregar directamente por ID en lugar de construir URL
-            addVideoById(id);
-        }}
-        
-        // Renderizar lista
-        function render() {{
-            let ul = document.getElementById("sortable");
-            ul.innerHTML = "";
-            
-            playlist.forEach((t, i) => {{
-                let li = document.createElement("li");
-                li.className = "track";
-                
-                // Asignar clases según el estado
-                if (i === current && playerState === PlayerState.PLAYING) {{
-                    li.classList.add("playing");
-                }} else if (i === current && playerState === PlayerState.LOADING) {{
-                    li.classList.add("loading");
-                }} else if (i === nextTrack) {{
-                    li.classList.add("next");
-                }}
-                
-                li.innerHTML = `
-                    <span>${{t.title}}</span>
-                    <span>${{fmt(t.duration)}}
-                        <button class="delete-btn" onclick="removeTrack(${{i}})">🗑️</button>
-                    </span>
-                `;
-                
-                // Un click: seleccionar como siguiente
-                li.onclick = function(e) {{
-                    if (e.detail === 1) {{ // Single click
-                        setTimeout(() => {{
-                            if (e.detail === 1) {{ // Still single click after delay
-                                setNextTrack(i);
-                            }}
-                        }}, 200);
-                    }}
-                }};
-                
-                // Doble click: reproducir
-                li.ondblclick = function(e) {{
-                    e.stopPropagation(); // Prevent single click handler
-                    playTrack(i);
-                }};
-                
-                ul.appendChild(li);
-            }});
-            
-            updateCurrentInfo();
-        }}
-        
-        function setNextTrack(index) {{
-            nextTrack = index;
-            document.getElementById("nexttrack").textContent = playlist[nextTrack].title;
-            render();
-        }}
-        
-        // Función playTrack mejorada - SIMPLIFICADA COMO EN C0.PY
-        function playTrack(index) {{
-            // Si ya estamos reproduciendo esta pista, no hacer nada
-            if (current === index && playerState === PlayerState.PLAYING) {{
-                return;
-            }}
-
-            // Actualizar estado
-            current = index;
-            playerState = PlayerState.LOADING;
-            render();
-            
-            let track = playlist[index];
-            
-            // Mostrar estado de carga
-            document.getElementById("current").textContent = `Cargando audio... (${{track.title}})`;
-            
-            // Verificar si tenemos la URL del audio
-            if (!track.audio_url) {{
-                // Si no tenemos la URL, obtenerla primero
-                fetch("/extract_audio", {{
-                    method: "POST",
-                    headers: {{"Content-Type": "application/json"}},
-                    body: JSON.stringify({{url: `https://youtube.com/watch?v=${{track.id}}`}})
-                }})
-                .then(r => r.json())
-                .then(d => {{
-                    if (d.error) {{
-                        playerState = PlayerState.ERROR;
-                        document.getElementById("current").textContent = `Error: ${{track.title}}`;
-                        console.error(`Error al obtener audio: ${{d.error}}`);
-                        return;
-                    }}
-                    
-                    // Actualizar la URL del audio en la playlist
-                    track.audio_url = d.audio_url;
-                    
-                    // Ahora reproducir
-                    playAudio(track);
-                }})
-                .catch(error => {{
-                    playerState = PlayerState.ERROR;
-                    document.getElementById("current").textContent = `Error de red: ${{track.title}}`;
-                    console.error(`Error al obtener audio: ${{error}}`);
-                }});
-            }} else {{
-                // Si ya tenemos la URL, reproducir directamente
-                playAudio(track);
-            }}
-        }}
-        
-        // Función para reproducir audio - SIMPLIFICADA COMO EN C0.PY
-        function playAudio(track) {{
-            // Limpiar completamente el reproductor
-            audio.pause();
-            audio.removeAttribute('src');
-            audio.load();
-            
-            // Configurar event listeners
-            const onCanPlay = () => {{
-                audio.play()
-                    .then(() => {{
-                        playerState = PlayerState.PLAYING;
-                        paused = false;
-                        document.getElementById("current").textContent = track.title;
-                        updateCurrentInfo();
-                    }})
-                    .catch(error => {{
-                        playerState = PlayerState.ERROR;
-                        console.error("Error al reproducir audio:", error);
-                        document.getElementById("current").textContent = `Error al reproducir: ${{track.title}}`;
-                    }})
-                    .finally(() => {{
-                        // Limpiar event listeners
-                        audio.removeEventListener('canplay', onCanPlay);
-                        audio.removeEventListener('error', onError);
-                        clearTimeout(timeout);
-                    }});
-            }};
-            
-            const onError = () => {{
-                playerState = PlayerState.ERROR;
-                console.error("Error al cargar audio");
-                document.getElementById("current").textContent = `Error al cargar: ${{track.title}}`;
-                clearTimeout(timeout);
-            }};
-            
-            // Timeout para evitar que la promesa quede pendiente para siempre
-            const timeout = setTimeout(() => {{
-                playerState = PlayerState.ERROR;
-                console.error("Timeout al cargar audio");
-                document.getElementById("current").textContent = `Timeout: ${{track.title}}`;
-                audio.removeEventListener('canplay', onCanPlay);
-                audio.removeEventListener('error', onError);
-            }}, 10000); // 10 segundos
-            
-            audio.addEventListener('canplay', onCanPlay);
-            audio.addEventListener('error', onError);
-            
-            // Cargar la nueva fuente
-            audio.src = track.audio_url;
-            audio.load();
-        }}
-        
-        function removeTrack(i) {{
-            playlist.splice(i, 1);
-            if (current === i) stop();
-            if (current > i) current--;
-            if (nextTrack === i) nextTrack = -1;
-            if (nextTrack > i) nextTrack--;
-            render();
-            updateTotalTime();
-        }}
-        
-        function updateTotalTime() {{
-            let sum = playlist.reduce((a, b) => a + b.duration, 0);
-            document.getElementById("totaltime").textContent = "Total: " + fmt(sum);
-        }}
-        
-        function togglePlay() {{
-            if (playerState !== PlayerState.PLAYING) {{
-                return;
-            }}
-            
-            if (paused) {{
-                audio.play()
-                    .then(() => {{
-                        paused = false;
-                    }})
-                    .catch(error => {{
-                        console.error("Error al reanudar reproducción:", error);
-                        alert(`Error al reanudar reproducción: ${{error}}`);
-                    }});
-            }} else {{
-                audio.pause();
-                paused = true;
-            }}
-        }}
-        
-        function stop() {{
-            if (playerState === PlayerState.IDLE) return;
-            
-            audio.pause();
-            audio.currentTime = 0;
-            playerState = PlayerState.IDLE;
-            current = -1;
-            paused = true;
-            updateCurrentInfo();
-            render();
-        }}
-        
-        function next() {{
-            if (current + 1 < playlist.length) {{
-                playTrack(current + 1);
-            }} else if (nextTrack >= 0) {{
-                playTrack(nextTrack);
-            }}
-        }}
-        
-        function prev() {{
-            if (current - 1 >= 0) {{
-                playTrack(current - 1);
-            }}
-        }}
-        
-        function updateCurrentInfo() {{
-            if (current >= 0) {{
-                document.getElementById("current").textContent = playlist[current].title;
-            }} else {{
-                document.getElementById("current").textContent = "Ninguna pista";
-                document.getElementById("timeRemaining").textContent = "--:--";
-            }}
-        }}
-        
-        function updateNextTrack() {{
-            if (current + 1 < playlist.length) {{
-                nextTrack = current + 1;
-                document.getElementById("nexttrack").textContent = playlist[nextTrack].title;
-            }} else {{
-                nextTrack = -1;
-                document.getElementById("nexttrack").textContent = "Ninguna pista seleccionada";
-            }}
-            render();
-        }}
-        
-        // Actualizar tiempo restante
-        audio.ontimeupdate = function() {{
-            if (!audio.duration) return;
-            
-            // Actualizar tiempo restante grande
-            const remaining = Math.max(0, audio.duration - audio.currentTime);
-            document.getElementById("timeRemaining").textContent = fmt(remaining);
-            
-            // Actualizar tiempo restante pequeño
-            document.getElementById("lefttime").textContent = "Restante: " + fmt(remaining);
-            
-            // Actualizar barra de progreso
-            const progress = (audio.currentTime / audio.duration) * 100;
-            document.getElementById("progress-bar").style.width = progress + "%";
-        }};
-        
-        // Manejar el final de la reproducción para pasar a la siguiente pista
-        audio.onended = function() {{
-            if (playerState === PlayerState.PLAYING) {{
-                next();
-            }}
-        }};
-        
-        // Hacer lista ordenable
-        new Sortable(document.getElementById("sortable"), {{
-            animation: 150,
-            onEnd: function(evt) {{
-                const moved = playlist.splice(evt.oldIndex, 1)[0];
-                playlist.splice(evt.newIndex, 0, moved);
-                
-                if (evt.oldIndex === current) current = -1;
-                else if (evt.oldIndex < current) current--;
-                
-                if (evt.oldIndex === nextTrack) nextTrack = -1;
-                else if (evt.oldIndex < nextTrack) nextTrack--;
-                
-                render();
-            }}
-        }});
-        
-        // Funcionalidad del menú contextual (clic derecho)
-        const contextMenu = document.getElementById('contextMenu');
-        let selectedText = '';
-        
-        // Evento para mostrar el menú contextual
-        document.addEventListener('contextmenu', function(e) {{
-            e.preventDefault();
-            
-            // Obtener el texto seleccionado
-            selectedText = window.getSelection().toString();
-            
-            // Mostrar el menú en la posición del ratón
-            contextMenu.style.display = 'block';
-            contextMenu.style.left = e.pageX + 'px';
-            contextMenu.style.top = e.pageY + 'px';
-            
-            // Deshabilitar la opción de copiar si no hay texto seleccionado
-            document.getElementById('copyOption').style.opacity = selectedText ? '1' : '0.5';
-            document.getElementById('copyOption').style.pointerEvents = selectedText ? 'auto' : 'none';
-        }});
-        
-        // Ocultar el menú al hacer clic en cualquier parte
-        document.addEventListener('click', function() {{
-            contextMenu.style.display = 'none';
-        }});
-        
-        // Función para copiar
-        document.getElementById('copyOption').addEventListener('click', function() {{
-            if (selectedText) {{
-                navigator.clipboard.writeText(selectedText).then(function() {{
-                    console.log('Texto copiado');
-                }}).catch(function(err) {{
-                    console.error('Error al copiar: ', err);
-                }});
-            }}
-        }});
-        
-        // Función para pegar
-        document.getElementById('pasteOption').addEventListener('click', function() {{
-            navigator.clipboard.readText().then(function(text) {{
-                // Intentar pegar en el elemento activo (input o textarea)
-                let activeElement = document.activeElement;
-                if (activeElement.tagName === 'INPUT' || activeElement.tagName === 'TEXTAREA') {{
-                    let start = activeElement.selectionStart;
-                    let end = activeElement.selectionEnd;
-                    activeElement.value = activeElement.value.substring(0, start) + text + activeElement.value.substring(end);
-                    activeElement.selectionStart = activeElement.selectionEnd = start + text.length;
-                }}
-            }}).catch(function(err) {{
-                console.error('Error al pegar: ', err);
-            }});
-        }});
-    </script>
-</body>
-</html>
-"""
+# URL de una lista o mix para importarla entera (sanitize se queda sólo con
+# el video). Los mixes (list=RD...) se arman desde la página de un video: el
+# del enlace o el que le da nombre al mix.
+def playlist_url(raw: str) -> str:
+    raw = raw.strip()
+    if re.match(r"^[\w-]{12,}$", raw):
+        list_id, vid = raw, None  # ID de lista directo
+    else:
+        qs = parse_qs(urlparse(raw).query)
+        list_id, vid = (qs.get(key, [None])[0] for key in ("list", "v"))
+        if not list_id or not re.match(r"^[\w-]+$", list_id):
+            raise ValueError(f"Lista de YouTube no detectada en: {raw}")
+    if list_id.startswith("RD"):
+        vid = vid or (list_id[-11:] if len(list_id) >= 13 else None)
+        if not vid:
+            raise ValueError(f"Para importar el mix {list_id} hace falta el enlace con su video (v=)")
+        return f"https://www.youtube.com/watch?v={vid}&list={list_id}"
+    return f"https://www.youtube.com/playlist?list={list_id}"
 
-# Endpoints de la API
-@app.get("/", response_class=HTMLResponse)
-async def index():
-    return HTMLResponse(HTML)
+# Conexión SQLite compartible entre procesos (--workers): en modo WAL los que
+# leen no bloquean al que escribe, y cada escritura espera su turno en vez de
+# fallar con "database is locked". Esa espera puede durar hasta `timeout` si
+# otro worker está escribiendo: desde el event loop las consultas se hacen con
+# asyncio.to_thread, nunca directo.
+def open_db(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
 
-@app.post("/extract_audio")
-async def extract_audio(request: Request):
-    try:
-        data = await request.json()
-        url = data.get("url")
-        print(f"URL recibida en extract_audio: {url}")  # Debug
-        
-        # Si ya es una URL de YouTube válida, usarla directamente
-        if url.startswith(("https://www.youtube.com/watch?v=", "https://youtube.com/watch?v=", 
-                          "https://youtu.be/", "https://www.youtube.com/embed/", 
-                          "https://www.youtube.com/shorts/", "https://www.youtube.com/live/")):
-            sanitized_url = sanitize(url)
+# Métricas estilo Prometheus para /metrics: histogramas de tiempo por etapa
+# de extract_audio y search_yt. Con CHOCLOTUBE_METRICS=0, timed() devuelve
+# siempre el mismo contexto vacío y medir no cuesta casi nada.
+METRICS_ENABLED = os.environ.get("CHOCLOTUBE_METRICS", "1") != "0"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class Histogram:
+    def __init__(self, name: str, help: str, label: str = None, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}  # valor de la etiqueta -> [conteos por bucket..., +Inf, suma]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label_value: str = ""):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for label_value, counts in sorted(series.items()):
+            labels = f'{self.label}="{label_value}",' if self.label else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+            labels = f'{{{labels.rstrip(",")}}}' if labels else ""
+            lines.append(f"{self.name}_sum{labels} {counts[-1]:.6f}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class StageTimer:
+    __slots__ = ("histogram", "stage", "started")
+
+    def __init__(self, histogram: Histogram, stage: str):
+        self.histogram = histogram
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, self.stage)
+
+NO_TIMER = nullcontext()
+
+def timed(histogram: Histogram, stage: str = ""):
+    # with timed(EXTRACT_STAGES, "extract_info"): ...
+    if not METRICS_ENABLED:
+        return NO_TIMER
+    return StageTimer(histogram, stage)
+
+EXTRACT_STAGES = Histogram("choclotube_extract_audio_stage_seconds",
+                           "Tiempo por etapa de extract_audio", "stage")
+SEARCH_STAGES = Histogram("choclotube_search_stage_seconds",
+                          "Tiempo por etapa de search_yt", "stage")
+YDL_ACQUIRE = Histogram("choclotube_ydl_acquire_seconds",
+                        "Tiempo en obtener un YoutubeDL del pool (construirlo si no hay libres)", "profile")
+EXECUTOR_WAIT = Histogram("choclotube_executor_wait_seconds",
+                          "Tiempo en cola antes de que un hilo del executor tome la tarea")
+HISTOGRAMS = [EXTRACT_STAGES, SEARCH_STAGES, YDL_ACQUIRE, EXECUTOR_WAIT]
+
+# Hilos dedicados a las extracciones (ver ExtractionExecutor)
+EXTRACT_WORKERS = int(os.environ.get("CHOCLOTUBE_EXTRACT_WORKERS", "8"))
+
+# Caché de disco de yt-dlp (su "cachedir"): ahí guarda lo que resuelve del
+# reproductor de YouTube, como la función de firma de cada versión del player
+# y los scripts del solucionador de desafíos. Así un YoutubeDL nuevo del pool,
+# un proceso de extracción o el servidor después de reiniciar no vuelven a
+# descifrar el player. yt-dlp escribe cada archivo en un temporal y lo
+# renombra: hilos y procesos comparten la carpeta sin pisarse. La poda corre
+# sólo en el proceso del servidor. Con CHOCLOTUBE_YDL_CACHE_DIR vacío no se
+# guarda nada en disco.
+YDL_CACHE_DIR = os.environ.get("CHOCLOTUBE_YDL_CACHE_DIR", os.path.join(DATA_DIR, "yt-dlp-cache"))
+YDL_CACHE_MB = int(os.environ.get("CHOCLOTUBE_YDL_CACHE_MB", "64"))
+YDL_CACHE_PLAYERS = int(os.environ.get("CHOCLOTUBE_YDL_CACHE_PLAYERS", "3"))  # Versiones del player que se conservan
+YDL_CACHE_PRUNE_INTERVAL = 6 * 3600
+YDL_CACHE_TMP_AGE = 3600  # Temporales más viejos que esto son de escrituras que no terminaron
+
+# ID del player en el nombre de archivo: "<id>-<variante>-..." en youtube-*
+# o dentro de la URL del player ("/" queda como ",2F") en challenge-solver
+PLAYER_ID_PATTERN = re.compile(r"(?:^|,2F)([0-9a-fA-F]{8,})(?:-|,2F)")
+
+class YdlCacheDir:
+    def __init__(self, root: str, max_bytes: int, players: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.players = max(1, players)
+        self._lock = threading.Lock()
+        self._started = False
+        self.runs = 0
+        self.removed_files = 0
+        self.removed_bytes = 0
+        self.files = 0
+        self.bytes = 0
+
+    def _scan(self) -> list:
+        entries = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # Lo renombró o borró otro proceso mientras tanto
+                entries.append((path, name, st.st_size, st.st_mtime))
+        return entries
+
+    def prune(self):
+        with self._lock:
+            now = time.time()
+            entries = self._scan()
+            doomed = {}
+            for path, name, size, mtime in entries:
+                if name.endswith(".tmp") and now - mtime > YDL_CACHE_TMP_AGE:
+                    doomed[path] = size
+            # Versiones viejas del player: YouTube publica otra cada pocos días
+            # y los datos de las anteriores ya no sirven. Se conservan las
+            # guardadas más recientemente
+            players = {}
+            for path, name, size, mtime in entries:
+                m = PLAYER_ID_PATTERN.search(name)
+                if m:
+                    players.setdefault(m.group(1), []).append((path, size, mtime))
+            ranked = sorted(players.values(), key=lambda files: max(f[2] for f in files), reverse=True)
+            for files in ranked[self.players:]:
+                for path, size, _ in files:
+                    doomed[path] = size
+            # Tope de tamaño: lo más viejo primero
+            kept = sorted(
+                (e for e in entries if e[0] not in doomed and not e[1].endswith(".tmp")), key=lambda e: e[3]
+            )
+            total = sum(e[2] for e in kept)
+            for path, _, size, _ in kept:
+                if total <= self.max_bytes:
+                    break
+                doomed[path] = size
+                total -= size
+            removed, removed_bytes = 0, 0
+            for path, size in doomed.items():
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue  # Abierto por otro proceso (Windows): queda para la próxima
+                removed += 1
+                removed_bytes += size
+            self.runs += 1
+            self.removed_files += removed
+            self.removed_bytes += removed_bytes
+            self.files = len(entries) - removed
+            self.bytes = sum(e[2] for e in entries) - removed_bytes
+        if removed:
+            log.info("Caché de yt-dlp: %d archivos borrados", removed)
+
+    def start(self):
+        # Poda al arrancar y después cada YDL_CACHE_PRUNE_INTERVAL, en segundo plano
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        def loop():
+            while True:
+                try:
+                    self.prune()
+                except Exception as e:
+                    log.warning("Error podando la caché de yt-dlp: %s", e)
+                time.sleep(YDL_CACHE_PRUNE_INTERVAL)
+
+        threading.Thread(target=loop, name="ydl-cache-prune", daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": self.files,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "prune_runs": self.runs,
+                "removed_files": self.removed_files,
+                "removed_bytes": self.removed_bytes,
+            }
+
+ydl_cache = YdlCacheDir(YDL_CACHE_DIR, YDL_CACHE_MB * 1024 * 1024, YDL_CACHE_PLAYERS) if YDL_CACHE_DIR else None
+
+# Opciones optimizadas para velocidad (como en c0.py)
+AUDIO_YDL_OPTS = {
+    "format": "bestaudio/best",
+    "quiet": True,
+    "no_warnings": True,
+    "noplaylist": True,
+    "skip_download": True,
+    "outtmpl": "-",
+    "postprocessors": [],
+    "noprogress": True,
+    "nocheckcertificate": True,
+    "cachedir": YDL_CACHE_DIR or False,
+    "socket_timeout": 10,
+    "retries": 1,
+    "fragment_retries": 1
+}
+
+# Configuración optimizada para búsqueda rápida con duración
+SEARCH_YDL_OPTS = {
+    "quiet": True,
+    "no_warnings": True,
+    "noplaylist": True,
+    "extract_flat": "in_playlist",  # Método intermedio que incluye duración
+    "skip_download": True,
+    "cachedir": YDL_CACHE_DIR or False,
+    "socket_timeout": 10,
+    "retries": 1,
+    "fragment_retries": 1,
+    "noprogress": True,
+    "nocheckcertificate": True
+}
+
+# Importar listas: como la búsqueda, pero recorriendo la lista (y los mixes,
+# que llegan con v= y list=)
+PLAYLIST_YDL_OPTS = dict(SEARCH_YDL_OPTS, noplaylist=False)
+
+# Pool de instancias YoutubeDL ya construidas, un pool por perfil de opciones.
+# Construir un YoutubeDL rehace el registro de extractores, el opener HTTP y
+# el cookie jar; reutilizarlas evita ese costo en cada petición. Cada
+# instancia la usa un solo hilo a la vez (checkout/devolución).
+class YoutubeDLPool:
+    def __init__(self, opts: dict, max_idle: int, name: str = "default"):
+        self.opts = opts
+        self.name = name
+        self.max_idle = max(1, max_idle)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def _new(self):
+        with self._lock:
+            self.created += 1
+        return load_yt_dlp().YoutubeDL(dict(self.opts))
+
+    def warm(self, count: int):
+        for _ in range(min(count, self.max_idle) - self._idle.qsize()):
+            self._idle.put(self._new())
+
+    def acquire(self):
+        with timed(YDL_ACQUIRE, self.name):
+            try:
+                ydl = self._idle.get_nowait()
+                with self._lock:
+                    self.reused += 1
+                return ydl
+            except queue.Empty:
+                return self._new()
+
+    def release(self, ydl, healthy: bool = True):
+        if healthy and self._idle.qsize() < self.max_idle:
+            self._idle.put(ydl)
         else:
-            # Si no es una URL reconocida, intentar procesarla como un ID directo
-            if re.match(r'^[a-zA-Z0-9_-]{11}$', url):
-                sanitized_url = f"https://www.youtube.com/watch?v={url}"
-            else:
-                raise ValueError(f"URL no válida: {url}")
-        
-        print(f"URL sanitizada: {sanitized_url}")  # Debug
-        
-        # Opciones optimizadas para velocidad (como en c0.py)
-        ydl_opts = {
-            "format": "bestaudio/best",
-            "quiet": True,
-            "no_warnings": True,
-            "noplaylist": True,
-            "skip_download": True,
-            "outtmpl": "-",
-            "postprocessors": [],
-            "noprogress": True,
-            "nocheckcertificate": True,
-            "cachedir": False,
-            "socket_timeout": 10,
-            "retries": 1,
-            "fragment_retries": 1
-        }
-        
-        info = ydl_get(sanitized_url, ydl_opts)
-        
-        return JSONResponse({
-            "title": info.get("title", "Sin título"),
-            "duration": int(info.get("duration", 0)),
-            "audio_url": info["url"]
-        })
-    except Exception as e:
-        print(f"Error en extract_audio: {e}")  # Debug
-        return JSONResponse({"error": str(e)}, status_code=500)
+            with self._lock:
+                self.discarded += 1
+            ydl.close()
 
-@app.post("/search_yt")
-async def search_yt(request: Request):
-    try:
-        data = await request.json()
-        query = data.get("query")
-        print(f"Buscando: {query}")  # Debug
-        
-        # Configuración optimizada para búsqueda rápida con duración
-        ydl_opts = {
-            "quiet": True,
-            "no_warnings": True,
-            "noplaylist": True,
-            "extract_flat": "in_playlist",  # Método intermedio que incluye duración
-            "skip_download": True,
-            "playlistend": 5,
-            "cachedir": False,
-            "socket_timeout": 10,
-            "retries": 1,
-            "fragment_retries": 1,
-            "noprogress": True,
-            "nocheckcertificate": True
-        }
-        
-        # Realizar la búsqueda con el prefijo correcto
-        search_query = f"ytsearch5:{query}"
-        print(f"Consulta de búsqueda: {search_query}")  # Debug
-        info = ydl_get(search_query, ydl_opts)
-        print(f"Resultados obtenidos: {len(info.get('entries', []))}")  # Debug
-        
-        results = []
-        for entry in info.get("entries", []):
-            # Con extract_flat='in_playlist', tenemos acceso a la duración
-            duration = entry.get("duration", 0)
-            duration_string = fmt(int(duration)) if duration else "--:--"
-            
-            # Generar thumbnail automáticamente
-            thumbnail = f"https://i.ytimg.com/vi/{entry['id']}/default.jpg"
-            
-            results.append({
-                "id": entry["id"],
-                "title": entry.get("title", "Sin título"),
-                "duration": duration,
-                "duration_string": duration_string,
-                "thumbnail": thumbnail
-            })
-        
-        print(f"Resultados procesados: {len(results)}")  # Debug
-        return JSONResponse(results)
-    except Exception as e:
-        print(f"Error en search_yt: {e}")  # Debug
-        return JSONResponse({"error": str(e)}, status_code=500)
+    @contextmanager
+    def checkout(self):
+        ydl = self.acquire()
+        healthy = False
+        try:
+            yield ydl
+            healthy = True
+        except GeneratorExit:
+            # Se cerró antes de terminar el generador que la usaba (search,
+            # playlist): la instancia no tuvo ningún error
+            healthy = True
+            raise
+        except Exception as e:
+            # Error del video (privado, no disponible...): la instancia sigue sana
+            healthy = isinstance(e, load_yt_dlp().utils.DownloadError)
+            raise
+        finally:
+            self.release(ydl, healthy)
 
-# Función para ejecutar el servidor
-def run_server():
-    uvicorn.run(app, host="127.0.0.1", port=8000, log_level="error")
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "idle": self._idle.qsize(),
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+            }
 
-# Función para ejecutar la interfaz gráfica
-def run_gui():
-    webview.create_window(
-        "Choclotube",
-        "http://127.0.0.1:8000",
-        width=1400,
-        height=800,
-        resizable=True,
-        min_size=(800, 500)
-    )
-    webview.start()
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
 
-# Punto de entrada principal
-if __name__ == "__main__":
+YDL_POOL_WARM = int(os.environ.get("CHOCLOTUBE_YDL_POOL_WARM", "2"))
+
+YDL_PROFILES = {"audio": AUDIO_YDL_OPTS, "search": SEARCH_YDL_OPTS, "playlist": PLAYLIST_YDL_OPTS}
+
+# Backends de extracción. Los endpoints sólo hablan con `extractor`; así se
+# puede cambiar yt-dlp por el falso (CHOCLOTUBE_EXTRACTOR=fake) para pruebas
+# de carga sin red. Los métodos son bloqueantes: se llaman desde el executor.
+class ExtractionError(Exception):
+    pass
+
+class Extractor(abc.ABC):
+    name = "base"
+
+    @abc.abstractmethod
+    def extract_audio(self, url: str) -> dict:
+        # Devuelve al menos {"title", "duration", "url"} para una URL watch?v=
+        ...
+
+    @abc.abstractmethod
+    def search(self, query: str, max_results: int):
+        # Generador perezoso de entradas {"id", "title", "duration"}
+        ...
+
+    @abc.abstractmethod
+    def playlist(self, url: str):
+        # Generador perezoso de las entradas {"id", "title", "duration"} de
+        # una lista, página por página y sin extraer cada video
+        ...
+
+    def warm(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+    def close(self):
+        pass
+
+class YtDlpExtractor(Extractor):
+    name = "yt-dlp"
+
+    def __init__(self, workers: int):
+        self.pools = {profile: YoutubeDLPool(opts, workers, profile) for profile, opts in YDL_PROFILES.items()}
+
+    def extract_audio(self, url: str) -> dict:
+        with self.pools["audio"].checkout() as ydl, timed(EXTRACT_STAGES, "extract_info"):
+            return ydl.extract_info(url, download=False)
+
+    def search(self, query: str, max_results: int):
+        # La instancia queda tomada mientras viva el generador: yt-dlp la
+        # sigue usando para pedir más páginas de resultados
+        with self.pools["search"].checkout() as ydl:
+            info = ydl.extract_info(f"ytsearch{max_results}:{query}", download=False, process=False)
+            yield from info.get("entries") or []
+
+    def playlist(self, url: str):
+        with self.pools["playlist"].checkout() as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+            # Con process=False las redirecciones (p. ej. watch?list= sin v=
+            # a playlist?list=) llegan sin seguir
+            for _ in range(3):
+                if info.get("_type") not in ("url", "url_transparent"):
+                    break
+                info = ydl.extract_info(info["url"], download=False, process=False)
+            yield from info.get("entries") or []
+
+    def warm(self):
+        # Precalentar los pools (e importar yt_dlp) en segundo plano para no
+        # demorar el arranque; con CHOCLOTUBE_YDL_POOL_WARM=0 todo queda para
+        # la primera extracción
+        if ydl_cache is not None:
+            ydl_cache.start()
+        if YDL_POOL_WARM <= 0:
+            return
+        for profile, pool in self.pools.items():
+            if profile == "playlist":
+                continue  # Sólo para importar listas: se arma en la primera
+            threading.Thread(target=pool.warm, args=(YDL_POOL_WARM,), daemon=True).start()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "pools": {profile: pool.stats() for profile, pool in self.pools.items()},
+            "cache": ydl_cache.stats() if ydl_cache is not None else {"enabled": False},
+        }
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+
+# Variante con procesos (CHOCLOTUBE_EXTRACTOR=yt-dlp-process): extract_info
+# es trabajo de CPU (JSON, descifrado de firmas con el intérprete JS de
+# yt-dlp, orden de formatos) y en un hilo compite por el GIL con uvicorn.
+# Aquí corre en procesos hijos ya arrancados (ver extract_worker.py), que
+# devuelven sólo el dict recortado. La búsqueda sigue en hilos: su generador
+# perezoso no puede cruzar de proceso y casi todo su tiempo es de red.
+EXTRACT_PROCESSES = int(os.environ.get("CHOCLOTUBE_EXTRACT_PROCESSES", str(os.cpu_count() or 2)))
+
+class ProcessExtractor(YtDlpExtractor):
+    name = "yt-dlp-process"
+
+    def __init__(self, workers: int, processes: int):
+        super().__init__(workers)
+        self.pools.pop("audio")  # Las extracciones van a los procesos
+        self.processes = max(1, processes)
+        self._lock = threading.Lock()
+        self._pool = None
+        self.calls = 0
+        self.restarts = 0
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                import extract_worker
+                # spawn y no fork: el proceso del servidor ya tiene hilos
+                # (uvicorn, el registro, el executor) que fork copiaría a medias
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=extract_worker.init,
+                    initargs=({"audio": AUDIO_YDL_OPTS},)
+                )
+            return self._pool
+
+    def run(self, fn, *args):
+        # Bloqueante, como el resto de los métodos: se llama desde el executor
+        pool = self._executor()
+        with self._lock:
+            self.calls += 1
+        try:
+            return pool.submit(fn, *args).result()
+        except BrokenProcessPool as e:
+            # Un proceso murió (p. ej. sin memoria): armar el pool de nuevo
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+                    self.restarts += 1
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise ExtractionError(f"Se cayó un proceso de extracción: {e}")
+
+    def extract_audio(self, url: str) -> dict:
+        import extract_worker
+        with timed(EXTRACT_STAGES, "extract_info"):
+            info = self.run(extract_worker.extract_audio, url)
+        if "error" in info:
+            raise ExtractionError(info["error"])
+        return info
+
+    def warm(self):
+        super().warm()
+        if YDL_POOL_WARM <= 0:
+            return
+        # Arrancar todos los procesos ya (cada uno importa yt_dlp y arma su
+        # YoutubeDL): con spawn se crean a medida que llegan tareas, así que
+        # se mandan tantos ping como procesos a la vez
+        def start():
+            import extract_worker
+            pool = self._executor()
+            futures = [pool.submit(extract_worker.ping) for _ in range(self.processes)]
+            try:
+                pids = {future.result() for future in futures}
+                log.debug("Procesos de extracción listos: %d", len(pids))
+            except Exception as e:
+                log.warning("Error arrancando los procesos de extracción: %s", e)
+        threading.Thread(target=start, daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(super().stats(), processes=self.processes, calls=self.calls, restarts=self.restarts)
+
+    def close(self):
+        super().close()
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+# Servidor HTTP local que hace de googlevideo para el extractor falso: sirve
+# bytes sintéticos (deterministas por ID) con soporte de Range y responde 403
+# cuando la URL pasó su "expire=", igual que YouTube
+class FakeUpstream:
+    def __init__(self, size: int):
+        self.size = size
+        self.requests = 0
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                upstream.requests += 1
+                query = parse_qs(urlparse(self.path).query)
+                vid = query.get("id", [""])[0]
+                if int(query.get("expire", ["0"])[0]) < time.time():
+                    self.send_response(403)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                start, end = 0, upstream.size - 1
+                m = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+                if m and (m.group(1) or m.group(2)):
+                    if m.group(1):
+                        start = int(m.group(1))
+                        end = min(int(m.group(2)), end) if m.group(2) else end
+                    else:
+                        start = max(0, upstream.size - int(m.group(2)))
+                    if start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{upstream.size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{upstream.size}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "audio/webm")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                try:
+                    for offset in range(start, end + 1, STREAM_CHUNK_SIZE):
+                        self.wfile.write(upstream.audio_bytes(vid, offset, min(offset + STREAM_CHUNK_SIZE, end + 1)))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def audio_bytes(vid: str, start: int, stop: int) -> bytes:
+        # Patrón de 32 bytes repetido, derivado del ID
+        pattern = hashlib.sha256(vid.encode()).digest()
+        offset = start % len(pattern)
+        return (pattern * ((stop - start) // len(pattern) + 2))[offset:offset + stop - start]
+
+    def url_for(self, vid: str, expire: int) -> str:
+        return f"{self.base_url}/videoplayback?id={vid}&expire={expire}"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class FakeExtractor(Extractor):
+    name = "fake"
+
+    PLAYLIST_PAGE = 100  # Entradas por página de una lista, como en YouTube
+
+    def __init__(self, latency: float = 0.05, entry_latency: float = 0.0, failure_rate: float = 0.0,
+                 url_ttl: int = 6 * 3600, audio_size: int = 1024 * 1024, playlist_size: int = 500, seed: int = 0):
+        self.latency = latency
+        self.entry_latency = entry_latency
+        self.playlist_size = playlist_size
+        self.failure_rate = failure_rate
+        self.url_ttl = url_ttl
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.upstream = FakeUpstream(audio_size)
+        self.calls = 0
+        self.failures = 0
+
+    @staticmethod
+    def _number(key: str) -> int:
+        return int.from_bytes(hashlib.sha256(key.encode()).digest()[:4], "big")
+
+    @staticmethod
+    def _entry_id(key: str) -> str:
+        return base64.urlsafe_b64encode(hashlib.sha256(key.encode()).digest()).decode()[:11]
+
+    def _maybe_fail(self, what: str):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        if failed:
+            raise ExtractionError(f"Falla simulada en {what}")
+
+    def extract_audio(self, url: str) -> dict:
+        with timed(EXTRACT_STAGES, "extract_info"):
+            time.sleep(self.latency)
+        vid = video_id(url)
+        self._maybe_fail(vid)
+        return {
+            "id": vid,
+            "title": f"Pista de prueba {vid}",
+            "duration": 60 + self._number(vid) % 300,
+            "url": self.upstream.url_for(vid, int(time.time()) + self.url_ttl),
+        }
+
+    def search(self, query: str, max_results: int):
+        time.sleep(self.latency)
+        self._maybe_fail(query)
+        for i in range(max_results):
+            time.sleep(self.entry_latency)
+            vid = self._entry_id(f"{query}#{i}")
+            yield {"id": vid, "title": f"{query} #{i + 1}", "duration": 60 + self._number(vid) % 300}
+
+    def playlist(self, url: str):
+        # Lista sintética de playlist_size entradas; cada página tarda latency
+        list_id = parse_qs(urlparse(url).query)["list"][0]
+        for i in range(self.playlist_size):
+            if i % self.PLAYLIST_PAGE == 0:
+                time.sleep(self.latency)
+                self._maybe_fail(f"{list_id} (página {i // self.PLAYLIST_PAGE + 1})")
+            time.sleep(self.entry_latency)
+            vid = self._entry_id(f"{list_id}#{i}")
+            yield {"id": vid, "title": f"{list_id} #{i + 1}", "duration": 60 + self._number(vid) % 300}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "calls": self.calls,
+                "failures": self.failures,
+                "upstream_requests": self.upstream.requests,
+            }
+
+    def close(self):
+        self.upstream.close()
+
+def make_extractor() -> Extractor:
+    backend = os.environ.get("CHOCLOTUBE_EXTRACTOR", "yt-dlp")
+    if backend == "fake":
+        return FakeExtractor(
+            latency=float(os.environ.get("CHOCLOTUBE_FAKE_LATENCY", "0.05")),
+            entry_latency=float(os.environ.get("CHOCLOTUBE_FAKE_ENTRY_LATENCY", "0")),
+            failure_rate=float(os.environ.get("CHOCLOTUBE_FAKE_FAILURE_RATE", "0")),
+            url_ttl=int(os.environ.get("CHOCLOTUBE_FAKE_URL_TTL", str(6 * 3600))),
+            audio_size=int(os.environ.get("CHOCLOTUBE_FAKE_AUDIO_KB", "1024")) * 1024,
+            playlist_size=int(os.environ.get("CHOCLOTUBE_FAKE_PLAYLIST_SIZE", "500")),
+        )
+    if backend == "yt-dlp-process":
+        return ProcessExtractor(EXTRACT_WORKERS, EXTRACT_PROCESSES)
+    if backend != "yt-dlp":
+        raise ValueError(f"Extractor desconocido: {backend}")
+    return YtDlpExtractor(EXTRACT_WORKERS)
+
+def video_id(sanitized_url: str) -> str:
+    # sanitize() siempre devuelve https://www.youtube.com/watch?v=<ID>
+    return sanitized_url.rsplit("v=", 1)[1][:11]
+
+# Executor dedicado para las extracciones, así una extracción lenta
+# no bloquea el loop de uvicorn (ni "/" ni el resto de peticiones en curso)
+class ExtractionExecutor:
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extract")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _call(self, fn, args, submitted):
+        if METRICS_ENABLED:
+            EXECUTOR_WAIT.observe(time.perf_counter() - submitted)
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+        try:
+            return fn(*args)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    async def run(self, fn, *args):
+        # Ejecuta fn(*args) en el pool sin bloquear el loop de eventos
+        with self._lock:
+            self.queued += 1
+        loop = asyncio.get_running_loop()
+        # copy_context: los logs del hilo llevan el ID de la petición
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self._pool, ctx.run, self._call, fn, args, time.perf_counter())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": self.queued,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+extract_executor = ExtractionExecutor(EXTRACT_WORKERS)
+extractor = make_extractor()
+
+# Coalescencia de peticiones (single-flight): si dos clientes piden la misma
+# URL a la vez (p. ej. addVideoById y playTrack compitiendo), se hace una sola
+# extracción y todos esperan el mismo resultado.
+class SingleFlight:
+    def __init__(self):
+        self._in_flight = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, make_coro):
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_coro())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        # shield: si un cliente se desconecta, no cancelar la tarea compartida
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Evita "Task exception was never retrieved"
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._in_flight), "coalesced": self.coalesced}
+
+extraction_flight = SingleFlight()
+
+# Caché de metadatos por ID de video: LRU en memoria + SQLite en disco.
+# Título y duración se guardan a largo plazo; la URL de googlevideo sólo
+# hasta el "expire=" que trae incrustado, menos un margen de seguridad.
+# Con varios workers (--workers) todos usan el mismo archivo: lo que resuelve
+# uno es un acierto para los demás, y una URL vencida en la memoria de un
+# proceso se vuelve a buscar en disco por si otro ya la renovó.
+METADATA_CACHE_SIZE = int(os.environ.get("CHOCLOTUBE_METADATA_CACHE_SIZE", "2048"))
+URL_EXPIRY_MARGIN = int(os.environ.get("CHOCLOTUBE_URL_EXPIRY_MARGIN", "600"))
+DEFAULT_URL_TTL = 3600  # Si la URL no trae "expire", asumir una hora
+
+def url_expiry(audio_url: str):
+    m = re.search(r"[?&/]expire[=/](\d+)", audio_url or "")
+    return int(m.group(1)) if m else None
+
+class MetadataCache:
+    # Título y duración sin pisar una URL de audio ni una duración conocida
+    REMEMBER_SQL = (
+        "INSERT INTO tracks (id, title, duration, updated) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET title = excluded.title, "
+        "duration = CASE WHEN excluded.duration > 0 THEN excluded.duration ELSE tracks.duration END, "
+        "updated = excluded.updated"
+    )
+
+    def __init__(self, path: str, capacity: int):
+        self.capacity = max(1, capacity)
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = open_db(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                duration INTEGER NOT NULL,
+                audio_url TEXT,
+                url_expires INTEGER,
+                updated REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+        self.hits = 0           # Metadatos y URL vigente
+        self.stale_hits = 0     # Metadatos sí, pero la URL ya venció
+        self.misses = 0
+
+    def _remember(self, vid: str, entry: dict):
+        self._mem[vid] = entry
+        self._mem.move_to_end(vid)
+        while len(self._mem) > self.capacity:
+            self._mem.popitem(last=False)
+
+    def _read(self, vid: str):
+        row = self._db.execute(
+            "SELECT title, duration, audio_url, url_expires FROM tracks WHERE id = ?", (vid,)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = {"title": row[0], "duration": row[1], "audio_url": row[2], "url_expires": row[3]}
+        self._remember(vid, entry)
+        return entry
+
+    def _load(self, vid: str):
+        entry = self._mem.get(vid)
+        if entry is not None:
+            self._mem.move_to_end(vid)
+            return entry
+        return self._read(vid)
+
+    @staticmethod
+    def _url_usable(entry: dict) -> bool:
+        return bool(entry["audio_url"]) and (entry["url_expires"] or 0) - URL_EXPIRY_MARGIN > time.time()
+
+    def get(self, vid: str):
+        # Devuelve {"id", "title", "duration", "audio_url"} o None; audio_url
+        # queda vacía si la URL guardada ya no es segura de usar
+        with self._lock:
+            entry = self._mem.get(vid)
+            if entry is not None:
+                self._mem.move_to_end(vid)
+                if not self._url_usable(entry):
+                    entry = self._read(vid) or entry
+            else:
+                entry = self._read(vid)
+            if entry is None:
+                self.misses += 1
+                return None
+            audio_url = entry["audio_url"]
+            if not self._url_usable(entry):
+                audio_url = ""
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+        return {"id": vid, "title": entry["title"], "duration": entry["duration"], "audio_url": audio_url}
+
+    def put(self, vid: str, title: str, duration: int, audio_url: str = ""):
+        expires = None
+        if audio_url:
+            expires = url_expiry(audio_url) or int(time.time()) + DEFAULT_URL_TTL
+        entry = {"title": title, "duration": duration, "audio_url": audio_url or None, "url_expires": expires}
+        with self._lock:
+            self._remember(vid, entry)
+            self._db.execute(
+                "INSERT OR REPLACE INTO tracks (id, title, duration, audio_url, url_expires, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (vid, title, duration, entry["audio_url"], expires, time.time())
+            )
+            self._db.commit()
+        return {"id": vid, "title": title, "duration": duration, "audio_url": audio_url or ""}
+
+    def remember(self, vid: str, title: str, duration: int):
+        # Título y duración que llegan por otra vía (p. ej. la búsqueda), sin
+        # pisar una URL de audio vigente ni una duración ya conocida
+        with self._lock:
+            entry = self._load(vid)
+            if entry is None:
+                entry = {"title": title, "duration": duration, "audio_url": None, "url_expires": None}
+            else:
+                entry = dict(entry, title=title, duration=duration or entry["duration"])
+            self._remember(vid, entry)
+            self._db.execute(self.REMEMBER_SQL, (vid, title, duration, time.time()))
+            self._db.commit()
+
+    def remember_many(self, items: list):
+        # Lo mismo para muchas pistas {"id", "title", "duration"} en una sola
+        # transacción (una página de una lista importada). Sólo se actualizan
+        # las que ya estaban en memoria: miles de pistas que quizás no suenen
+        # no deben desplazar a las de uso frecuente.
+        now = time.time()
+        with self._lock:
+            for item in items:
+                entry = self._mem.get(item["id"])
+                if entry is not None:
+                    self._mem[item["id"]] = dict(entry, title=item["title"],
+                                                 duration=item["duration"] or entry["duration"])
+            with self._db:
+                self._db.executemany(
+                    self.REMEMBER_SQL, [(item["id"], item["title"], item["duration"], now) for item in items]
+                )
+
+    def describe_many(self, vids: list) -> dict:
+        # Título y duración de muchos IDs de una vez (para cargar una lista
+        # guardada): memoria primero y el resto en consultas de a 500
+        found = {}
+        with self._lock:
+            missing = []
+            for vid in vids:
+                entry = self._mem.get(vid)
+                if entry is not None:
+                    found[vid] = {"title": entry["title"], "duration": entry["duration"]}
+                else:
+                    missing.append(vid)
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT id, title, duration FROM tracks WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for vid, title, duration in rows:
+                    found[vid] = {"title": title, "duration": duration}
+        return found
+
+    def url_expires(self, vid: str):
+        # Vencimiento de la URL guardada, leído de disco: otro worker (o una
+        # reproducción) pudo haberla renovado
+        with self._lock:
+            entry = self._read(vid)
+            return entry["url_expires"] if entry is not None and entry["audio_url"] else None
+
+    def expire_url(self, vid: str):
+        # La URL fue rechazada por googlevideo (403/410): olvidarla, pero
+        # conservar título y duración
+        with self._lock:
+            entry = self._load(vid)
+            if entry is None:
+                return
+            entry["audio_url"] = None
+            entry["url_expires"] = None
+            self._db.execute("UPDATE tracks SET audio_url = NULL, url_expires = NULL WHERE id = ?", (vid,))
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries_in_memory": len(self._mem),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+metadata_cache = MetadataCache(os.path.join(DATA_DIR, "metadata.sqlite3"), METADATA_CACHE_SIZE)
+
+# Caché de búsquedas: clave = consulta normalizada (minúsculas, espacios
+# colapsados) + página pedida (offset y cantidad), con TTL. LRU en memoria y, si se
+# activa, copia en SQLite para sobrevivir reinicios (lo vencido se borra al
+# arrancar y después una vez por TTL, al guardar).
+SEARCH_PAGE_SIZE = 5
+SEARCH_MAX_PAGE_SIZE = 50
+SEARCH_CACHE_TTL = int(os.environ.get("CHOCLOTUBE_SEARCH_TTL", "900"))
+SEARCH_CACHE_SIZE = 256
+SEARCH_CACHE_PERSIST = os.environ.get("CHOCLOTUBE_SEARCH_CACHE_PERSIST", "0") == "1"
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").casefold().split())
+
+class SearchCache:
+    def __init__(self, ttl: int, capacity: int, path: str = None):
+        self.ttl = ttl
+        self.capacity = max(1, capacity)
+        self._mem = OrderedDict()  # clave -> (guardado, resultados)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = open_db(path)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS searches (
+                    key TEXT PRIMARY KEY,
+                    results TEXT NOT NULL,
+                    stored REAL NOT NULL
+                )
+            """)
+            self._prune(time.time())
+        self.hits = 0
+        self.misses = 0
+
+    def _prune(self, now: float):
+        self._db.execute("DELETE FROM searches WHERE stored < ?", (now - self.ttl,))
+        self._db.commit()
+        self._pruned = now
+
+    @staticmethod
+    def key(query: str, offset: int, limit: int) -> str:
+        return f"{offset}+{limit}:{normalize_query(query)}"
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._mem.get(key)
+            if item is None and self._db is not None:
+                row = self._db.execute("SELECT stored, results FROM searches WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    item = (row[0], json.loads(row[1]))
+                    self._mem[key] = item
+            if item is None or item[0] + self.ttl <= time.time():
+                self._mem.pop(key, None)
+                self.misses += 1
+                return None
+            self._mem.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: str, results: list):
+        stored = time.time()
+        with self._lock:
+            self._mem[key] = (stored, results)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.capacity:
+                self._mem.popitem(last=False)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO searches (key, results, stored) VALUES (?, ?, ?)",
+                    (key, json.dumps(results), stored)
+                )
+                self._db.commit()
+                if stored - self._pruned > self.ttl:
+                    self._prune(stored)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries_in_memory": len(self._mem),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+
+search_cache = SearchCache(
+    SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE,
+    os.path.join(DATA_DIR, "search.sqlite3") if SEARCH_CACHE_PERSIST else None
+)
+
+# Canal de eventos (Server-Sent Events en /events): el servidor avisa a los
+# navegadores conectados cuando llegan metadatos o una URL nueva de una pista,
+# cuando termina una precarga y cuando otro cliente cambia una lista guardada,
+# en vez de que el frontend tenga que volver a preguntar. Cada evento lleva un
+# ID creciente; al reconectarse, EventSource manda Last-Event-ID y se le
+# reenvían los que se perdió (si siguen en el historial).
+EVENTS_QUEUE_SIZE = 256  # Eventos pendientes por cliente antes de cortarlo
+EVENTS_HISTORY = 256     # Eventos recientes guardados para las reconexiones
+EVENTS_KEEPALIVE = 15    # Segundos entre comentarios para mantener viva la conexión
+EVENTS_POLL = 0.1        # Con varios workers: cada cuánto se leen los eventos de los demás
+
+class EventHub:
+    def __init__(self, queue_size: int, history: int):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._recent = deque(maxlen=history)
+        self._last_id = 0
+        self.published = 0
+        self.dropped = 0
+
+    # Se llama desde el event loop (los endpoints y las tareas son async)
+    def publish(self, event: str, data: dict):
+        self.published += 1
+        self._deliver(self._last_id + 1, event, json.dumps(data))
+
+    def _deliver(self, event_id: int, event: str, data: str):
+        # Se serializa una sola vez para todos los clientes
+        message = f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+        self._last_id = event_id
+        self._recent.append((event_id, message))
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Cliente que no lee: se lo corta y al reconectarse recupera
+                # lo perdido del historial (o recibe "reset")
+                self.dropped += 1
+                self._disconnect(queue)
+
+    def subscribe(self, last_id: int = None) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if last_id is not None and last_id != self._last_id:
+            # (un ID mayor al último es de antes de reiniciar el servidor)
+            if last_id < self._last_id and self._recent and self._recent[0][0] <= last_id + 1:
+                for event_id, message in self._recent:
+                    if event_id > last_id:
+                        queue.put_nowait(message)
+            else:
+                # Se perdió más de lo que hay guardado: que el cliente se resincronice
+                queue.put_nowait(f"id: {self._last_id}\nevent: reset\ndata: {{}}\n\n")
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def _disconnect(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)  # Fin del stream
+
+    def start(self):
+        pass
+
+    async def catch_up(self):
+        # Antes de suscribir: traer lo que haya publicado otro worker
+        pass
+
+    def close(self):
+        for queue in list(self._subscribers):
+            self._disconnect(queue)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "last_id": self._last_id,
+        }
+
+class SharedEventHub(EventHub):
+    # Con varios workers, cada pestaña está conectada a /events en uno solo:
+    # los eventos se anotan en un SQLite compartido y cada worker los reparte
+    # a sus clientes al leerlos. Los IDs son los de la tabla, así Last-Event-ID
+    # sirve aunque la reconexión caiga en otro worker. Las escrituras y
+    # lecturas van por un hilo propio (en orden): si otro worker tiene el
+    # archivo bloqueado, espera ese hilo y no el event loop.
+    def __init__(self, path: str, queue_size: int, history: int, poll: float):
+        super().__init__(queue_size, history)
+        self.history = history
+        self.poll = poll
+        self._task = None
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="events")
+        self._db = open_db(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event TEXT NOT NULL,
+                data TEXT NOT NULL
+            )
+        """)
+        self._db.commit()
+        # Lo último que quedó guardado sirve de historial desde el arranque
+        rows = self._db.execute("SELECT id, event, data FROM events ORDER BY id DESC LIMIT ?", (history,)).fetchall()
+        for row in reversed(rows):
+            self._deliver(*row)
+
+    def publish(self, event: str, data: dict):
+        if self._db is None:
+            return
+        self.published += 1
+        # Se reparte en la próxima lectura, en orden con los de los demás workers
+        self._io.submit(self._insert, event, json.dumps(data)).add_done_callback(self._insert_done)
+
+    def _insert(self, event: str, data: str):
+        with self._db:
+            event_id = self._db.execute("INSERT INTO events (event, data) VALUES (?, ?)", (event, data)).lastrowid
+            self._db.execute("DELETE FROM events WHERE id <= ?", (event_id - self.history,))
+
+    @staticmethod
+    def _insert_done(future):
+        if not future.cancelled() and future.exception() is not None:
+            log.warning("Error guardando un evento compartido: %s", future.exception())
+
+    def _fetch(self, last_id: int) -> list:
+        return self._db.execute(
+            "SELECT id, event, data FROM events WHERE id > ? ORDER BY id", (last_id,)
+        ).fetchall()
+
+    async def catch_up(self):
+        # El ID de una reconexión puede venir de otro worker que ya leyó
+        # eventos que acá todavía no
+        if self._db is None:
+            return
+        rows = await asyncio.get_running_loop().run_in_executor(self._io, self._fetch, self._last_id)
+        for row in rows:
+            if row[0] > self._last_id:  # Otra lectura pudo haberlo repartido ya
+                self._deliver(*row)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll)
+            try:
+                await self.catch_up()
+            except sqlite3.Error as e:
+                log.warning("Error leyendo eventos compartidos: %s", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        super().close()
+        if self._db is not None:
+            self._io.shutdown(wait=True)  # Los eventos que falten guardar
+            self._db.close()
+            self._db = None
+
+if SERVER_WORKERS > 1:
+    event_hub = SharedEventHub(os.path.join(DATA_DIR, "events.sqlite3"), EVENTS_QUEUE_SIZE, EVENTS_HISTORY, EVENTS_POLL)
+else:
+    event_hub = EventHub(EVENTS_QUEUE_SIZE, EVENTS_HISTORY)
+
+@app.get("/events")
+async def events(request: Request):
+    last_id = request.headers.get("last-event-id", "")
+    await event_hub.catch_up()
+    queue = event_hub.subscribe(int(last_id) if last_id.isdigit() else None)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"  # Espera de EventSource antes de reconectarse
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            event_hub.unsubscribe(queue)
+
+    # Sin buffer en proxies (nginx) ni cachés: cada evento sale enseguida
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
+
+# Endpoints de la API
+@app.get("/", response_class=HTMLResponse)
+async def index(request: Request):
+    # El shell cambia con cada versión de los assets: revalidar siempre
+    return asset_response(INDEX_PAGE, request, "no-cache")
+
+@app.get("/assets/{name}")
+async def assets(name: str, request: Request):
+    entry = HASHED_ASSETS.get(name)
+    if entry is not None:
+        return asset_response(entry, request, IMMUTABLE)
+    # Nombre sin hash (p. ej. desde código viejo): servir, pero revalidando
+    entry = ASSETS.get(name)
+    if entry is None:
+        return JSONResponse({"error": "No encontrado"}, status_code=404)
+    return asset_response(entry, request, "no-cache")
+
+# Normaliza lo que manda el frontend (URL o ID directo) a una URL watch?v=
+def canonical_url(url: str) -> str:
+    url = (url or "").strip()
+    # Si ya es una URL de YouTube válida, usarla directamente
+    if url.startswith(("https://www.youtube.com/watch?v=", "https://youtube.com/watch?v=", 
+                      "https://youtu.be/", "https://www.youtube.com/embed/", 
+                      "https://www.youtube.com/shorts/", "https://www.youtube.com/live/")):
+        return sanitize(url)
+    # Si no es una URL reconocida, intentar procesarla como un ID directo
+    if re.match(r'^[a-zA-Z0-9_-]{11}$', url):
+        return f"https://www.youtube.com/watch?v={url}"
+    raise ValueError(f"URL no válida: {url}")
+
+async def _extract_and_cache(sanitized_url: str, vid: str) -> dict:
+    info = await extract_executor.run(extractor.extract_audio, sanitized_url)
+    with timed(EXTRACT_STAGES, "cache_store"):
+        result = await asyncio.to_thread(
+            metadata_cache.put,
+            vid,
+            info.get("title") or "Sin título",
+            int(info.get("duration") or 0),
+            info["url"]
+        )
+    # Metadatos nuevos o URL renovada: avisar a todos los clientes
+    event_hub.publish("track", result)
+    return result
+
+async def resolve_audio(url: str) -> dict:
+    with timed(EXTRACT_STAGES, "sanitize"):
+        sanitized_url = canonical_url(url)
+        vid = video_id(sanitized_url)
+    log.debug("URL sanitizada: %s", sanitized_url)
+    
+    with timed(EXTRACT_STAGES, "cache_lookup"):
+        cached = await asyncio.to_thread(metadata_cache.get, vid)
+    if cached and cached["audio_url"]:
+        return cached
+    
+    # Si ya hay una extracción en curso para esta URL, esperar la misma
+    result = await extraction_flight.do(sanitized_url, lambda: _extract_and_cache(sanitized_url, vid))
+    return dict(result)
+
+@app.post("/extract_audio")
+async def extract_audio(request: Request):
+    try:
+        with timed(EXTRACT_STAGES, "total"):
+            data = await request.json()
+            url = data.get("url")
+            log.debug("URL recibida en extract_audio: %s", url)
+            result = await resolve_audio(url)
+            with timed(EXTRACT_STAGES, "serialize"):
+                return JSONResponse(result)
+    except Exception as e:
+        log.warning("Error en extract_audio: %s", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+# Resolución en lote para las listas de enlaces pegadas en add(): una sola
+# petición, IDs deduplicados y cada resultado enviado (NDJSON) al terminar
+BATCH_CONCURRENCY = int(os.environ.get("CHOCLOTUBE_BATCH_CONCURRENCY", str(EXTRACT_WORKERS)))
+
+@app.post("/extract_audio/batch")
+async def extract_audio_batch(request: Request):
+    try:
+        data = await request.json()
+        urls = data.get("urls")
+        if not isinstance(urls, list):
+            raise ValueError("Se esperaba una lista en 'urls'")
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    
+    ids, invalid = [], []
+    seen = set()
+    for url in urls:
+        try:
+            vid = video_id(canonical_url(str(url)))
+        except ValueError as e:
+            invalid.append({"input": url, "error": str(e)})
+            continue
+        if vid not in seen:
+            seen.add(vid)
+            ids.append(vid)
+    log.debug("Lote recibido: %d enlaces, %d IDs únicos", len(urls), len(ids))
+    
+    semaphore = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+    
+    async def resolve_one(vid: str) -> dict:
+        async with semaphore:
+            try:
+                return await resolve_audio(vid)
+            except Exception as e:
+                return {"id": vid, "error": str(e)}
+    
+    async def stream():
+        for item in invalid:
+            yield json.dumps(item) + "\n"
+        tasks = [asyncio.ensure_future(resolve_one(vid)) for vid in ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # Si el cliente se desconecta, no seguir extrayendo
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# Búsqueda paginada: por cada consulta se mantiene un cursor con el generador
+# perezoso de yt-dlp ("ytsearchN:" con process=False), así "cargar más" sólo
+# trae la página siguiente en vez de repetir la búsqueda desde cero
+SEARCH_MAX_RESULTS = 100
+SEARCH_CURSOR_TTL = 600
+SEARCH_CURSOR_SLOTS = 64
+
+def search_item(entry: dict) -> dict:
+    # Con extract_flat='in_playlist', tenemos acceso a la duración
+    duration = int(entry.get("duration") or 0)
+    duration_string = fmt(duration) if duration else "--:--"
+    return {
+        "id": entry["id"],
+        "title": entry.get("title") or "Sin título",
+        "duration": duration,
+        "duration_string": duration_string,
+        # Generar thumbnail automáticamente
+        "thumbnail": f"https://i.ytimg.com/vi/{entry['id']}/default.jpg"
+    }
+
+class SearchCursor:
+    def __init__(self, query: str):
+        self.query = query
+        self.results = []
+        self.exhausted = False
+        self.last_used = time.time()
+        self._lock = threading.Lock()
+        self._retired = False
+        self._search = None
+        self._entries = None
+
+    def _open(self):
+        self._search = extractor.search(self.query, SEARCH_MAX_RESULTS)
+        # Si el generador anterior falló a mitad, saltear lo que ya tenemos
+        self._entries = itertools.islice(self._search, len(self.results), None)
+
+    def page(self, offset: int, limit: int, on_result):
+        # Corre en el executor: entrega cada resultado apenas se parsea
+        with self._lock:
+            self.last_used = time.time()
+            for item in self.results[offset:offset + limit]:
+                on_result(item)
+            try:
+                while not self.exhausted and len(self.results) < offset + limit:
+                    if self._entries is None:
+                        self._open()
+                    entry = next(self._entries, None)
+                    if entry is None:
+                        self.exhausted = True
+                        break
+                    if not entry.get("id"):
+                        continue
+                    item = search_item(entry)
+                    self.results.append(item)
+                    if len(self.results) > offset:
+                        on_result(item)
+            except Exception:
+                self.close()  # La próxima página vuelve a abrir la búsqueda
+                raise
+            finally:
+                if self.exhausted or self._retired:
+                    self.close()
+            return not self.exhausted or len(self.results) > offset + limit
+
+    def retire(self):
+        # Sacado del almacén de cursores: cerrar ya, o al terminar la página en curso
+        self._retired = True
+        if self._lock.acquire(blocking=False):
+            try:
+                self.close()
+            finally:
+                self._lock.release()
+
+    def close(self):
+        self._entries = None
+        if self._search is not None:
+            self._search.close()  # Libera lo que tenga tomado el backend
+            self._search = None
+
+class SearchCursors:
+    def __init__(self, slots: int, ttl: int):
+        self.slots = slots
+        self.ttl = ttl
+        self._cursors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> SearchCursor:
+        with self._lock:
+            now = time.time()
+            for stale in [q for q, c in self._cursors.items() if c.last_used + self.ttl < now]:
+                self._cursors.pop(stale).retire()
+            cursor = self._cursors.get(query)
+            if cursor is None:
+                cursor = self._cursors[query] = SearchCursor(query)
+            self._cursors.move_to_end(query)
+            while len(self._cursors) > self.slots:
+                self._cursors.popitem(last=False)[1].retire()
+            return cursor
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": len(self._cursors)}
+
+    def close(self):
+        with self._lock:
+            while self._cursors:
+                self._cursors.popitem()[1].retire()
+
+search_cursors = SearchCursors(SEARCH_CURSOR_SLOTS, SEARCH_CURSOR_TTL)
+
+def store_search(cache_key: str, items: list, end: dict):
+    search_cache.put(cache_key, {"results": items, "end": end})
+    # Así agregar un resultado a la lista no necesita otra extracción sólo
+    # para saber título y duración
+    metadata_cache.remember_many(items)
+
+@app.post("/search_yt")
+async def search_yt(request: Request):
+    started = time.perf_counter()
+    try:
+        data = await request.json()
+        with timed(SEARCH_STAGES, "normalize"):
+            query = normalize_query(data.get("query"))
+        offset = max(0, int(data.get("offset") or 0))
+        limit = min(max(1, int(data.get("limit") or SEARCH_PAGE_SIZE)), SEARCH_MAX_PAGE_SIZE)
+        log.debug("Buscando: %s (desde %d, %d resultados)", query, offset, limit)
+        if not query:
+            raise ValueError("Búsqueda vacía")
+        if offset + limit > SEARCH_MAX_RESULTS:
+            raise ValueError(f"Máximo {SEARCH_MAX_RESULTS} resultados por búsqueda")
+    except Exception as e:
+        log.warning("Error en search_yt: %s", e)
+        return JSONResponse({"error": str(e)}, status_code=400)
+    
+    # Respuesta NDJSON: un resultado por línea a medida que se parsean y una
+    # última línea {"end": true, "next_offset", "has_more"}
+    cache_key = SearchCache.key(query, offset, limit)
+    with timed(SEARCH_STAGES, "cache_lookup"):
+        cached = await asyncio.to_thread(search_cache.get, cache_key)
+    if cached is not None:
+        with timed(SEARCH_STAGES, "serialize"):
+            lines = [json.dumps(item) + "\n" for item in cached["results"]]
+            lines.append(json.dumps(dict(cached["end"], end=True)) + "\n")
+        if METRICS_ENABLED:
+            SEARCH_STAGES.observe(time.perf_counter() - started, "total")
+        return StreamingResponse(iter(lines), media_type="application/x-ndjson")
+    
+    async def stream():
+        loop = asyncio.get_running_loop()
+        results = asyncio.Queue()
+        cursor = search_cursors.get(query)
+        job = asyncio.ensure_future(extract_executor.run(
+            cursor.page, offset, limit, lambda item: loop.call_soon_threadsafe(results.put_nowait, item)
+        ))
+        if METRICS_ENABLED:
+            page_started = time.perf_counter()
+            job.add_done_callback(lambda _: SEARCH_STAGES.observe(time.perf_counter() - page_started, "page"))
+        # El None llega después de todos los resultados encolados por el hilo
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(results.put_nowait, None))
+        
+        items = []
+        while (item := await results.get()) is not None:
+            if not items and METRICS_ENABLED:
+                SEARCH_STAGES.observe(time.perf_counter() - started, "first_result")
+            items.append(item)
+            yield json.dumps(item) + "\n"
+        
+        try:
+            has_more = job.result()
+        except Exception as e:
+            log.warning("Error en search_yt: %s", e)
+            yield json.dumps({"error": str(e)}) + "\n"
+            return
+        end = {
+            "next_offset": offset + len(items),
+            "has_more": has_more and offset + len(items) < SEARCH_MAX_RESULTS
+        }
+        log.debug("Resultados procesados: %d", len(items))
+        with timed(SEARCH_STAGES, "cache_store"):
+            await asyncio.to_thread(store_search, cache_key, items, end)
+        if METRICS_ENABLED:
+            SEARCH_STAGES.observe(time.perf_counter() - started, "total")
+        yield json.dumps(dict(end, end=True)) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# Importar una lista o mix de YouTube: extracción plana (sólo ID, título y
+# duración de cada entrada, sin resolver ningún video) y cada página enviada
+# como NDJSON apenas llega, con una última línea {"end": true, "count",
+# "truncated"}. El audio de cada pista se resuelve recién cuando se acerca su
+# turno (ver UrlRefresher) o al reproducirla.
+PLAYLIST_IMPORT_PAGE = 100
+
+@app.post("/import_playlist")
+async def import_playlist(request: Request):
+    try:
+        data = await request.json()
+        url = playlist_url(str(data.get("url") or ""))
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    log.debug("Importando lista: %s", url)
+    entries = extractor.playlist(url)
+
+    def next_page() -> list:
+        # Corre en el executor: el generador pide a YouTube la página siguiente
+        items = []
+        for entry in entries:
+            if entry.get("id"):
+                items.append({"id": entry["id"], "title": entry.get("title") or "Sin título",
+                              "duration": int(entry.get("duration") or 0)})
+                if len(items) == PLAYLIST_IMPORT_PAGE:
+                    break
+        if items:
+            # Así agregar las pistas a una lista guardada ya las encuentra descritas
+            metadata_cache.remember_many(items)
+        return items
+
+    async def stream():
+        count = 0
+        job = None
+        try:
+            while count < PLAYLIST_MAX_TRACKS:
+                # shield: si el cliente se va a mitad de una página, el hilo
+                # termina igual y recién ahí se cierra el generador (abajo)
+                job = asyncio.ensure_future(extract_executor.run(next_page))
+                items = await asyncio.shield(job)
+                if not items:
+                    break
+                items = items[:PLAYLIST_MAX_TRACKS - count]
+                count += len(items)
+                yield "".join(json.dumps(item) + "\n" for item in items)
+        except Exception as e:
+            log.warning("Error importando %s: %s", url, e)
+            yield json.dumps({"error": str(e), "count": count}) + "\n"
+            return
+        finally:
+            # Libera el YoutubeDL que el generador tiene tomado
+            if job is not None and not job.done():
+                job.add_done_callback(lambda _: entries.close())
+            else:
+                entries.close()
+        log.debug("Lista importada: %d pistas", count)
+        yield json.dumps({"end": True, "count": count, "truncated": count >= PLAYLIST_MAX_TRACKS}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# Listas de reproducción guardadas en el servidor (SQLite). El frontend manda
+# sólo los cambios (parches con operaciones add/remove/move/rename/clear sobre
+# IDs de video) y cada parche sube la versión de la lista; otro cliente pide
+# los cambios desde la versión que tiene. El orden es un "pos" REAL: mover o
+# insertar una pista toca una sola fila, aunque la lista tenga miles.
+PLAYLIST_MAX_TRACKS = 10000
+PLAYLIST_OPS_KEPT = 500  # Parches que se conservan para sincronizar
+
+class PlaylistError(ValueError):
+    pass
+
+class PlaylistStore:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = open_db(path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS playlists (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS playlist_tracks (
+                playlist_id INTEGER NOT NULL,
+                track_id TEXT NOT NULL,
+                pos REAL NOT NULL,
+                PRIMARY KEY (playlist_id, track_id)
+            );
+            CREATE INDEX IF NOT EXISTS playlist_tracks_pos ON playlist_tracks (playlist_id, pos);
+            CREATE TABLE IF NOT EXISTS playlist_ops (
+                playlist_id INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                ops TEXT NOT NULL,
+                PRIMARY KEY (playlist_id, version)
+            );
+        """)
+        self._db.commit()
+
+    def list(self) -> list:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT p.id, p.name, p.version, "
+                "(SELECT COUNT(*) FROM playlist_tracks t WHERE t.playlist_id = p.id) "
+                "FROM playlists p ORDER BY p.id"
+            ).fetchall()
+        return [{"id": r[0], "name": r[1], "version": r[2], "tracks": r[3]} for r in rows]
+
+    def create(self, name: str) -> dict:
+        with self._lock, self._db:
+            cur = self._db.execute("INSERT INTO playlists (name, updated) VALUES (?, ?)", (name, time.time()))
+        return {"id": cur.lastrowid, "name": name, "version": 0, "tracks": 0}
+
+    def delete(self, pid: int) -> bool:
+        with self._lock, self._db:
+            cur = self._db.execute("DELETE FROM playlists WHERE id = ?", (pid,))
+            self._db.execute("DELETE FROM playlist_tracks WHERE playlist_id = ?", (pid,))
+            self._db.execute("DELETE FROM playlist_ops WHERE playlist_id = ?", (pid,))
+        return cur.rowcount > 0
+
+    def _header(self, pid: int):
+        row = self._db.execute("SELECT name, version FROM playlists WHERE id = ?", (pid,)).fetchone()
+        if row is None:
+            raise KeyError(pid)
+        return row
+
+    def _track_ids(self, pid: int) -> list:
+        return [r[0] for r in self._db.execute(
+            "SELECT track_id FROM playlist_tracks WHERE playlist_id = ? ORDER BY pos", (pid,)
+        )]
+
+    def get(self, pid: int) -> dict:
+        # Lanza KeyError si la lista no existe
+        with self._lock:
+            name, version = self._header(pid)
+            return {"id": pid, "name": name, "version": version, "track_ids": self._track_ids(pid)}
+
+    def changes(self, pid: int, since: int) -> dict:
+        # Parches posteriores a `since`, o None si ya no se conservan todos
+        # (el cliente tiene que recargar la lista entera)
+        with self._lock:
+            name, version = self._header(pid)
+            rows = self._db.execute(
+                "SELECT version, ops FROM playlist_ops WHERE playlist_id = ? AND version > ? ORDER BY version",
+                (pid, since)
+            ).fetchall()
+        if since > version or (rows and rows[0][0] != since + 1) or (not rows and since != version):
+            return None
+        return {"id": pid, "name": name, "version": version,
+                "patches": [{"version": v, "ops": json.loads(ops)} for v, ops in rows]}
+
+    def _pos(self, pid: int, tid: str):
+        row = self._db.execute(
+            "SELECT pos FROM playlist_tracks WHERE playlist_id = ? AND track_id = ?", (pid, tid)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _gap(self, pid: int, after, exclude: str = None):
+        # Posiciones (a, b) entre las que hay que insertar: justo después de
+        # `after` (None = al principio); b es None si no hay nada después
+        a = self._pos(pid, after) if after is not None else None
+        if after is not None and a is None:
+            raise PlaylistError(f"La pista {after} no está en la lista")
+        row = self._db.execute(
+            "SELECT MIN(pos) FROM playlist_tracks WHERE playlist_id = ? AND pos > ? AND track_id != ?",
+            (pid, a if a is not None else float("-inf"), exclude or "")
+        ).fetchone()
+        return (a if a is not None else 0.0), row[0]
+
+    def _last(self, pid: int, exclude: str = None):
+        row = self._db.execute(
+            "SELECT track_id FROM playlist_tracks WHERE playlist_id = ? AND track_id != ? ORDER BY pos DESC LIMIT 1",
+            (pid, exclude or "")
+        ).fetchone()
+        return row[0] if row else None
+
+    def _previous(self, pid: int, tid: str, exclude: str = None):
+        pos = self._pos(pid, tid)
+        if pos is None:
+            raise PlaylistError(f"La pista {tid} no está en la lista")
+        row = self._db.execute(
+            "SELECT track_id FROM playlist_tracks WHERE playlist_id = ? AND pos < ? AND track_id != ? "
+            "ORDER BY pos DESC LIMIT 1", (pid, pos, exclude or "")
+        ).fetchone()
+        return row[0] if row else None
+
+    def _renumber(self, pid: int):
+        # Los huecos entre posiciones se agotaron: volver a 1, 2, 3...
+        self._db.executemany(
+            "UPDATE playlist_tracks SET pos = ? WHERE playlist_id = ? AND track_id = ?",
+            [(i + 1, pid, tid) for i, tid in enumerate(self._track_ids(pid))]
+        )
+
+    def _positions(self, pid: int, after, count: int, exclude: str = None) -> list:
+        for attempt in range(2):
+            a, b = self._gap(pid, after, exclude)
+            if b is None:
+                return [a + i + 1 for i in range(count)]
+            step = (b - a) / (count + 1)
+            if step > 1e-9 or attempt:
+                return [a + step * (i + 1) for i in range(count)]
+            self._renumber(pid)
+
+    @staticmethod
+    def _check(op: dict) -> dict:
+        # Valida y convierte las pistas de un "add" antes de escribir nada:
+        # un dato malo rechaza el parche entero como PlaylistError (400)
+        if op.get("op") != "add":
+            return op
+        tracks = []
+        for track in op.get("tracks") or []:
+            if not isinstance(track, dict):
+                track = {"id": track}
+            tid = str(track.get("id"))
+            if not re.match(r"^[a-zA-Z0-9_-]{11}$", tid):
+                raise PlaylistError(f"ID no válido: {tid}")
+            try:
+                duration = int(track.get("duration") or 0)
+            except (TypeError, ValueError):
+                raise PlaylistError(f"Duración no válida para {tid}: {track.get('duration')!r}")
+            title = track.get("title")
+            tracks.append({"id": tid, "title": str(title) if title else None, "duration": max(0, duration)})
+        return dict(op, tracks=tracks)
+
+    def _apply(self, pid: int, op: dict) -> dict:
+        kind = op.get("op")
+        if kind == "add":
+            # {"op": "add", "tracks": [{"id", "title"?, "duration"?}], "after": id | null}
+            # Sin "after" se agrega al final; con "after": null, al principio.
+            # Las pistas ya pasaron por _check
+            tracks, seen = [], set()
+            for track in op["tracks"]:
+                if track["id"] not in seen and self._pos(pid, track["id"]) is None:
+                    seen.add(track["id"])
+                    tracks.append(track)
+            if not tracks:
+                return None
+            after = op["after"] if "after" in op else self._last(pid)
+            if after is not None and self._pos(pid, after) is None:
+                # La pista de referencia ya la quitó otro cliente: al final
+                after = self._last(pid)
+            positions = self._positions(pid, after, len(tracks))
+            self._db.executemany(
+                "INSERT INTO playlist_tracks (playlist_id, track_id, pos) VALUES (?, ?, ?)",
+                [(pid, t["id"], pos) for t, pos in zip(tracks, positions)]
+            )
+            count = self._db.execute("SELECT COUNT(*) FROM playlist_tracks WHERE playlist_id = ?", (pid,)).fetchone()[0]
+            if count > PLAYLIST_MAX_TRACKS:
+                raise PlaylistError(f"Máximo {PLAYLIST_MAX_TRACKS} pistas por lista")
+            return {"op": "add", "tracks": [t["id"] for t in tracks], "after": after}
+        if kind == "remove":
+            ids = [str(tid) for tid in op.get("ids") or [] if self._pos(pid, str(tid)) is not None]
+            if not ids:
+                return None
+            self._db.executemany(
+                "DELETE FROM playlist_tracks WHERE playlist_id = ? AND track_id = ?", [(pid, tid) for tid in ids]
+            )
+            return {"op": "remove", "ids": ids}
+        if kind == "move":
+            # {"op": "move", "id": X, "before": Y | null}: X queda justo antes
+            # de Y (null = al final), que es lo que informa Sortable en onEnd
+            tid, before = str(op.get("id")), op.get("before")
+            # Otro cliente ya quitó la pista o la de referencia: no se mueve
+            if self._pos(pid, tid) is None or (before is not None and self._pos(pid, before) is None):
+                return None
+            if before == tid:
+                return None
+            after = self._previous(pid, before, tid) if before is not None else self._last(pid, tid)
+            if after == tid:
+                return None
+            pos = self._positions(pid, after, 1, tid)[0]
+            self._db.execute(
+                "UPDATE playlist_tracks SET pos = ? WHERE playlist_id = ? AND track_id = ?", (pos, pid, tid)
+            )
+            return {"op": "move", "id": tid, "before": before}
+        if kind == "rename":
+            name = str(op.get("name") or "").strip()
+            if not name:
+                raise PlaylistError("Nombre vacío")
+            self._db.execute("UPDATE playlists SET name = ? WHERE id = ?", (name, pid))
+            return {"op": "rename", "name": name}
+        if kind == "clear":
+            self._db.execute("DELETE FROM playlist_tracks WHERE playlist_id = ?", (pid,))
+            return {"op": "clear"}
+        raise PlaylistError(f"Operación desconocida: {kind}")
+
+    def patch(self, pid: int, ops: list) -> tuple:
+        # Aplica todas las operaciones o ninguna; devuelve la nueva versión y
+        # las operaciones tal como quedaron (las que no cambiaron nada no van).
+        # Las que apuntan a pistas que otro cliente ya quitó se saltean: sólo
+        # una operación mal formada rechaza el parche entero
+        with self._lock:
+            try:
+                ops = [self._check(op) for op in ops]
+                with self._db:
+                    # Tomar el bloqueo de escritura antes de leer la versión:
+                    # otro worker puede estar parchando la misma lista
+                    self._db.execute("BEGIN IMMEDIATE")
+                    _, version = self._header(pid)
+                    applied = [a for a in (self._apply(pid, op) for op in ops) if a is not None]
+                    if not applied:
+                        return version, []
+                    version += 1
+                    self._db.execute(
+                        "UPDATE playlists SET version = ?, updated = ? WHERE id = ?", (version, time.time(), pid)
+                    )
+                    self._db.execute(
+                        "INSERT INTO playlist_ops (playlist_id, version, ops) VALUES (?, ?, ?)",
+                        (pid, version, json.dumps(applied))
+                    )
+                    self._db.execute(
+                        "DELETE FROM playlist_ops WHERE playlist_id = ? AND version <= ?",
+                        (pid, version - PLAYLIST_OPS_KEPT)
+                    )
+            except (AttributeError, TypeError, KeyError) as e:
+                if isinstance(e, KeyError) and e.args == (pid,):
+                    raise
+                raise PlaylistError(f"Operación mal formada: {e}")
+        # Título y duración conocidos (p. ej. de la búsqueda): así la lista se
+        # puede mostrar al recargar sin extraer nada. Va en otra base, así que
+        # recién cuando el parche ya quedó guardado
+        added = {tid for op in applied if op["op"] == "add" for tid in op["tracks"]}
+        known = {t["id"]: t for op in ops if op.get("op") == "add" for t in op["tracks"]
+                 if t["id"] in added and t["title"] and t["duration"]}
+        if known:
+            metadata_cache.remember_many(list(known.values()))
+        return version, applied
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+playlist_store = PlaylistStore(os.path.join(DATA_DIR, "playlists.sqlite3"))
+
+def playlist_payload(playlist: dict) -> dict:
+    # Las pistas van con el título y la duración ya conocidos; las que no
+    # están en la caché llegan con title null y el frontend las resuelve
+    known = metadata_cache.describe_many(playlist["track_ids"])
+    tracks = [dict(known.get(tid) or {"title": None, "duration": 0}, id=tid) for tid in playlist["track_ids"]]
+    return {"id": playlist["id"], "name": playlist["name"], "version": playlist["version"], "tracks": tracks}
+
+def load_playlist(pid: int) -> dict:
+    return playlist_payload(playlist_store.get(pid))
+
+def load_playlist_changes(pid: int, since: int) -> dict:
+    changes = playlist_store.changes(pid, since)
+    if changes is None:
+        # Demasiado atrás: mandar la lista entera
+        return dict(load_playlist(pid), reset=True)
+    for patch in changes["patches"]:
+        patch["ops"] = describe_ops(patch["ops"])
+    return changes
+
+def describe_ops(ops: list) -> list:
+    # En el registro los "add" guardan sólo IDs; para mandarlos a otro
+    # cliente se completan con lo que haya en la caché de metadatos
+    ids = [tid for op in ops if op["op"] == "add" for tid in op["tracks"]]
+    if not ids:
+        return ops
+    known = metadata_cache.describe_many(ids)
+    return [
+        dict(op, tracks=[dict(known.get(tid) or {"title": None, "duration": 0}, id=tid) for tid in op["tracks"]])
+        if op["op"] == "add" else op
+        for op in ops
+    ]
+
+@app.get("/playlists")
+async def list_playlists():
+    return JSONResponse({"playlists": await asyncio.to_thread(playlist_store.list)})
+
+@app.post("/playlists")
+async def create_playlist(request: Request):
+    try:
+        data = await request.json()
+        name = str(data.get("name") or "").strip() or "Mi lista"
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse(await asyncio.to_thread(playlist_store.create, name), status_code=201)
+
+@app.get("/playlists/{pid}")
+async def get_playlist(pid: int):
+    try:
+        return JSONResponse(await asyncio.to_thread(load_playlist, pid))
+    except KeyError:
+        return JSONResponse({"error": f"Lista no encontrada: {pid}"}, status_code=404)
+
+@app.get("/playlists/{pid}/changes")
+async def playlist_changes(pid: int, since: int = 0):
+    try:
+        return JSONResponse(await asyncio.to_thread(load_playlist_changes, pid, since))
+    except KeyError:
+        return JSONResponse({"error": f"Lista no encontrada: {pid}"}, status_code=404)
+
+@app.patch("/playlists/{pid}")
+async def patch_playlist(pid: int, request: Request):
+    try:
+        data = await request.json()
+        ops = data.get("ops")
+        if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+            raise PlaylistError("Se esperaba una lista de operaciones en 'ops'")
+        version, applied = await asyncio.to_thread(playlist_store.patch, pid, ops)
+    except KeyError:
+        return JSONResponse({"error": f"Lista no encontrada: {pid}"}, status_code=404)
+    except Exception as e:
+        log.warning("Error en patch_playlist: %s", e)
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if applied:
+        # "client" es el ID que manda cada pestaña: así reconoce sus propios
+        # cambios y no los vuelve a aplicar
+        described = await asyncio.to_thread(describe_ops, applied)
+        event_hub.publish("playlist", {
+            "id": pid, "version": version, "ops": described, "client": data.get("client"),
+        })
+    return JSONResponse({"id": pid, "version": version})
+
+@app.delete("/playlists/{pid}")
+async def delete_playlist(pid: int):
+    if not await asyncio.to_thread(playlist_store.delete, pid):
+        return JSONResponse({"error": f"Lista no encontrada: {pid}"}, status_code=404)
+    return JSONResponse({"id": pid, "deleted": True})
+
+# Caché local de audio (opcional): cada audio que pasa completo por /stream se
+# guarda en downloads/ y las siguientes reproducciones se sirven desde disco.
+# El espacio usado se limita con desalojo LRU y un índice SQLite (compartido
+# por los workers) evita tener que recorrer la carpeta al reiniciar. El índice
+# y las descargas a medias van en DATA_DIR: downloads/ se sirve tal cual por
+# /downloads y ahí sólo tienen que quedar audios completos.
+DOWNLOADS_DIR = "downloads"
+DISK_CACHE_INDEX = os.path.join(DATA_DIR, "audio_index.sqlite3")
+DISK_CACHE_PARTS_DIR = os.path.join(DATA_DIR, "audio-parts")
+DISK_CACHE_ENABLED = os.environ.get("CHOCLOTUBE_DISK_CACHE", "0") == "1"
+DISK_CACHE_BYTES = int(os.environ.get("CHOCLOTUBE_DISK_CACHE_MB", "2048")) * 1024 * 1024
+AUDIO_EXTENSIONS = {"audio/webm": ".webm", "audio/mp4": ".m4a", "audio/mpeg": ".mp3", "audio/ogg": ".ogg"}
+
+class AudioDiskCache:
+    ACCESS_RESOLUTION = 30  # Segundos: accesos más seguidos no reescriben la fila
+
+    def __init__(self, directory: str, budget: int, index_path: str, parts_dir: str):
+        self.directory = directory
+        self.budget = budget
+        self.parts_dir = parts_dir
+        os.makedirs(directory, exist_ok=True)
+        os.makedirs(parts_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = open_db(index_path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS audio (
+                id TEXT PRIMARY KEY,
+                file TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                content_type TEXT NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS audio_last_access ON audio (last_access)")
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def used_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM audio").fetchone()[0]
+
+    def lookup(self, vid: str):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT file, size, content_type, last_access FROM audio WHERE id = ?", (vid,)
+            ).fetchone()
+            if row is not None and not os.path.exists(os.path.join(self.directory, row[0])):
+                # Borrado a mano desde fuera de la aplicación (o desalojado por otro worker)
+                self._db.execute("DELETE FROM audio WHERE id = ?", (vid,))
+                self._db.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            now = time.time()
+            if now - row[3] > self.ACCESS_RESOLUTION:
+                self._db.execute("UPDATE audio SET last_access = ? WHERE id = ?", (now, vid))
+                self._db.commit()
+            return {"file": row[0], "size": row[1], "content_type": row[2], "last_access": now,
+                    "path": os.path.join(self.directory, row[0])}
+
+    def contains(self, vid: str) -> bool:
+        # Sin contar acierto/fallo ni tocar el último acceso (p. ej. la precarga)
+        with self._lock:
+            row = self._db.execute("SELECT file FROM audio WHERE id = ?", (vid,)).fetchone()
+        return row is not None and os.path.exists(os.path.join(self.directory, row[0]))
+
+    def open_part(self, vid: str):
+        # Archivo temporal propio de cada descarga, por si dos se solapan
+        path = os.path.join(self.parts_dir, f"{vid}.{os.getpid()}.{threading.get_ident()}.{time.monotonic_ns()}.part")
+        return path, open(path, "wb")
+
+    def commit(self, vid: str, part_path: str, size: int, content_type: str):
+        if size > self.budget:
+            os.remove(part_path)
+            return
+        name = vid + AUDIO_EXTENSIONS.get(content_type.split(";")[0].strip(), ".bin")
+        try:
+            os.replace(part_path, os.path.join(self.directory, name))
+        except OSError:
+            # DATA_DIR en otro disco que downloads/: no se puede renombrar
+            shutil.move(part_path, os.path.join(self.directory, name))
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute(
+                "INSERT OR REPLACE INTO audio (id, file, size, content_type, last_access) VALUES (?, ?, ?, ?, ?)",
+                (vid, name, size, content_type, time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        used = self.used_bytes()
+        if used <= self.budget:
+            return
+        for vid, name, size in self._db.execute("SELECT id, file, size FROM audio ORDER BY last_access").fetchall():
+            if used <= self.budget:
+                break
+            self._db.execute("DELETE FROM audio WHERE id = ?", (vid,))
+            used -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass  # En uso (Windows) o ya borrado
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, used = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM audio").fetchone()
+            return {
+                "enabled": True,
+                "entries": entries,
+                "used_bytes": used,
+                "budget_bytes": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / (self.hits + self.misses), 3) if self.hits + self.misses else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+audio_disk_cache = AudioDiskCache(
+    DOWNLOADS_DIR, DISK_CACHE_BYTES, DISK_CACHE_INDEX, DISK_CACHE_PARTS_DIR
+) if DISK_CACHE_ENABLED else None
+
+def parse_range(header: str, size: int):
+    # Devuelve (inicio, fin) inclusive, None si no hay Range, o ValueError si
+    # el rango no se puede satisfacer
+    m = re.match(r"^bytes=(\d*)-(\d*)$", (header or "").strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if not m.group(1):
+        start, end = max(0, size - int(m.group(2))), size - 1
+    else:
+        start = int(m.group(1))
+        end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    if start >= size or start > end:
+        raise ValueError("Rango no satisfacible")
+    return start, end
+
+def serve_cached_audio(entry: dict, range_header: str):
+    size = entry["size"]
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    start, end = byte_range or (0, size - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Type": entry["content_type"],
+        "Content-Length": str(end - start + 1),
+        "Cache-Control": "no-store",
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    def read_file():
+        # Generador síncrono: Starlette lo recorre en su threadpool
+        with open(entry["path"], "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    
+    return StreamingResponse(read_file(), status_code=206 if byte_range else 200, headers=headers)
+
+# Proxy de audio con soporte de Range: el <audio> reproduce /stream/<ID> y el
+# servidor reenvía los bytes desde googlevideo. Si la conexión se corta a
+# mitad de la reproducción, se reabre desde el mismo byte (con la misma URL, o
+# con una nueva si la vieja venció), sin que el navegador se entere.
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_MAX_RESUMES = int(os.environ.get("CHOCLOTUBE_STREAM_MAX_RESUMES", "3"))
+UPSTREAM_EXPIRED = (403, 404, 410)
+
+stream_stats = {"active": 0, "bytes_proxied": 0, "resumes": 0, "errors": 0}
+_http_client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    # Cliente HTTP compartido: reutiliza conexiones TLS con googlevideo
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, read=30.0),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+            follow_redirects=True,
+        )
+    return _http_client
+
+def parse_content_range(value: str):
+    # "bytes 0-1023/4096" -> (0, 1023, 4096); el total puede ser "*"
+    m = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", value or "")
+    if not m:
+        return None
+    total = int(m.group(3)) if m.group(3) != "*" else None
+    return int(m.group(1)), int(m.group(2)), total
+
+async def open_upstream(vid: str, range_header: str):
+    # Abre la respuesta de googlevideo; si la URL ya no sirve, re-extraer una vez
+    for attempt in range(2):
+        info = await resolve_audio(vid)
+        client = get_http_client()
+        request = client.build_request("GET", info["audio_url"], headers={"Range": range_header})
+        response = await client.send(request, stream=True)
+        if response.status_code not in UPSTREAM_EXPIRED or attempt == 1:
+            return response
+        await response.aclose()
+        log.info("URL de audio vencida para %s (%d), re-extrayendo", vid, response.status_code)
+        await asyncio.to_thread(metadata_cache.expire_url, vid)
+        prefetch_buffer.discard(vid)
+
+async def resume_upstream(vid: str, url: str, offset: int, end: int, total):
+    # Reabre [offset, end] después de un corte. Primero la misma URL: un corte
+    # de red no la invalida. Sólo si googlevideo la rechaza se re-extrae. La
+    # respuesta tiene que seguir el mismo archivo desde el mismo byte; si no,
+    # None (no mezclar bytes de dos archivos)
+    range_header = f"bytes={offset}-{end}"
+    client = get_http_client()
+    response = await client.send(client.build_request("GET", url, headers={"Range": range_header}), stream=True)
+    if response.status_code in UPSTREAM_EXPIRED:
+        await response.aclose()
+        log.info("URL de audio vencida para %s (%d), re-extrayendo", vid, response.status_code)
+        await asyncio.to_thread(metadata_cache.expire_url, vid)
+        prefetch_buffer.discard(vid)
+        response = await open_upstream(vid, range_header)
+    content_range = parse_content_range(response.headers.get("content-range"))
+    if response.status_code != 206 or not content_range or content_range[0] != offset or content_range[2] != total:
+        log.warning("Stream %s: la reanudación no coincide (%d, %s)", vid, response.status_code,
+                    response.headers.get("content-range"))
+        await response.aclose()
+        return None
+    return response
+
+async def relay_upstream(vid: str, response, start: int, end, total):
+    # Reenvía los bytes [start, end] de la respuesta; si se corta antes de
+    # tiempo, la reabre (ver resume_upstream) y sigue desde el mismo offset
+    sent = 0
+    resumes = 0
+    stream_stats["active"] += 1
+    try:
+        while True:
+            try:
+                # aiter_raw sin tamaño de bloque: los bytes se reenvían tal
+                # cual llegan, sin decodificar ni juntarlos en un buffer que
+                # se perdería si la conexión se corta
+                async for chunk in response.aiter_raw():
+                    sent += len(chunk)
+                    stream_stats["bytes_proxied"] += len(chunk)
+                    yield chunk
+            except httpx.HTTPError as e:
+                log.info("Stream %s cortado en el byte %d: %s", vid, start + sent, e)
+            await response.aclose()
+            
+            if end is None or start + sent > end or resumes >= STREAM_MAX_RESUMES:
+                break
+            
+            # Faltan bytes: seguir desde el mismo offset
+            resumes += 1
+            stream_stats["resumes"] += 1
+            try:
+                response = await resume_upstream(vid, str(response.request.url), start + sent, end, total)
+            except Exception as e:
+                log.warning("Stream %s: no se pudo reanudar: %s", vid, e)
+                response = None
+            if response is None:
+                # Los encabezados ya salieron: cortar la respuesta incompleta
+                stream_stats["errors"] += 1
+                break
+    finally:
+        stream_stats["active"] -= 1
+        if response is not None:
+            await response.aclose()
+
+async def tee_to_disk(vid: str, chunks, total: int, content_type: str):
+    # Guarda en la caché de disco lo que pasa por el stream, si llega completo
+    part_path, part_file = audio_disk_cache.open_part(vid)
+    written = 0
+    try:
+        async for chunk in chunks:
+            part_file.write(chunk)
+            written += len(chunk)
+            yield chunk
+    finally:
+        part_file.close()
+        if written == total:
+            await asyncio.to_thread(audio_disk_cache.commit, vid, part_path, written, content_type)
+        else:
+            os.remove(part_path)  # Incompleto (el cliente cortó): descartar
+
+def stream_headers(content_type: str, start: int, end, total, partial: bool):
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Type": content_type,
+        "Cache-Control": "no-store",
+    }
+    if end is not None:
+        headers["Content-Length"] = str(end - start + 1)
+    if partial:
+        headers["Content-Range"] = f"bytes {start}-{end}/{total if total is not None else '*'}"
+    return headers
+
+# Precarga de la siguiente pista: cuando empieza a sonar una pista, el
+# frontend avisa cuál sigue; el servidor resuelve su URL y baja los primeros
+# KB a memoria, así el salto a la siguiente arranca sin esperar a YouTube.
+# Los KB precargados quedan en la memoria de un proceso y /stream puede caer
+# en otro: con varios workers la precarga no se usa.
+PREFETCH_BYTES = int(os.environ.get("CHOCLOTUBE_PREFETCH_KB", "384")) * 1024
+PREFETCH_SLOTS = 4
+PREFETCH_ENABLED = SERVER_WORKERS <= 1
+
+class PrefetchBuffer:
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._buffers = OrderedDict()  # vid -> {"data", "total", "content_type"}
+        self._pending = {}
+        self.hits = 0
+        self.started = 0
+
+    def get(self, vid: str):
+        entry = self._buffers.get(vid)
+        if entry is not None:
+            self._buffers.move_to_end(vid)
+        return entry
+
+    def discard(self, vid: str):
+        self._buffers.pop(vid, None)
+
+    def schedule(self, vid: str):
+        if vid in self._buffers or vid in self._pending:
+            return
+        self.started += 1
+        task = asyncio.ensure_future(self._fill(vid))
+        self._pending[vid] = task
+        task.add_done_callback(lambda t: self._pending.pop(vid, None))
+
+    async def _fill(self, vid: str):
+        if audio_disk_cache is not None and await asyncio.to_thread(audio_disk_cache.contains, vid):
+            return  # Ya está en disco, nada que precargar
+        try:
+            response = await open_upstream(vid, f"bytes=0-{PREFETCH_BYTES - 1}")
+            try:
+                content_range = parse_content_range(response.headers.get("content-range"))
+                if response.status_code != 206 or not content_range or not content_range[2]:
+                    return
+                data = await response.aread()
+            finally:
+                await response.aclose()
+        except Exception as e:
+            log.warning("Error precargando %s: %s", vid, e)
+            event_hub.publish("prefetch", {"id": vid, "status": "error"})
+            return
+        self._buffers[vid] = {
+            "data": data,
+            "total": content_range[2],
+            "content_type": response.headers.get("content-type", "audio/webm"),
+        }
+        while len(self._buffers) > self.slots:
+            self._buffers.popitem(last=False)
+        event_hub.publish("prefetch", {"id": vid, "status": "ready"})
+
+    def stats(self) -> dict:
+        return {
+            "enabled": PREFETCH_ENABLED,
+            "buffered": len(self._buffers),
+            "pending": len(self._pending),
+            "started": self.started,
+            "hits": self.hits,
+        }
+
+prefetch_buffer = PrefetchBuffer(PREFETCH_SLOTS)
+
+def serve_prefetched(vid: str, warm: dict, client_range: str):
+    data, total = warm["data"], warm["total"]
+    try:
+        byte_range = parse_range(client_range, total)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{total}"})
+    start, end = byte_range or (0, total - 1)
+    if start >= len(data):
+        return None  # El rango pedido no está en memoria
+    headers = stream_headers(warm["content_type"], start, end, total, byte_range is not None)
+    
+    async def body():
+        # Pedir el resto mientras se envía lo que ya está en memoria
+        rest = None
+        if end >= len(data):
+            rest = asyncio.ensure_future(open_upstream(vid, f"bytes={len(data)}-{end}"))
+        try:
+            yield data[start:end + 1]
+            if rest is None:
+                return
+            response = await rest
+            rest = None
+            content_range = parse_content_range(response.headers.get("content-range"))
+            if (response.status_code != 206 or not content_range
+                    or content_range[0] != len(data) or content_range[2] != total):
+                # La URL nueva apunta a otro archivo: no mezclar bytes
+                await response.aclose()
+                prefetch_buffer.discard(vid)
+                stream_stats["errors"] += 1
+                return
+            async for chunk in relay_upstream(vid, response, len(data), end, total):
+                yield chunk
+        finally:
+            if rest is not None:
+                rest.cancel()
+    
+    chunks = body()
+    # Como en stream_audio: el <audio> siempre pide "bytes=0-"
+    if audio_disk_cache is not None and start == 0 and end == total - 1:
+        chunks = tee_to_disk(vid, chunks, total, warm["content_type"])
+    prefetch_buffer.hits += 1
+    return StreamingResponse(chunks, status_code=206 if byte_range else 200, headers=headers)
+
+@app.post("/prefetch")
+async def prefetch(request: Request):
+    try:
+        data = await request.json()
+        vid = video_id(canonical_url(data.get("id") or data.get("url")))
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if not PREFETCH_ENABLED:
+        return JSONResponse({"id": vid, "status": "disabled"}, status_code=202)
+    prefetch_buffer.schedule(vid)
+    return JSONResponse({"id": vid, "status": "scheduled"}, status_code=202)
+
+# Renovación de URLs en segundo plano: las URLs de googlevideo vencen a las
+# pocas horas y en una sesión larga las pistas de más adelante llegarían a
+# reproducirse con una URL muerta (y una extracción en el momento). Cada
+# pestaña informa en /queue las próximas pistas de su cola; estas se renuevan
+# un rato antes de vencer (REFRESH_LEAD, con un corrimiento al azar para que
+# las que se resolvieron juntas no venzan juntas), de a una cada
+# REFRESH_INTERVAL segundos y sólo cuando no hay extracciones de usuarios
+# esperando. Cada URL nueva llega a los clientes como evento "track". Las
+# colas se guardan en memoria y cada informe puede caer en otro worker (que
+# seguiría renovando una cola vieja por horas): con varios workers no se usa.
+REFRESH_ENABLED = SERVER_WORKERS <= 1
+REFRESH_LEAD = int(os.environ.get("CHOCLOTUBE_REFRESH_LEAD", "900"))
+REFRESH_INTERVAL = float(os.environ.get("CHOCLOTUBE_REFRESH_INTERVAL", "2"))
+REFRESH_RETRY = 300          # Segundos antes de reintentar una renovación fallida
+REFRESH_QUEUE_TTL = 3 * 3600 # Colas de pestañas que no volvieron a informar se olvidan
+REFRESH_QUEUE_MAX = 50       # Pistas por cola
+
+class UrlRefresher:
+    def __init__(self, lead: int, interval: float):
+        self.lead = lead
+        self.interval = interval
+        self._clients = {}  # cliente -> (informada, [IDs])
+        self._due = {}      # vid -> momento de renovar
+        self._heap = []     # (momento, vid); las entradas viejas se saltean al sacarlas
+        self._wake = None
+        self._task = None
+        self.refreshed = 0
+        self.skipped = 0    # Otro (una reproducción, otro worker) ya la había renovado
+        self.failed = 0
+
+    async def report(self, client: str, ids: list):
+        # Reemplaza la cola de esa pestaña
+        ids = ids[:REFRESH_QUEUE_MAX]
+        self._clients[client] = (time.time(), ids)
+        new = [vid for vid in ids if vid not in self._due]
+        if new:
+            expires = await asyncio.to_thread(lambda: [metadata_cache.url_expires(vid) for vid in new])
+            for vid, expires_at in zip(new, expires):
+                if vid not in self._due:
+                    self._schedule(vid, self._due_time(expires_at))
+        if self._task is None or self._task.done():
+            # (done: se canceló con close() o quedó en un loop de eventos anterior)
+            self._wake = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+        self._wake.set()
+
+    def _queued(self) -> set:
+        now = time.time()
+        for client in [c for c, (reported, _) in self._clients.items() if now - reported > REFRESH_QUEUE_TTL]:
+            del self._clients[client]
+        return {vid for _, ids in self._clients.values() for vid in ids}
+
+    def _due_time(self, expires) -> float:
+        if expires is None:
+            return time.time()  # Sin URL todavía: resolverla ya
+        return expires - URL_EXPIRY_MARGIN - self.lead * random.uniform(0.5, 1)
+
+    def _schedule(self, vid: str, due: float):
+        self._due[vid] = due
+        heapq.heappush(self._heap, (due, vid))
+
+    async def _sleep(self, timeout):
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            try:
+                await self._step()
+            except Exception as e:
+                # Un error inesperado (p. ej. de SQLite) no tiene que dejar
+                # de renovar para siempre: anotarlo y seguir
+                log.warning("Error en la renovación de URLs: %s", e)
+                await asyncio.sleep(self.interval)
+
+    async def _step(self):
+        queued = self._queued()
+        while self._heap:
+            due, vid = self._heap[0]
+            if self._due.get(vid) != due:
+                heapq.heappop(self._heap)  # Reprogramada
+            elif vid not in queued:
+                heapq.heappop(self._heap)
+                del self._due[vid]
+            else:
+                break
+        if not self._heap:
+            await self._sleep(None)
+            return
+        due, vid = self._heap[0]
+        if due > time.time():
+            await self._sleep(due - time.time())
+            return
+        if extract_executor.queued:
+            # Baja prioridad: primero lo que piden los usuarios
+            await asyncio.sleep(self.interval)
+            return
+        heapq.heappop(self._heap)
+        del self._due[vid]
+        due = time.time() + REFRESH_RETRY
+        try:
+            if await self._refresh(vid):
+                due = self._due_time(await asyncio.to_thread(metadata_cache.url_expires, vid))
+        finally:
+            self._schedule(vid, due)
+        await asyncio.sleep(self.interval)
+
+    async def _refresh(self, vid: str) -> bool:
+        expires = await asyncio.to_thread(metadata_cache.url_expires, vid)
+        if expires is not None and expires - URL_EXPIRY_MARGIN - self.lead > time.time():
+            self.skipped += 1
+            return True
+        sanitized_url = f"https://www.youtube.com/watch?v={vid}"
+        try:
+            await extraction_flight.do(sanitized_url, lambda: _extract_and_cache(sanitized_url, vid))
+        except Exception as e:
+            self.failed += 1
+            log.info("No se pudo renovar la URL de %s: %s", vid, e)
+            return False
+        self.refreshed += 1
+        return True
+
+    def stats(self) -> dict:
+        next_due = min(self._due.values(), default=None)
+        return {
+            "enabled": REFRESH_ENABLED,
+            "clients": len(self._clients),
+            "tracked": len(self._due),
+            "next_in_seconds": round(max(0.0, next_due - time.time()), 1) if next_due is not None else None,
+            "refreshed": self.refreshed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+        }
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+
+url_refresher = UrlRefresher(REFRESH_LEAD, REFRESH_INTERVAL)
+
+@app.post("/queue")
+async def report_queue(request: Request):
+    # {"client": <ID de la pestaña>, "ids": [las próximas pistas, en orden]}
+    try:
+        data = await request.json()
+        client = str(data.get("client") or request.client.host)
+        ids = [video_id(canonical_url(i)) for i in data.get("ids") or []]
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if not REFRESH_ENABLED:
+        return JSONResponse({"tracked": 0, "status": "disabled"}, status_code=202)
+    await url_refresher.report(client, ids)
+    return JSONResponse({"tracked": len(ids[:REFRESH_QUEUE_MAX])}, status_code=202)
+
+@app.get("/stream/{vid}")
+async def stream_audio(vid: str, request: Request):
+    if not re.match(r"^[a-zA-Z0-9_-]{11}$", vid):
+        return JSONResponse({"error": f"ID no válido: {vid}"}, status_code=400)
+    
+    client_range = request.headers.get("range")
+    if client_range and not re.match(r"^bytes=\d*-\d*$", client_range.strip()):
+        client_range = None  # Rangos múltiples no soportados: servir todo
+    
+    if audio_disk_cache is not None:
+        cached = await asyncio.to_thread(audio_disk_cache.lookup, vid)
+        if cached is not None:
+            return serve_cached_audio(cached, client_range)
+    
+    warm = prefetch_buffer.get(vid)
+    if warm is not None:
+        response = serve_prefetched(vid, warm, client_range)
+        if response is not None:
+            return response
+    
+    try:
+        upstream = await open_upstream(vid, client_range or "bytes=0-")
+    except Exception as e:
+        stream_stats["errors"] += 1
+        log.warning("Error en stream %s: %s", vid, e)
+        return JSONResponse({"error": str(e)}, status_code=502)
+    
+    if upstream.status_code >= 400:
+        await upstream.aclose()
+        stream_stats["errors"] += 1
+        return JSONResponse({"error": f"Upstream respondió {upstream.status_code}"},
+                            status_code=upstream.status_code if upstream.status_code == 416 else 502)
+    
+    # Averiguar qué bytes vienen en camino, para poder reanudar si se corta
+    content_range = parse_content_range(upstream.headers.get("content-range"))
+    if content_range:
+        start, end, total = content_range
+    else:
+        length = int(upstream.headers.get("content-length") or 0)
+        start, end, total = 0, (length - 1 if length else None), (length or None)
+    
+    content_type = upstream.headers.get("content-type", "audio/webm")
+    partial = bool(client_range) and upstream.status_code == 206
+    headers = stream_headers(content_type, start, end, total, partial)
+    
+    chunks = relay_upstream(vid, upstream, start, end, total)
+    # Si la respuesta cubre el archivo entero, guardarlo en disco mientras pasa
+    if audio_disk_cache is not None and start == 0 and total and end == total - 1:
+        chunks = tee_to_disk(vid, chunks, total, content_type)
+    return StreamingResponse(chunks, status_code=206 if partial else 200, headers=headers)
+
+def stats_snapshot() -> dict:
+    # Con --workers, cada proceso responde con sus propios contadores
+    return {
+        "worker": {"pid": os.getpid()},
+        "extractor": extract_executor.stats(),
+        "single_flight": extraction_flight.stats(),
+        "stream": dict(stream_stats),
+        "prefetch": prefetch_buffer.stats(),
+        "disk_cache": audio_disk_cache.stats() if audio_disk_cache is not None else {"enabled": False},
+        "backend": extractor.stats(),
+        "metadata_cache": metadata_cache.stats(),
+        "search_cache": search_cache.stats(),
+        "search_cursors": search_cursors.stats(),
+        "events": event_hub.stats(),
+        "url_refresh": url_refresher.stats(),
+        "logging": {"level": logging.getLevelName(log.level), "dropped_debug": log_sampler.dropped}
+    }
+
+@app.get("/stats")
+async def stats():
+    return JSONResponse(stats_snapshot())
+
+# Los valores de /stats se exponen como "choclotube_<sección>_<clave>". Los que
+# sólo crecen desde que arrancó el proceso son counters con sufijo _total
+# (p. ej. choclotube_stream_bytes_proxied_total), así rate() funciona y un
+# reinicio se ve como tal; el resto (en curso, tamaños, proporciones) son
+# gauges (p. ej. choclotube_extractor_queued). Se reconocen por la clave, que
+# significa lo mismo en todas las secciones.
+METRIC_COUNTERS = {
+    "completed", "failed", "failures", "errors", "calls", "restarts", "coalesced", "started",
+    "hits", "stale_hits", "misses", "evictions", "created", "reused", "discarded",
+    "bytes_proxied", "resumes", "upstream_requests", "published", "dropped", "dropped_debug",
+    "refreshed", "skipped", "prune_runs", "removed_files", "removed_bytes",
+}
+
+def metric_lines(prefix: str, values: dict, lines: list):
+    for key, value in values.items():
+        name = re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{key}")
+        if isinstance(value, dict):
+            metric_lines(name, value, lines)
+        elif isinstance(value, (int, float)):
+            kind = "counter" if key in METRIC_COUNTERS and not isinstance(value, bool) else "gauge"
+            if kind == "counter":
+                name += "_total"
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {int(value) if isinstance(value, (bool, int)) else value}")
+
+@app.get("/metrics")
+async def metrics():
+    lines = []
+    metric_lines("choclotube", stats_snapshot(), lines)
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return Response("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def on_startup():
+    event_hub.start()
+    extractor.warm()
+
+async def on_shutdown():
+    if _http_client is not None:
+        await _http_client.aclose()
+    event_hub.close()
+    url_refresher.close()
+    extract_executor.shutdown()
+    metadata_cache.close()
+    playlist_store.close()
+    search_cache.close()
+    search_cursors.close()
+    if audio_disk_cache is not None:
+        audio_disk_cache.close()
+    extractor.close()
+
+# Función para ejecutar el servidor
+class Server(uvicorn.Server):
+    # Las conexiones a /events no terminan solas y uvicorn espera a que se
+    # cierren todas antes de apagarse: cortarlas primero
+    async def shutdown(self, sockets=None):
+        event_hub.close()
+        await super().shutdown(sockets)
+
+# Con varios workers, uvicorn reparte las conexiones entre procesos que cargan
+# "CT:app" cada uno por su cuenta (en Windows y macOS, con spawn). Comparten
+# los SQLite de DATA_DIR (metadatos, listas, índice de la caché de audio y
+# los eventos de /events); lo demás es de cada proceso: los cursores de
+# búsqueda, la coalescencia de extracciones y las métricas. La precarga y la
+# renovación de URLs guardan estado en memoria y se desactivan. El supervisor
+# de uvicorn arma sus propios Server, así que ahí las conexiones a /events se
+# cortan al vencer timeout_graceful_shutdown.
+WORKERS_SHUTDOWN_TIMEOUT = 3
+
+def run_server(host: str = "127.0.0.1", port: int = 8000, workers: int = 1):
+    if workers > 1:
+        os.environ["CHOCLOTUBE_WORKERS"] = str(workers)  # Lo heredan los workers
+        log.warning("Con %d workers no se usan la precarga de la siguiente pista ni la renovación "
+                    "de URLs en segundo plano", workers)
+        uvicorn.run("CT:app", host=host, port=port, workers=workers, log_level="error",
+                    timeout_graceful_shutdown=WORKERS_SHUTDOWN_TIMEOUT)
+        return
+    Server(uvicorn.Config(app, host=host, port=port, log_level="error")).run()
+
+# Función para ejecutar la interfaz gráfica
+def run_gui(url: str = "http://127.0.0.1:8000"):
+    import webview  # Sólo hace falta con ventana
+    
+    # Ocultar terminal al abrir la ventana (solo Windows)
+    if platform.system() == "Windows":
+        import ctypes
+        ctypes.windll.user32.ShowWindow(ctypes.windll.kernel32.GetConsoleWindow(), 0)
+    
+    webview.create_window(
+        "Choclotube",
+        url,
+        width=1400,
+        height=800,
+        resizable=True,
+        min_size=(800, 500)
+    )
+    webview.start()
+
+def detach_main_module():
+    # Con spawn, cada proceso hijo vuelve a ejecutar el archivo de __main__
+    # (como __mp_main__): con `python CT.py` armaría otra vez la app, los
+    # assets, los SQLite, el hilo del registro y el executor. Con un __main__
+    # sin archivo, los procesos de extracción sólo importan extract_worker y
+    # los workers de uvicorn importan CT una vez, por "CT:app". El código de
+    # este archivo sigue usando sus globales: sólo cambia lo que ven los hijos.
+    sys.modules["__main__"] = types.ModuleType("__main__")
+
+# Punto de entrada principal
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Procesos de extracción desde el .exe de PyInstaller
+    detach_main_module()
+    parser = argparse.ArgumentParser(description="Choclotube")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-gui", action="store_true", help="Sólo el servidor, sin abrir la ventana")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS,
+                        help="Procesos del servidor (sólo con --no-gui)")
+    parser.add_argument("--install-deps", action="store_true", help="Instalar con pip las dependencias que falten")
+    args = parser.parse_args()
+    
     signal.signal(signal.SIGINT, lambda s, f: sys.exit(0))
-    threading.Thread(target=run_server, daemon=True).start()
-    run_gui()
\ No newline at end of file
+    if args.no_gui:
+        run_server(args.host, args.port, args.workers)
+    else:
+        if args.workers > 1:
+            # Con ventana el servidor corre en un hilo, y el supervisor de
+            # uvicorn necesita el hilo principal para sus señales
+            log.warning("--workers sólo se usa con --no-gui; se arranca un solo proceso")
+        threading.Thread(target=run_server, args=(args.host, args.port), daemon=True).start()
+        run_gui(f"http://{args.host}:{args.port}")
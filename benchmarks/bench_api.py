@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# Benchmark de carga de la API HTTP: levanta la app en el mismo proceso con el
+# extractor falso (sin red) y la somete a varios escenarios con concurrencia
+# configurable. Por escenario reporta latencias p50/p95/p99, peticiones por
+# segundo y el retraso del event loop del servidor mientras corre.
+#
+#   python benchmarks/bench_api.py [--concurrency 8] [--json api.json] [--compare base.json]
+#
+# Escenarios:
+#   index      GET / repetido
+#   extract    POST /extract_audio con IDs distintos (sin caché)
+#   paste      pegar 200 enlaces de una vez (POST /extract_audio/batch); la
+#              latencia es la de cada pista hasta que llega su línea
+#   skip       saltar de pista en pista: extraer, pedir el primer trozo de
+#              /stream, precargar la siguiente y pasar a la otra
+#   typeahead  búsqueda mientras se escribe: una consulta por cada letra
+#              (latencia hasta el primer resultado)
+import argparse, asyncio, base64, contextlib, hashlib, io, json, os, sys, tempfile, threading, time
+
+from _common import ROOT, free_port, git_commit, percentile
+os.environ.setdefault("CHOCLOTUBE_DATA_DIR", tempfile.mkdtemp(prefix="choclotube-bench-"))
+os.environ.setdefault("CHOCLOTUBE_EXTRACTOR", "fake")
+sys.path.insert(0, ROOT)
+
+import httpx
+import uvicorn
+import CT
+
+SCENARIOS = ["index", "extract", "paste", "skip", "typeahead"]
+PASTE_LINKS = 200
+TYPEAHEAD_WORDS = ["cumbia villera", "los palmeras", "rodrigo bueno", "soda stereo", "charly garcia"]
+LAG_INTERVAL = 0.01
+
+def make_id(*parts) -> str:
+    # IDs de 11 caracteres válidos para YouTube, distintos en cada corrida
+    return base64.urlsafe_b64encode(hashlib.sha256(repr(parts).encode()).digest()).decode()[:11]
+
+class LoopLagMonitor:
+    # Corre dentro del event loop del servidor: duerme LAG_INTERVAL y anota
+    # cuánto se atrasó en despertar (tiempo en que el loop estuvo bloqueado)
+    def __init__(self, loop):
+        self.loop = loop
+        self.samples = []
+        self._future = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.samples.append(max(0.0, time.perf_counter() - started - LAG_INTERVAL) * 1000)
+
+    def __enter__(self):
+        self.samples = []
+        self._future = asyncio.run_coroutine_threadsafe(self._run(), self.loop)
+        return self
+
+    def __exit__(self, *exc):
+        self._future.cancel()
+
+class Scenario:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+
+    def record(self, started: float, ok: bool = True):
+        if ok:
+            self.latencies.append((time.perf_counter() - started) * 1000)
+        else:
+            self.errors += 1
+
+async def run_index(client, scenario, args, run):
+    async def worker():
+        for _ in range(args.requests // args.concurrency):
+            started = time.perf_counter()
+            response = await client.get("/")
+            scenario.record(started, response.status_code == 200)
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+async def run_extract(client, scenario, args, run):
+    async def worker(w):
+        for i in range(args.requests // args.concurrency):
+            started = time.perf_counter()
+            url = f"https://www.youtube.com/watch?v={make_id(run, 'extract', w, i)}"
+            response = await client.post("/extract_audio", json={"url": url})
+            scenario.record(started, response.status_code == 200)
+    await asyncio.gather(*(worker(w) for w in range(args.concurrency)))
+
+async def run_paste(client, scenario, args, run):
+    async def paste(w):
+        # Mezcla de formatos de enlace, como los que pega un usuario
+        urls = []
+        for i in range(PASTE_LINKS):
+            vid = make_id(run, "paste", w, i)
+            urls.append(f"https://youtu.be/{vid}" if i % 2 else f"https://www.youtube.com/watch?v={vid}&list=RD{vid}")
+        started = time.perf_counter()
+        async with client.stream("POST", "/extract_audio/batch", json={"urls": urls}) as response:
+            async for line in response.aiter_lines():
+                if line:
+                    scenario.record(started, "error" not in json.loads(line))
+    await asyncio.gather(*(paste(w) for w in range(args.concurrency)))
+
+async def run_skip(client, scenario, args, run):
+    async def listener(w):
+        ids = [make_id(run, "skip", w, i) for i in range(args.skips + 1)]
+        for i in range(args.skips):
+            started = time.perf_counter()
+            response = await client.post("/extract_audio", json={"url": f"https://youtu.be/{ids[i]}"})
+            if response.status_code != 200:
+                scenario.record(started, False)
+                continue
+            await client.post("/prefetch", json={"id": ids[i + 1]})
+            # Escuchar sólo el primer trozo y saltar a la siguiente
+            stream = await client.get(f"/stream/{ids[i]}", headers={"Range": "bytes=0-65535"})
+            scenario.record(started, stream.status_code in (200, 206))
+    await asyncio.gather(*(listener(w) for w in range(args.concurrency)))
+
+async def run_typeahead(client, scenario, args, run):
+    async def typist(w):
+        word = f"{TYPEAHEAD_WORDS[w % len(TYPEAHEAD_WORDS)]} {run} {w}"
+        for n in range(1, len(word) + 1):
+            started = time.perf_counter()
+            got_first = False
+            async with client.stream("POST", "/search_yt", json={"query": word[:n]}) as response:
+                async for line in response.aiter_lines():
+                    if line and '"end"' not in line and not got_first:
+                        got_first = True
+                        scenario.record(started, response.status_code == 200)
+            if not got_first:
+                scenario.record(started, False)
+    await asyncio.gather(*(typist(w) for w in range(args.concurrency)))
+
+RUNNERS = {
+    "index": run_index,
+    "extract": run_extract,
+    "paste": run_paste,
+    "skip": run_skip,
+    "typeahead": run_typeahead,
+}
+
+async def run_scenario(name, base_url, args, lag_monitor, run):
+    scenario = Scenario(name)
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        with lag_monitor:
+            started = time.perf_counter()
+            await RUNNERS[name](client, scenario, args, run)
+            elapsed = time.perf_counter() - started
+        lag = lag_monitor.samples
+    return {
+        "requests": len(scenario.latencies) + scenario.errors,
+        "errors": scenario.errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(scenario.latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(scenario.latencies, 50), 1),
+        "p95_ms": round(percentile(scenario.latencies, 95), 1),
+        "p99_ms": round(percentile(scenario.latencies, 99), 1),
+        "loop_lag_p50_ms": round(percentile(lag, 50), 2),
+        "loop_lag_p99_ms": round(percentile(lag, 99), 2),
+        "loop_lag_max_ms": round(max(lag, default=0.0), 2),
+    }
+
+def start_server():
+    loop_ready = threading.Event()
+    holder = {}
+
+    lifespan = CT.app.router.lifespan_context
+
+    @contextlib.asynccontextmanager
+    async def capture_loop(app):
+        holder["loop"] = asyncio.get_running_loop()
+        loop_ready.set()
+        async with lifespan(app):
+            yield
+
+    CT.app.router.lifespan_context = capture_loop
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(CT.app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    loop_ready.wait()
+    return server, holder["loop"], f"http://127.0.0.1:{port}"
+
+def print_table(scenarios: dict, baseline: dict = None):
+    print(f"{'escenario':<11}{'pet.':>7}{'err.':>6}{'pet/s':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'lag p99':>10}{'lag máx':>10}")
+    for name, r in scenarios.items():
+        print(f"{name:<11}{r['requests']:>7}{r['errors']:>6}{r['rps']:>9.1f}{r['p50_ms']:>8.1f}ms"
+              f"{r['p95_ms']:>8.1f}ms{r['p99_ms']:>8.1f}ms{r['loop_lag_p99_ms']:>8.1f}ms{r['loop_lag_max_ms']:>8.1f}ms")
+        base = (baseline or {}).get(name)
+        if base:
+            deltas = []
+            for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+                if base[key]:
+                    deltas.append(f"{key} {(r[key] - base[key]) / base[key] * 100:+.0f}%")
+            print(f"{'':<11}vs base: {', '.join(deltas)}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400, help="Peticiones totales de index y extract")
+    parser.add_argument("--skips", type=int, default=10, help="Pistas que salta cada oyente en skip")
+    parser.add_argument("--latency", type=float, default=0.05, help="Segundos por extracción del extractor falso")
+    parser.add_argument("--entry-latency", type=float, default=0.002, help="Segundos por resultado de búsqueda")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Lista separada por comas")
+    parser.add_argument("--json", help="Archivo donde guardar el resultado")
+    parser.add_argument("--compare", help="Resultado JSON anterior contra el cual comparar")
+    parser.add_argument("--verbose", action="store_true", help="No ocultar los mensajes de depuración del servidor")
+    args = parser.parse_args()
+    args.concurrency = max(1, args.concurrency)
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    for name in names:
+        if name not in RUNNERS:
+            parser.error(f"Escenario desconocido: {name}")
+
+    CT.extractor.close()
+    CT.extractor = CT.FakeExtractor(latency=args.latency, entry_latency=args.entry_latency,
+                                    failure_rate=args.failure_rate)
+    run = time.time_ns()
+    scenarios = {}
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        server, loop, base_url = start_server()
+        lag_monitor = LoopLagMonitor(loop)
+        for name in names:
+            scenarios[name] = asyncio.run(run_scenario(name, base_url, args, lag_monitor, run))
+        server.should_exit = True
+
+    result = {
+        "benchmark": "api_load",
+        "commit": git_commit(),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "skips": args.skips,
+            "latency": args.latency,
+            "entry_latency": args.entry_latency,
+            "failure_rate": args.failure_rate,
+            "extract_workers": CT.EXTRACT_WORKERS,
+        },
+        "scenarios": scenarios,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("scenarios")
+    print(f"Concurrencia {args.concurrency}, extractor falso de {args.latency * 1000:.0f} ms, commit {result['commit']}")
+    print_table(scenarios, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# Benchmark de extracciones en hilos (CHOCLOTUBE_EXTRACTOR=yt-dlp) frente a
+# procesos (yt-dlp-process) con 1, 4 y 16 extracciones a la vez. Mide la
+# latencia de cada extracción, cuántas salen por segundo y el retraso del
+# event loop mientras tanto (lo que sufren las demás peticiones de uvicorn).
+#
+# Sin red, cada "extracción" es el trabajo de CPU que hace yt-dlp después de
+# bajar la página: descifrar el parámetro n con su intérprete JS y elegir el
+# formato entre ~60 (process_ie_result), con el YoutubeDL ya armado de cada
+# modo. Con --url se mide en cambio una extracción real (requiere red).
+#
+#   python benchmarks/bench_extract_modes.py [--extractions 32] [--processes 4] [--json modes.json]
+import argparse, asyncio, json, os, sys, tempfile, time
+
+from _common import ROOT, git_commit, percentile
+os.environ.setdefault("CHOCLOTUBE_DATA_DIR", tempfile.mkdtemp(prefix="choclotube-bench-"))
+os.environ.setdefault("CHOCLOTUBE_EXTRACTOR", "fake")
+sys.path.insert(0, ROOT)
+
+# Sólo esto se importa en los procesos hijos (spawn vuelve a cargar este
+# archivo); CT se importa dentro de main()
+import extract_worker
+from yt_dlp.jsinterp import JSInterpreter
+
+CONCURRENCY = [1, 4, 16]
+LAG_INTERVAL = 0.01
+
+# Del estilo de las funciones "n" de YouTube: rotaciones, inversiones e
+# intercambios sobre el array de caracteres
+N_FUNCTION = """function n(a){var b=a.split(""),c=[function(d,e){e=(e%d.length+d.length)%d.length;
+d.splice(-e).reverse().forEach(function(f){d.unshift(f)})},function(d){d.reverse()},
+function(d,e){var f=d[0];d[0]=d[e%d.length];d[e%d.length]=f}];
+for(var i=0;i<ROUNDS;i++){c[i%3](b,i*7+3)}return b.join("")}"""
+
+def fake_info(vid: str) -> dict:
+    formats = []
+    for i in range(60):
+        audio_only = i % 3 == 0
+        formats.append({
+            "format_id": str(100 + i),
+            "url": f"https://rr{i}.googlevideo.com/videoplayback?id={vid}&itag={100 + i}",
+            "ext": "webm" if i % 2 else "m4a",
+            "protocol": "https",
+            "acodec": "opus" if audio_only or i % 4 == 0 else "none",
+            "vcodec": "none" if audio_only else "vp9",
+            "abr": 48 + i, "tbr": 100 + i * 10, "asr": 48000, "filesize": 1000000 + i * 1000,
+            "height": None if audio_only else 144 * (1 + i % 8),
+            "width": None if audio_only else 256 * (1 + i % 8),
+            "fps": None if audio_only else 30,
+        })
+    return {"id": vid, "title": f"Pista {vid}", "duration": 200, "formats": formats, "_type": "video",
+            "extractor": "youtube", "extractor_key": "Youtube", "webpage_url": f"https://www.youtube.com/watch?v={vid}"}
+
+def synthetic_extract(ydl, vid: str, rounds: int) -> dict:
+    n = JSInterpreter(N_FUNCTION.replace("ROUNDS", str(rounds))).extract_function("n")
+    n([vid * 3])
+    return extract_worker.trim(ydl.process_ie_result(fake_info(vid), download=False))
+
+def synthetic_in_worker(vid: str, rounds: int) -> dict:
+    # Corre en un proceso hijo, con el YoutubeDL que armó extract_worker.init
+    return synthetic_extract(extract_worker.ydl("audio"), vid, rounds)
+
+def make_runner(CT, mode: str, args):
+    if mode == "threads":
+        extractor = CT.YtDlpExtractor(max(CONCURRENCY))
+        extractor.pools["audio"].warm(max(CONCURRENCY))
+        if args.url:
+            return extractor, lambda i: extractor.extract_audio(args.url)
+
+        def run(i):
+            with extractor.pools["audio"].checkout() as ydl:
+                return synthetic_extract(ydl, f"vid{i:08d}", args.rounds)
+        return extractor, run
+
+    extractor = CT.ProcessExtractor(max(CONCURRENCY), args.processes)
+    # Arrancar todos los procesos antes de medir (cada hijo importa
+    # extract_worker y yt_dlp y arma su YoutubeDL)
+    started = time.perf_counter()
+    pool = extractor._executor()
+    for future in [pool.submit(extract_worker.ping) for _ in range(args.processes)]:
+        future.result()
+    extractor.startup_ms = round((time.perf_counter() - started) * 1000, 1)
+    if args.url:
+        return extractor, lambda i: extractor.extract_audio(args.url)
+    return extractor, lambda i: extractor.run(synthetic_in_worker, f"vid{i:08d}", args.rounds)
+
+async def measure(executor, run, concurrency: int, extractions: int) -> dict:
+    lag, latencies = [], []
+    done = asyncio.Event()
+
+    async def monitor():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL)
+            lag.append(max(0.0, time.perf_counter() - started - LAG_INTERVAL) * 1000)
+
+    async def worker(w):
+        for i in range(w, extractions, concurrency):
+            started = time.perf_counter()
+            await executor.run(run, i)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    lag_task = asyncio.ensure_future(monitor())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await lag_task
+    return {
+        "extractions": len(latencies),
+        "seconds": round(elapsed, 3),
+        "per_second": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "loop_lag_p50_ms": round(percentile(lag, 50), 2),
+        "loop_lag_p99_ms": round(percentile(lag, 99), 2),
+        "loop_lag_max_ms": round(max(lag, default=0.0), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--extractions", type=int, default=32, help="Extracciones por cada nivel de concurrencia")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--rounds", type=int, default=20, help="Vueltas de la función n sintética (más = más CPU)")
+    parser.add_argument("--url", help="Medir extracciones reales de esta URL (requiere red)")
+    parser.add_argument("--json", help="Archivo donde guardar el resultado")
+    args = parser.parse_args()
+
+    import CT
+    executor = CT.ExtractionExecutor(max(CONCURRENCY))
+    results, startup = {}, {}
+    for mode in ("threads", "processes"):
+        extractor, run = make_runner(CT, mode, args)
+        if mode == "processes":
+            startup["pool_ms"] = extractor.startup_ms
+        try:
+            asyncio.run(measure(executor, run, 1, 2))  # Calentar
+            results[mode] = {
+                str(concurrency): asyncio.run(measure(executor, run, concurrency, args.extractions))
+                for concurrency in CONCURRENCY
+            }
+        finally:
+            extractor.close()
+    executor.shutdown()
+
+    print(f"{args.extractions} extracciones por nivel, {args.processes} procesos, "
+          f"{os.cpu_count()} CPU, commit {git_commit()}")
+    print(f"arranque de los {args.processes} procesos: {startup['pool_ms']:.0f} ms")
+    print(f"{'modo':<11}{'conc.':>6}{'extr/s':>9}{'p50':>10}{'p95':>10}{'lag p50':>10}{'lag p99':>10}{'lag máx':>10}")
+    for mode, levels in results.items():
+        for concurrency, r in levels.items():
+            print(f"{mode:<11}{concurrency:>6}{r['per_second']:>9.2f}{r['p50_ms']:>8.1f}ms{r['p95_ms']:>8.1f}ms"
+                  f"{r['loop_lag_p50_ms']:>8.1f}ms{r['loop_lag_p99_ms']:>8.1f}ms{r['loop_lag_max_ms']:>8.1f}ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "extract_modes",
+                "commit": git_commit(),
+                "config": {
+                    "extractions": args.extractions,
+                    "processes": args.processes,
+                    "rounds": args.rounds,
+                    "url": args.url,
+                    "cpus": os.cpu_count(),
+                },
+                "startup": startup,
+                "results": results,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# Benchmark del registro por petición: costo, en el hilo que atiende la
+# petición, de los mensajes de depuración de extract_audio y search_yt con los
+# print() de antes frente al logger con cola de CT (a nivel INFO, a nivel
+# DEBUG y con muestreo). La salida va a una tubería que otro hilo vacía;
+# con --slow-reader-ms ese hilo tarda en leer, como una consola lenta.
+#
+#   python benchmarks/bench_logging.py [--requests 20000] [--slow-reader-ms 0] [--json logging.json]
+import argparse, json, os, statistics, sys, tempfile, threading, time
+
+from _common import ROOT, git_commit
+os.environ.setdefault("CHOCLOTUBE_DATA_DIR", tempfile.mkdtemp(prefix="choclotube-bench-"))
+os.environ.setdefault("CHOCLOTUBE_EXTRACTOR", "fake")
+sys.path.insert(0, ROOT)
+
+import CT
+
+URL = "https://youtu.be/dQw4w9WgXcQ"
+SANITIZED = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+def open_pipe(slow_reader_ms: float):
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with os.fdopen(read_fd, "rb") as reader:
+            while reader.read1(4096):
+                if slow_reader_ms:
+                    time.sleep(slow_reader_ms / 1000)
+
+    threading.Thread(target=drain, daemon=True).start()
+    return os.fdopen(write_fd, "w", buffering=1, encoding="utf-8")  # Con buffer de línea, como una consola
+
+# Los mensajes que emite una petición a extract_audio más una a search_yt
+def request_with_print(out):
+    print(f"URL recibida en extract_audio: {URL}", file=out)  # Así eran antes
+    print(f"URL sanitizada: {SANITIZED}", file=out)
+    print(f"Buscando: cumbia (desde 0, 5 resultados)", file=out)
+    print(f"Resultados procesados: {5}", file=out)
+
+def request_with_log(log):
+    token = CT.request_id_var.set("bench")
+    log.debug("URL recibida en extract_audio: %s", URL)
+    log.debug("URL sanitizada: %s", SANITIZED)
+    log.debug("Buscando: %s (desde %d, %d resultados)", "cumbia", 0, 5)
+    log.debug("Resultados procesados: %d", 5)
+    CT.request_id_var.reset(token)
+
+def wait_drained(listener):
+    # Que el hilo escritor de la variante anterior no compita con la siguiente
+    if listener is not None:
+        while not listener.queue.empty():
+            time.sleep(0.01)
+
+def measure(fn, arg, requests: int, rounds: int) -> list:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter_ns()
+        for _ in range(requests):
+            fn(arg)
+        samples.append((time.perf_counter_ns() - started) / requests / 1000)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--slow-reader-ms", type=float, default=0.0,
+                        help="Demora del lector de la tubería por cada bloque leído")
+    parser.add_argument("--json", help="Archivo donde guardar el resultado")
+    args = parser.parse_args()
+
+    out = open_pipe(args.slow_reader_ms)
+    variants = {
+        "print": lambda: (request_with_print, out, None),
+        "log_info": lambda: (request_with_log, *CT.setup_logging("bench.info", "INFO", out)[::2]),
+        "log_debug": lambda: (request_with_log, *CT.setup_logging("bench.debug", "DEBUG", out, rate=0)[::2]),
+        "log_debug_sampled": lambda: (request_with_log, *CT.setup_logging("bench.sampled", "DEBUG", out, sample=0.1, rate=0)[::2]),
+        "log_debug_rate_limited": lambda: (request_with_log, *CT.setup_logging("bench.limited", "DEBUG", out)[::2]),
+    }
+    results = {}
+    for name, make in variants.items():
+        fn, arg, listener = make()
+        fn(arg)  # Calentar
+        samples = measure(fn, arg, args.requests, args.rounds)
+        wait_drained(listener)
+        results[name] = {"median_us": round(statistics.median(samples), 3), "min_us": round(min(samples), 3)}
+
+    print(f"Costo por petición (4 mensajes), {args.requests} peticiones x {args.rounds} rondas, "
+          f"lector con {args.slow_reader_ms} ms de demora:")
+    for name, r in results.items():
+        print(f"  {name:<24}{r['median_us']:>10.2f} µs (mín {r['min_us']:.2f} µs)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "logging_overhead",
+                "commit": git_commit(),
+                "requests": args.requests,
+                "rounds": args.rounds,
+                "slow_reader_ms": args.slow_reader_ms,
+                "results": results,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
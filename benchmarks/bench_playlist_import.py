@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# Benchmark de POST /import_playlist con una lista falsa de 5.000 entradas
+# (CT.FakeExtractor, sin red; cada página de 100 tarda --page-latency): tiempo
+# hasta la primera pista, hasta la lista completa y entre páginas, frente a lo
+# de antes, pegar los 5.000 enlaces y resolver cada video por
+# /extract_audio/batch (cada extracción tarda --extract-latency).
+#
+#   python benchmarks/bench_playlist_import.py [--entries 5000] [--no-batch] [--json import.json]
+import argparse, json, os, sys, tempfile, threading, time
+
+from _common import ROOT, free_port, git_commit, percentile
+os.environ.setdefault("CHOCLOTUBE_DATA_DIR", tempfile.mkdtemp(prefix="choclotube-bench-"))
+os.environ.setdefault("CHOCLOTUBE_EXTRACTOR", "fake")
+sys.path.insert(0, ROOT)
+
+import httpx
+import uvicorn
+import CT
+
+def read_stream(client, path: str, body: dict) -> dict:
+    # Cuenta las líneas NDJSON y cuándo llega cada tanda (lectura del socket)
+    started = time.perf_counter()
+    first, arrivals, entries, size = None, [], 0, 0
+    with client.stream("POST", path, json=body) as response:
+        for chunk in response.iter_bytes():
+            now = time.perf_counter() - started
+            size += len(chunk)
+            lines = chunk.count(b"\n")
+            if lines and first is None:
+                first = now
+            arrivals.append(now)
+            entries += lines
+    total = time.perf_counter() - started
+    gaps = [(b - a) * 1000 for a, b in zip(arrivals, arrivals[1:])]
+    return {
+        "lines": entries,
+        "bytes": size,
+        "first_ms": round((first or total) * 1000, 1),
+        "total_ms": round(total * 1000, 1),
+        "entries_per_second": round(entries / total, 1),
+        "gap_p50_ms": round(percentile(gaps, 50), 1),
+        "gap_p95_ms": round(percentile(gaps, 95), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--page-latency", type=float, default=0.3, help="Segundos por página de 100 entradas")
+    parser.add_argument("--extract-latency", type=float, default=0.05, help="Segundos por extracción de un video")
+    parser.add_argument("--no-batch", action="store_true", help="No medir la resolución video por video")
+    parser.add_argument("--json", help="Archivo donde guardar el resultado")
+    args = parser.parse_args()
+
+    CT.extractor.close()
+    CT.extractor = CT.FakeExtractor(latency=args.page_latency, playlist_size=args.entries)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(CT.app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    results = {}
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=600) as client:
+        results["import"] = read_stream(client, "/import_playlist",
+                                        {"url": "https://www.youtube.com/playlist?list=PLbenchmark"})
+        if not args.no_batch:
+            # Los mismos IDs, resueltos uno por uno como al pegar los enlaces
+            ids = [item["id"] for item in CT.extractor.playlist("https://www.youtube.com/playlist?list=PLbatch")]
+            CT.extractor.latency = args.extract_latency
+            results["batch"] = read_stream(client, "/extract_audio/batch", {"urls": ids})
+    server.should_exit = True
+
+    print(f"Lista falsa de {args.entries} entradas, {args.page_latency * 1000:.0f} ms por página de "
+          f"{CT.FakeExtractor.PLAYLIST_PAGE}, {args.extract_latency * 1000:.0f} ms por extracción, "
+          f"{CT.BATCH_CONCURRENCY} extracciones a la vez, commit {git_commit()}")
+    print(f"{'modo':<8}{'líneas':>8}{'primera':>11}{'total':>12}{'pistas/s':>11}{'entre tandas p50/p95':>24}{'KB':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<8}{r['lines']:>8}{r['first_ms']:>9.1f}ms{r['total_ms']:>10.1f}ms{r['entries_per_second']:>11.1f}"
+              f"{r['gap_p50_ms']:>14.1f} / {r['gap_p95_ms']:.1f} ms{r['bytes'] / 1024:>8.0f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "playlist_import",
+                "commit": git_commit(),
+                "config": {
+                    "entries": args.entries,
+                    "page_latency": args.page_latency,
+                    "extract_latency": args.extract_latency,
+                    "batch_concurrency": CT.BATCH_CONCURRENCY,
+                },
+                "results": results,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# Benchmark de /search_yt paginado: tiempo hasta el primer resultado frente al
+# tiempo hasta la página completa, contra el extractor falso (CT.FakeExtractor,
+# sin red) que tarda --entry-latency segundos en "parsear" cada resultado.
+#
+#   python benchmarks/bench_search.py [--pages 4] [--limit 5] [--entry-latency 0.05]
+import argparse, os, statistics, sys, tempfile, threading, time
+
+from _common import ROOT, free_port
+os.environ.setdefault("CHOCLOTUBE_DATA_DIR", tempfile.mkdtemp(prefix="choclotube-bench-"))
+os.environ.setdefault("CHOCLOTUBE_EXTRACTOR", "fake")
+sys.path.insert(0, ROOT)
+
+import httpx
+import uvicorn
+import CT
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--entry-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    CT.extractor.close()
+    CT.extractor = CT.FakeExtractor(latency=args.search_latency, entry_latency=args.entry_latency)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(CT.app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    first, full = {}, {}
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+        for q in range(args.queries):
+            for page in range(args.pages):
+                body = {"query": f"consulta {q}", "offset": page * args.limit, "limit": args.limit}
+                started = time.perf_counter()
+                got_first = None
+                with client.stream("POST", "/search_yt", json=body) as response:
+                    for line in response.iter_lines():
+                        if got_first is None and line and '"end"' not in line:
+                            got_first = time.perf_counter() - started
+                first.setdefault(page, []).append((got_first or 0) * 1000)
+                full.setdefault(page, []).append((time.perf_counter() - started) * 1000)
+    server.should_exit = True
+
+    print(f"{args.queries} consultas, {args.pages} páginas de {args.limit}, "
+          f"{args.search_latency * 1000:.0f} ms de búsqueda + {args.entry_latency * 1000:.0f} ms por resultado")
+    print(f"{'página':<8}{'primer resultado (mediana)':>30}{'página completa (mediana)':>30}")
+    for page in range(args.pages):
+        print(f"{page + 1:<8}{statistics.median(first[page]):>27.1f} ms{statistics.median(full[page]):>27.1f} ms")
+
+if __name__ == "__main__":
+    main()
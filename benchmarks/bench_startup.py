@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Benchmark de arranque: tiempo desde que se lanza el proceso hasta recibir el
+# primer byte de "/" (time-to-first-byte). Lanza `CT.py --no-gui` varias
+# veces y reporta mínimo, mediana y máximo.
+#
+#   python benchmarks/bench_startup.py [--runs 5] [--json resultados.json]
+#
+# Con --json guarda el resultado (con el commit actual) para comparar entre
+# versiones.
+import argparse, json, os, socket, statistics, subprocess, sys, tempfile, time
+
+from _common import ROOT, free_port, git_commit
+
+def time_to_first_byte(port: int, started: float, timeout: float) -> float:
+    request = b"GET / HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n"
+    while time.perf_counter() - started < timeout:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=timeout) as sock:
+                sock.sendall(request)
+                if sock.recv(1):
+                    return time.perf_counter() - started
+        except OSError:
+            time.sleep(0.005)
+    raise TimeoutError(f"El servidor no respondió en {timeout} s")
+
+def run_once(env: dict, timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "CT.py"), "--no-gui", "--port", str(port)],
+        cwd=env["CHOCLOTUBE_DATA_DIR"], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        return time_to_first_byte(port, started, timeout)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--warm", type=int, default=None,
+                        help="Valor de CHOCLOTUBE_YDL_POOL_WARM para el servidor (por defecto el de la app)")
+    parser.add_argument("--json", help="Archivo donde guardar el resultado")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, CHOCLOTUBE_DATA_DIR=workdir)
+        if args.warm is not None:
+            env["CHOCLOTUBE_YDL_POOL_WARM"] = str(args.warm)
+        samples = [run_once(env, args.timeout) * 1000 for _ in range(args.runs)]
+
+    result = {
+        "benchmark": "startup_ttfb",
+        "commit": git_commit(),
+        "runs": args.runs,
+        "min_ms": round(min(samples), 1),
+        "median_ms": round(statistics.median(samples), 1),
+        "max_ms": round(max(samples), 1),
+        "samples_ms": [round(sample, 1) for sample in samples],
+    }
+    print(f"Primer byte de / tras lanzar el proceso ({args.runs} corridas): "
+          f"mín {result['min_ms']} ms, mediana {result['median_ms']} ms, máx {result['max_ms']} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# Benchmark de la caché de disco de yt-dlp (CHOCLOTUBE_YDL_CACHE_DIR), sin red:
+# cuánto tarda un YoutubeDL recién armado (un proceso de extracción nuevo, o el
+# servidor después de reiniciar) en tener listas las funciones del player que
+# descifran la firma y el parámetro "n", con la carpeta vacía (fría: bajar el
+# player y sacarlas con el intérprete JS de yt-dlp) y con la carpeta ya poblada
+# por una ronda anterior (caliente: leerlas del disco).
+#
+# El player es el de benchmarks/fixtures/player: base.js es sintético (acá no
+# hay red para grabar uno de YouTube) pero tiene su misma forma (objeto de
+# ayudantes, función de firma, función "n", envoltorio _yt_player) y se sirve
+# desde un http.server local en la ruta de un player real, rellenado hasta
+# --player-kb para que la descarga y la búsqueda con expresiones regulares
+# cuesten lo que con uno real. challenges.json trae firmas y valores "n" de
+# prueba con su resultado (calculado con node sobre el mismo base.js), que se
+# verifica en cada ronda fuera del tiempo medido. Lo guardado sigue el formato
+# de yt-dlp: youtube-sigfuncs/<player>-main-<largo> y youtube-nsig/<player>-main.
+#
+# Con --download-ms cada descarga del player tarda eso de más, como la red
+# hasta YouTube; las rondas frías y calientes se alternan.
+#
+#   python benchmarks/bench_ydl_cache.py [--rounds 5] [--player-kb 2600] [--download-ms 0] [--json ydl_cache.json]
+import argparse, json, os, shutil, statistics, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from _common import ROOT, git_commit
+os.environ.setdefault("CHOCLOTUBE_DATA_DIR", tempfile.mkdtemp(prefix="choclotube-bench-"))
+os.environ.setdefault("CHOCLOTUBE_EXTRACTOR", "fake")
+sys.path.insert(0, ROOT)
+
+import yt_dlp
+from yt_dlp.jsinterp import JSInterpreter
+import CT
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures", "player")
+
+def load_fixture(player_kb: int) -> tuple:
+    with open(os.path.join(FIXTURE_DIR, "challenges.json"), encoding="utf-8") as f:
+        challenges = json.load(f)
+    with open(os.path.join(FIXTURE_DIR, "base.js"), encoding="utf-8") as f:
+        player = f.read()
+    # Relleno inerte mitad antes y mitad después de las funciones
+    filler, size, i = [], len(player), 0
+    while size < player_kb * 1024:
+        filler.append(f"var Pd{i}=function(a,b){{return a.length>b?a.slice(0,b):a.concat([{i}])}};\n")
+        size += len(filler[-1])
+        i += 1
+    half = len(filler) // 2
+    return challenges, ("".join(filler[:half]) + player + "".join(filler[half:])).encode()
+
+class PlayerServer:
+    def __init__(self, path: str, body: bytes, delay: float):
+        self.downloads = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != path:
+                    self.send_error(404)
+                    return
+                server.downloads += 1
+                time.sleep(delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/javascript")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}{path}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+def prepare(player_url: str, cachedir: str, challenges: dict) -> float:
+    # Un YoutubeDL nuevo por ronda: lo único que queda de antes es la carpeta
+    key = f"{challenges['player_id']}-main"
+    sig_inputs = [c["input"] for c in challenges["signature"]["challenges"]]
+    started = time.perf_counter()
+    with yt_dlp.YoutubeDL({"quiet": True, "no_warnings": True, "cachedir": cachedir}) as ydl:
+        lengths = sorted({len(s) for s in sig_inputs})
+        specs = {n: ydl.cache.load("youtube-sigfuncs", f"{key}-{n}") for n in lengths}
+        n_code = ydl.cache.load("youtube-nsig", key)
+        if n_code is None or None in specs.values():
+            jsi = JSInterpreter(ydl.urlopen(player_url).read().decode())
+            sig_function = jsi.extract_function(challenges["signature"]["function"])
+            for n in lengths:
+                # Como yt-dlp: descifrar la firma 0, 1, 2... da la permutación
+                specs[n] = [ord(c) for c in sig_function(["".join(map(chr, range(n)))])]
+                ydl.cache.store("youtube-sigfuncs", f"{key}-{n}", specs[n])
+            n_code = jsi.extract_function_code(challenges["n"]["function"])
+            ydl.cache.store("youtube-nsig", key, n_code)
+        n_function = JSInterpreter("").extract_function_from_code(*n_code)
+    elapsed = (time.perf_counter() - started) * 1000
+    # Aplicarlas cuesta lo mismo en las dos rondas: queda fuera de la medición
+    signatures = ["".join(s[i] for i in specs[len(s)]) for s in sig_inputs]
+    n_values = [n_function([c["input"]]) for c in challenges["n"]["challenges"]]
+    if (signatures != [c["output"] for c in challenges["signature"]["challenges"]]
+            or n_values != [c["output"] for c in challenges["n"]["challenges"]]):
+        sys.exit("Las firmas o los valores n no coinciden con challenges.json")
+    return elapsed
+
+def folder_size(path: str) -> tuple:
+    files, size = 0, 0
+    for folder, _, names in os.walk(path):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(folder, name))
+    return files, size
+
+def summary(samples: list) -> dict:
+    return {
+        "rounds": len(samples),
+        "median_ms": round(statistics.median(samples), 2),
+        "min_ms": round(min(samples), 2),
+        "max_ms": round(max(samples), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--player-kb", type=int, default=2600, help="Tamaño con el que se sirve el player")
+    parser.add_argument("--download-ms", type=float, default=0, help="Demora de más en cada descarga del player")
+    parser.add_argument("--json", help="Archivo donde guardar el resultado")
+    args = parser.parse_args()
+
+    challenges, player = load_fixture(args.player_kb)
+    server = PlayerServer(challenges["path"], player, args.download_ms / 1000)
+    try:
+        # Caliente: la carpeta queda poblada por una primera ronda (como
+        # después de la primera pista que se reproduce)
+        warm_dir = tempfile.mkdtemp(prefix="choclotube-ydl-cache-")
+        prepare(server.url, warm_dir, challenges)
+        cold, warm = [], []
+        for _ in range(args.rounds):
+            cold_dir = tempfile.mkdtemp(prefix="choclotube-ydl-cache-")
+            try:
+                cold.append(prepare(server.url, cold_dir, challenges))
+            finally:
+                shutil.rmtree(cold_dir, ignore_errors=True)
+            downloads = server.downloads
+            warm.append(prepare(server.url, warm_dir, challenges))
+            if server.downloads != downloads:
+                sys.exit("La ronda caliente volvió a bajar el player")
+        downloads = server.downloads
+    finally:
+        server.close()
+
+    files, size = folder_size(warm_dir)
+    cache = CT.YdlCacheDir(warm_dir, CT.YDL_CACHE_MB * 1024 * 1024, CT.YDL_CACHE_PLAYERS)
+    started = time.perf_counter()
+    cache.prune()
+    prune_ms = (time.perf_counter() - started) * 1000
+    shutil.rmtree(warm_dir, ignore_errors=True)
+
+    results = {
+        "cold": summary(cold),
+        "warm": summary(warm),
+        "player_downloads": downloads,
+        "cache_files": files,
+        "cache_bytes": size,
+        "prune_ms": round(prune_ms, 2),
+    }
+    print(f"player {challenges['player_id']} ({len(player) // 1024} KB, +{args.download_ms:g} ms por descarga), "
+          f"yt-dlp {yt_dlp.version.__version__}, commit {git_commit()}")
+    for name in ("cold", "warm"):
+        r = results[name]
+        print(f"  {name:<6}mediana {r['median_ms']:>9.2f} ms   mín {r['min_ms']:>9.2f} ms   máx {r['max_ms']:>9.2f} ms")
+    print(f"  {downloads} descargas del player; carpeta caliente: {files} archivos, {size} bytes; poda: {prune_ms:.2f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "ydl_cache",
+                "commit": git_commit(),
+                "config": {"rounds": args.rounds, "player_kb": args.player_kb, "download_ms": args.download_ms,
+                           "player_id": challenges["player_id"], "yt_dlp": yt_dlp.version.__version__},
+                "results": results,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
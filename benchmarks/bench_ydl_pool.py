@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# Micro-benchmark: costo por llamada de construir un YoutubeDL nuevo (como
+# hacía el viejo ydl_get()) frente a tomarlo y devolverlo del pool.
+#
+#   python benchmarks/bench_ydl_pool.py [--iterations 200] [--url URL]
+#
+# Con --url también mide una extracción real completa en ambos modos
+# (requiere red).
+import argparse, os, statistics, sys, tempfile, time
+
+from _common import ROOT
+os.environ.setdefault("CHOCLOTUBE_DATA_DIR", tempfile.mkdtemp(prefix="choclotube-bench-"))
+os.environ.setdefault("CHOCLOTUBE_EXTRACTOR", "fake")
+sys.path.insert(0, ROOT)
+
+import yt_dlp
+import CT
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<28} media {statistics.mean(samples):8.3f} ms   "
+          f"p50 {statistics.median(samples):8.3f} ms   p95 {p95:8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--profile", choices=sorted(CT.YDL_PROFILES), default="audio")
+    parser.add_argument("--url", help="URL para medir una extracción real (opcional)")
+    args = parser.parse_args()
+
+    opts = CT.YDL_PROFILES[args.profile]
+    pool = CT.YoutubeDLPool(opts, 1)
+    pool.warm(1)
+
+    def construct():
+        with yt_dlp.YoutubeDL(dict(opts)):
+            pass
+
+    def checkout():
+        with pool.checkout():
+            pass
+
+    print(f"Perfil '{args.profile}', {args.iterations} iteraciones")
+    report("antes: YoutubeDL(opts)", timed(construct, args.iterations))
+    report("después: pool.checkout()", timed(checkout, args.iterations))
+
+    if args.url:
+        iterations = max(1, min(args.iterations, 5))
+
+        def extract_new():
+            with yt_dlp.YoutubeDL(dict(opts)) as ydl:
+                ydl.extract_info(args.url, download=False)
+
+        def extract_pooled():
+            with pool.checkout() as ydl:
+                ydl.extract_info(args.url, download=False)
+
+        report("antes: extracción", timed(extract_new, iterations))
+        report("después: extracción", timed(extract_pooled, iterations))
+    pool.close()
+
+if __name__ == "__main__":
+    main()
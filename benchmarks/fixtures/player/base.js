@@ -0,0 +1,16 @@
+var _yt_player={};(function(g){var window=this;/*
+ Fixture de benchmarks/bench_ydl_cache.py: un player con la misma forma que
+ el base.js de YouTube (objeto de ayudantes + función de firma, función "n"
+ autocontenida, signatureTimestamp), reducido a lo que usa la extracción.
+ bench_ydl_cache.py lo sirve rellenado hasta el tamaño de un player real.
+*/
+'use strict';
+var Qk={
+Xa:function(a,b){a.splice(0,b)},
+Zr:function(a){a.reverse()},
+VN:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b%a.length]=c}};
+var Rjb=function(a){a=a.split("");Qk.VN(a,29);Qk.Zr(a,52);Qk.Xa(a,3);Qk.VN(a,18);Qk.Zr(a,2);Qk.VN(a,44);Qk.Xa(a,1);Qk.VN(a,60);Qk.Zr(a,7);Qk.VN(a,9);return a.join("")};
+var Hqa=function(a){var b=a.split(""),c=[function(d,e){e=(e%d.length+d.length)%d.length;d.splice(-e).reverse().forEach(function(f){d.unshift(f)})},function(d){d.reverse()},function(d,e){var f=d[0];d[0]=d[e%d.length];d[e%d.length]=f},function(d,e){e=(e%d.length+d.length)%d.length;d.splice(e,1)}];for(var i=0;i<48;i++){c[i%3](b,i*7+3)}c[3](b,11);c[1](b);c[0](b,-5);return b.join("")};
+g.GU={signatureTimestamp:20381,sts:20381};
+g.Rjb=Rjb;g.Hqa=Hqa;
+})(_yt_player);
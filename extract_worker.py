@@ -0,0 +1,52 @@
+# Procesos de extracción para CHOCLOTUBE_EXTRACTOR=yt-dlp-process (ver
+# ProcessExtractor en CT.py). Es un módulo aparte para que las funciones que
+# viajan a los procesos hijos no obliguen a importar CT allí: los hijos sólo
+# cargan este módulo y yt_dlp (con `python CT.py`, gracias a
+# detach_main_module; con `uvicorn CT:app`, porque __main__ es uvicorn). Cada
+# proceso arma una vez sus YoutubeDL y los reutiliza en cada extracción.
+import os
+
+import yt_dlp
+
+_profiles = {}
+_ydls = {}
+
+def init(profiles: dict):
+    # initializer del ProcessPoolExecutor: corre una vez por proceso
+    _profiles.update(profiles)
+    for name in profiles:
+        _rebuild(name)
+
+def _rebuild(name: str):
+    old = _ydls.get(name)
+    if old is not None:
+        old.close()
+    _ydls[name] = yt_dlp.YoutubeDL(dict(_profiles[name]))
+
+def ydl(name: str):
+    return _ydls[name]
+
+def ping() -> int:
+    return os.getpid()
+
+def trim(info: dict) -> dict:
+    # Sólo lo que usa el servidor: el info completo (todos los formatos,
+    # miniaturas, subtítulos...) pesa cientos de KB al pasar por pickle
+    return {
+        "id": info.get("id"),
+        "title": info.get("title"),
+        "duration": info.get("duration"),
+        "url": info.get("url"),
+    }
+
+def extract_audio(url: str) -> dict:
+    # Los errores vuelven como {"error"}: las excepciones de yt-dlp traen el
+    # traceback adentro y no siempre se pueden pasar por pickle
+    try:
+        return trim(_ydls["audio"].extract_info(url, download=False))
+    except yt_dlp.utils.DownloadError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        # Error inesperado: no seguir usando una instancia en estado dudoso
+        _rebuild("audio")
+        return {"error": str(e)}
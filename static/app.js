@@ -0,0 +1,1001 @@
+// Ver playlist-model.js: pistas por ID y orden, sin búsquedas lineales
+const playlist = new PlaylistModel();
+let current = -1, nextTrack = -1;
+let audio = document.getElementById("audioPlayer");
+let paused = false;
+
+// Sistema de estados del reproductor
+const PlayerState = {
+    IDLE: 'idle',
+    LOADING: 'loading',
+    PLAYING: 'playing',
+    ERROR: 'error'
+};
+
+let playerState = PlayerState.IDLE;
+
+// Formateo de tiempo
+function fmt(t) {
+    let m = Math.floor(t / 60), s = Math.floor(t % 60);
+    return String(m).padStart(2, "0") + ":" + String(s).padStart(2, "0");
+}
+
+// Extraer IDs de YouTube (corregido)
+function extractYouTubeIDs(text) {
+    // Expresión regular mejorada para detectar todos los formatos de URL de YouTube
+    const regex = /(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/|youtube\.com\/shorts\/|youtube\.com\/live\/)([a-zA-Z0-9_-]{11})/g;
+    const ids = new Set(); // Evita duplicados y conserva el orden
+    let match;
+
+    while ((match = regex.exec(text)) !== null) {
+        ids.add(match[1]);
+    }
+
+    return [...ids];
+}
+
+// Función para agregar video por ID - MEJORADA
+function addVideoById(id) {
+    const added = playlist.add({
+        id, 
+        title: `Cargando... (${id})`, 
+        duration: 0, 
+        audio_url: ""
+    });
+    if (added) {
+        queuePlaylistOp({op: "add", tracks: [{id}]});
+        render();
+
+        // Usar el endpoint combinado como en c0.py
+        fetch("/extract_audio", {
+            method: "POST",
+            headers: {"Content-Type": "application/json"},
+            body: JSON.stringify({url: `https://youtube.com/watch?v=${id}`})
+        })
+        .then(r => r.json())
+        .then(d => {
+            // Por ID: la pista pudo moverse (o quitarse) mientras tanto
+            let track;
+            if (d.error) {
+                track = playlist.update(id, {title: `Error: ${id}`});
+                console.error(`Error al procesar video ${id}:`, d.error);
+            } else {
+                track = playlist.update(id, {title: d.title, duration: d.duration, audio_url: d.audio_url});
+            }
+            if (!track) return;
+            renderTrack(track);
+            updateTotalTime();
+
+            // Actualizar siguiente pista si es necesario
+            if (nextTrack === -1 && playlist.length > 1) {
+                if (current === playlist.length - 2) {
+                    nextTrack = playlist.length - 1;
+                    document.getElementById("nexttrack").textContent = playlist.at(nextTrack).title;
+                } else if (current === -1) {
+                    nextTrack = 0;
+                    document.getElementById("nexttrack").textContent = playlist.at(nextTrack).title;
+                }
+            }
+        })
+        .catch(error => {
+            console.error(`Error de red al agregar video ${id}:`, error);
+            const track = playlist.update(id, {title: `Error de red: ${id}`});
+            if (track) renderTrack(track);
+        });
+    }
+}
+
+// Agregar enlaces
+function add() {
+    const input = document.getElementById("url");
+    const text = input.value.trim();
+
+    if (!text) {
+        alert("Por favor, ingresa al menos un enlace o ID de YouTube");
+        return;
+    }
+
+    // Un enlace a una lista (/playlist?list=) se importa entero. Un video
+    // abierto dentro de una lista o mix (watch?v=...&list=...) es casi
+    // siempre ese video: la lista se importa sólo si se confirma
+    if (/^\S+[?&]list=[\w-]+\S*$/.test(text)) {
+        const video = /(?:[?&]v=|youtu\.be\/)([a-zA-Z0-9_-]{11})/.exec(text);
+        if (!video || confirm("El enlace es un video dentro de una lista. ¿Importar la lista entera?\n\n" +
+                              "Aceptar importa la lista; Cancelar agrega sólo este video.")) {
+            importPlaylist(text);
+            return;
+        }
+        addVideoById(video[1]);
+        input.value = "";
+        return;
+    }
+
+    // Si es un ID directo (11 caracteres), agregarlo directamente
+    if (/^[a-zA-Z0-9_-]{11}$/.test(text)) {
+        addVideoById(text);
+        input.value = "";
+        return;
+    }
+
+    // Extraer IDs de URLs completas
+    const ids = extractYouTubeIDs(text);
+
+    if (ids.length === 0) {
+        alert("No se detectaron enlaces válidos de YouTube. Por favor, verifica los enlaces.");
+        return;
+    }
+
+    // Agregar marcadores para los videos que no están en la lista
+    const newIds = ids.filter(id => playlist.add({
+        id, 
+        title: `Cargando... (${id})`, 
+        duration: 0, 
+        audio_url: ""
+    }));
+
+    // Si no se agregó ningún video nuevo (todos ya existían)
+    if (newIds.length === 0) {
+        input.value = "";
+        input.focus();
+        return;
+    }
+
+    queuePlaylistOp({op: "add", tracks: newIds.map(id => ({id}))});
+    render();
+
+    // Mostrar mensaje de carga
+    input.value = `Agregando ${newIds.length} video(s)...`;
+    input.disabled = true;
+
+    resolveTracks(newIds).finally(() => {
+        input.value = "";
+        input.disabled = false;
+        input.focus();
+    });
+}
+
+// Importar una lista o mix: el servidor manda ID, título y duración de cada
+// pista a medida que recorre las páginas de la lista. Las pistas se agregan
+// (y se guardan) de a tandas, una por cuadro; el audio se resuelve recién
+// cuando se acerca su turno (ver reportQueue)
+function importPlaylist(url) {
+    const input = document.getElementById("url");
+    let imported = 0, pending = [], frame = null;
+
+    const flush = () => {
+        frame = null;
+        if (!pending.length) return;
+        queuePlaylistOp({op: "add", tracks: pending.map(id => ({id}))});
+        pending = [];
+        if (nextTrack === -1 && current === -1 && playlist.length) nextTrack = 0;
+        render();
+        updateTotalTime();
+        input.value = `Importando lista... ${imported} pista(s)`;
+    };
+
+    input.value = "Importando lista...";
+    input.disabled = true;
+    return fetch("/import_playlist", {
+        method: "POST",
+        headers: {"Content-Type": "application/json"},
+        body: JSON.stringify({url})
+    })
+    .then(r => readNDJSON(r, d => {
+        if (d.error) {
+            console.error("Error al importar la lista:", d.error);
+            alert(`No se pudo importar la lista: ${d.error}`);
+            return;
+        }
+        if (d.end) {
+            if (d.truncated) console.warn(`Lista recortada a ${d.count} pistas`);
+            return;
+        }
+        if (!playlist.add({id: d.id, title: d.title, duration: d.duration, audio_url: ""})) return;
+        pending.push(d.id);
+        imported++;
+        if (frame === null) frame = requestAnimationFrame(flush);
+    }))
+    .catch(error => {
+        console.error("Error de red al importar la lista:", error);
+        alert("No se pudo importar la lista. ¿Es un enlace válido?");
+    })
+    .finally(() => {
+        cancelAnimationFrame(frame);
+        flush();
+        input.value = "";
+        input.disabled = false;
+        input.focus();
+    });
+}
+
+// Resolver título, duración y audio de varias pistas ya agregadas: una sola
+// petición y el servidor devuelve cada resultado (NDJSON) a medida que termina
+function resolveTracks(newIds) {
+    return fetch("/extract_audio/batch", {
+        method: "POST",
+        headers: {"Content-Type": "application/json"},
+        body: JSON.stringify({urls: newIds})
+    })
+    .then(r => readNDJSON(r, d => {
+        if (!playlist.has(d.id)) return; // Se eliminó mientras cargaba
+
+        let track;
+        if (d.error) {
+            track = playlist.update(d.id, {title: `Error: ${d.id}`});
+            console.error(`Error al procesar video ${d.id}:`, d.error);
+        } else {
+            track = playlist.update(d.id, {title: d.title, duration: d.duration, audio_url: d.audio_url});
+        }
+        renderTrack(track);
+        updateTotalTime();
+
+        // Actualizar siguiente pista si es necesario
+        if (nextTrack === -1 && playlist.length > 1) {
+            if (current === playlist.length - 2) {
+                nextTrack = playlist.length - 1;
+                document.getElementById("nexttrack").textContent = playlist.at(nextTrack).title;
+            } else if (current === -1) {
+                nextTrack = 0;
+                document.getElementById("nexttrack").textContent = playlist.at(nextTrack).title;
+            }
+        }
+    }))
+    .catch(error => {
+        console.error("Error de red al agregar videos:", error);
+        newIds.forEach(id => {
+            let track = playlist.get(id);
+            if (track && !track.audio_url && track.title.startsWith("Cargando")) {
+                track.title = `Error de red: ${id}`;
+            }
+        });
+        render();
+    });
+}
+
+// Leer una respuesta NDJSON línea por línea a medida que llega
+async function readNDJSON(response, onItem) {
+    if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+        const {done, value} = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, {stream: true});
+        let lines = buffer.split("\n");
+        buffer = lines.pop();
+        lines.forEach(line => {
+            if (line.trim()) onItem(JSON.parse(line));
+        });
+    }
+    if (buffer.trim()) onItem(JSON.parse(buffer));
+}
+
+// Búsqueda en YouTube optimizada
+document.getElementById("searchInput").addEventListener("keypress", function(e) {
+    if (e.key === "Enter") search();
+});
+
+const SEARCH_PAGE_SIZE = 5;
+let searchState = {query: "", nextOffset: 0, loading: false};
+
+function search() {
+    let q = document.getElementById("searchInput").value.trim();
+    if (!q) return;
+
+    let results = document.getElementById("searchResults");
+    results.style.display = "block";
+    results.innerHTML = "<div class='loading'>Cargando...</div>";
+    searchState = {query: q, nextOffset: 0, loading: false};
+    loadSearchPage();
+}
+
+// Pedir la página siguiente de la búsqueda actual; los resultados llegan
+// uno por línea (NDJSON) y se muestran apenas el servidor los parsea
+function loadSearchPage() {
+    if (searchState.loading) return;
+    const state = searchState;
+    state.loading = true;
+
+    let results = document.getElementById("searchResults");
+    let moreButton = document.getElementById("searchMore");
+    if (moreButton) moreButton.remove();
+    let shown = 0;
+
+    fetch("/search_yt", {
+        method: "POST",
+        headers: {"Content-Type": "application/json"},
+        body: JSON.stringify({query: state.query, offset: state.nextOffset, limit: SEARCH_PAGE_SIZE})
+    })
+    .then(r => r.ok ? r : r.json().then(d => { throw new Error(d.error || `HTTP ${r.status}`); }))
+    .then(r => readNDJSON(r, item => {
+        if (state !== searchState) return; // Ya se hizo otra búsqueda
+        if (state.nextOffset === 0 && shown === 0) results.innerHTML = "";
+
+        if (item.error) {
+            results.insertAdjacentHTML("beforeend", `<div style='padding:20px;color:var(--error)'>Error: ${item.error}</div>`);
+            return;
+        }
+
+        if (item.end) {
+            state.nextOffset = item.next_offset;
+            if (state.nextOffset === 0) {
+                results.innerHTML = "<div style='padding:20px;color:var(--text-secondary)'>No se encontraron resultados.</div>";
+            } else if (item.has_more) {
+                results.insertAdjacentHTML("beforeend", "<button id='searchMore' class='add-button load-more' onclick='loadSearchPage()'>Cargar más</button>");
+            }
+            return;
+        }
+
+        shown++;
+        searchResultsById.set(item.id, item);
+        let div = document.createElement("div");
+        div.className = "result-item";
+        div.innerHTML = `
+            <img src="${item.thumbnail}">
+            <div class="result-info">
+                <div class="result-title">${item.title}</div>
+                <div class="result-duration">${item.duration_string || fmt(item.duration)}</div>
+            </div>
+            <button class="result-add" onclick="addFromSearch('${item.id}')">Agregar</button>
+        `;
+        results.appendChild(div);
+    }))
+    .catch(error => {
+        console.error("Error en búsqueda:", error);
+        if (state !== searchState) return;
+        if (state.nextOffset === 0 && shown === 0) results.innerHTML = "";
+        results.insertAdjacentHTML("beforeend", `<div style='padding:20px;color:var(--error)'>Error de red: ${error}</div>`);
+    })
+    .finally(() => {
+        state.loading = false;
+    });
+}
+
+// Resultados de la última búsqueda, para agregarlos sin volver a extraer
+const searchResultsById = new Map();
+
+function addFromSearch(id) {
+    const item = searchResultsById.get(id);
+    if (!item || !item.duration) {
+        // Sin duración conocida: agregar por ID (el servidor la completa)
+        addVideoById(id);
+        return;
+    }
+    // Título y duración ya vienen de la búsqueda; el audio se resuelve al reproducir
+    if (!playlist.add({
+        id,
+        title: item.title,
+        duration: item.duration,
+        audio_url: ""
+    })) return;
+    queuePlaylistOp({op: "add", tracks: [{id, title: item.title, duration: item.duration}]});
+    render();
+    updateTotalTime();
+    
+    if (nextTrack === -1 && playlist.length > 1) {
+        if (current === playlist.length - 2) {
+            nextTrack = playlist.length - 1;
+            document.getElementById("nexttrack").textContent = playlist.at(nextTrack).title;
+        } else if (current === -1) {
+            nextTrack = 0;
+            document.getElementById("nexttrack").textContent = playlist.at(nextTrack).title;
+        }
+    }
+}
+
+// Renderizar lista: virtualizada (ver virtual-list.js), sólo se dibujan las
+// filas a la vista y cada una se rellena en su lugar
+const playlistView = new VirtualList(document.getElementById("sortable"), {
+    count: () => playlist.length,
+    renderRow: renderTrackRow
+});
+
+function renderTrackRow(li, i) {
+    const t = playlist.at(i);
+    li.className = "track";
+
+    // Asignar clases según el estado
+    if (i === current && playerState === PlayerState.PLAYING) {
+        li.classList.add("playing");
+    } else if (i === current && playerState === PlayerState.LOADING) {
+        li.classList.add("loading");
+    } else if (i === nextTrack) {
+        li.classList.add("next");
+    }
+
+    // La estructura se arma una vez por <li>; después sólo cambia el texto
+    if (!li.firstChild) {
+        const title = document.createElement("span");
+        title.className = "track-title";
+        const right = document.createElement("span");
+        const duration = document.createElement("span");
+        const del = document.createElement("button");
+        del.className = "delete-btn";
+        del.textContent = "🗑️";
+        right.append(duration, del);
+        li.append(title, right);
+    }
+    li.firstChild.textContent = t.title;
+    li.lastChild.firstChild.textContent = fmt(t.duration);
+}
+
+function render() {
+    playlistView.refresh();
+    updateCurrentInfo();
+}
+
+// Redibujar sólo la fila de una pista (p. ej. cuando llegan sus metadatos)
+function renderTrack(track) {
+    const i = playlist.indexOf(track.id);
+    if (i < 0) return;
+    playlistView.updateRow(i);
+    if (i === current) updateCurrentInfo();
+}
+
+// Eventos de las filas, por delegación: así las filas recicladas no
+// necesitan closures propias
+const sortableList = document.getElementById("sortable");
+
+sortableList.addEventListener("click", function(e) {
+    const i = playlistView.indexOf(e.target);
+    if (i < 0) return;
+    if (e.target.closest(".delete-btn")) {
+        e.stopPropagation();
+        removeTrack(i);
+        return;
+    }
+    // Un click: seleccionar como siguiente
+    if (e.detail === 1) { // Single click
+        setTimeout(() => {
+            if (e.detail === 1) { // Still single click after delay
+                setNextTrack(i);
+            }
+        }, 200);
+    }
+});
+
+// Doble click: reproducir
+sortableList.addEventListener("dblclick", function(e) {
+    const i = playlistView.indexOf(e.target);
+    if (i < 0 || e.target.closest(".delete-btn")) return;
+    e.stopPropagation(); // Prevent single click handler
+    playTrack(i);
+});
+
+function setNextTrack(index) {
+    nextTrack = index;
+    document.getElementById("nexttrack").textContent = playlist.at(nextTrack).title;
+    render();
+}
+
+// Función playTrack mejorada - SIMPLIFICADA COMO EN C0.PY
+function playTrack(index) {
+    // Si ya estamos reproduciendo esta pista, no hacer nada
+    if (current === index && playerState === PlayerState.PLAYING) {
+        return;
+    }
+
+    // Actualizar estado
+    current = index;
+    playerState = PlayerState.LOADING;
+    playlistView.scrollToIndex(index);
+    render();
+
+    let track = playlist.at(index);
+
+    // Mostrar estado de carga
+    document.getElementById("current").textContent = `Cargando audio... (${track.title})`;
+
+    // Verificar si tenemos la URL del audio
+    if (!track.audio_url) {
+        // Si no tenemos la URL, obtenerla primero
+        fetch("/extract_audio", {
+            method: "POST",
+            headers: {"Content-Type": "application/json"},
+            body: JSON.stringify({url: `https://youtube.com/watch?v=${track.id}`})
+        })
+        .then(r => r.json())
+        .then(d => {
+            if (d.error) {
+                playerState = PlayerState.ERROR;
+                document.getElementById("current").textContent = `Error: ${track.title}`;
+                console.error(`Error al obtener audio: ${d.error}`);
+                return;
+            }
+
+            // Actualizar la URL del audio en la playlist
+            track.audio_url = d.audio_url;
+
+            // Ahora reproducir
+            playAudio(track);
+        })
+        .catch(error => {
+            playerState = PlayerState.ERROR;
+            document.getElementById("current").textContent = `Error de red: ${track.title}`;
+            console.error(`Error al obtener audio: ${error}`);
+        });
+    } else {
+        // Si ya tenemos la URL, reproducir directamente
+        playAudio(track);
+    }
+}
+
+// Función para reproducir audio - SIMPLIFICADA COMO EN C0.PY
+function playAudio(track) {
+    // Limpiar completamente el reproductor
+    audio.pause();
+    audio.removeAttribute('src');
+    audio.load();
+
+    // Configurar event listeners
+    const onCanPlay = () => {
+        audio.play()
+            .then(() => {
+                playerState = PlayerState.PLAYING;
+                paused = false;
+                document.getElementById("current").textContent = track.title;
+                updateCurrentInfo();
+                prefetchNext();
+                reportQueue();
+            })
+            .catch(error => {
+                playerState = PlayerState.ERROR;
+                console.error("Error al reproducir audio:", error);
+                document.getElementById("current").textContent = `Error al reproducir: ${track.title}`;
+            })
+            .finally(() => {
+                // Limpiar event listeners
+                audio.removeEventListener('canplay', onCanPlay);
+                audio.removeEventListener('error', onError);
+                clearTimeout(timeout);
+            });
+    };
+
+    const onError = () => {
+        playerState = PlayerState.ERROR;
+        console.error("Error al cargar audio");
+        document.getElementById("current").textContent = `Error al cargar: ${track.title}`;
+        clearTimeout(timeout);
+    };
+
+    // Timeout para evitar que la promesa quede pendiente para siempre
+    const timeout = setTimeout(() => {
+        playerState = PlayerState.ERROR;
+        console.error("Timeout al cargar audio");
+        document.getElementById("current").textContent = `Timeout: ${track.title}`;
+        audio.removeEventListener('canplay', onCanPlay);
+        audio.removeEventListener('error', onError);
+    }, 10000); // 10 segundos
+
+    audio.addEventListener('canplay', onCanPlay);
+    audio.addEventListener('error', onError);
+
+    // Cargar la nueva fuente
+    // A través del proxy del servidor, que renueva la URL si vence
+    audio.src = `/stream/${track.id}`;
+    audio.load();
+}
+
+// Pedir al servidor que prepare la pista que sigue (URL + primeros KB)
+function prefetchNext() {
+    let index = current + 1 < playlist.length ? current + 1 : nextTrack;
+    if (index < 0 || index === current || !playlist.at(index)) return;
+    fetch("/prefetch", {
+        method: "POST",
+        headers: {"Content-Type": "application/json"},
+        body: JSON.stringify({id: playlist.at(index).id})
+    }).catch(error => console.error("Error al precargar:", error));
+}
+
+// Informar al servidor qué pistas vienen (la actual, la elegida como
+// siguiente y las próximas de la lista) para que renueve sus URLs antes de
+// que venzan; las nuevas llegan como eventos "track"
+const QUEUE_WINDOW = 20;
+
+function reportQueue() {
+    if (current < 0) return;
+    const ids = new Set();
+    if (nextTrack >= 0 && playlist.at(nextTrack)) ids.add(playlist.at(nextTrack).id);
+    for (let i = current; i < Math.min(playlist.length, current + QUEUE_WINDOW); i++) {
+        ids.add(playlist.at(i).id);
+    }
+    fetch("/queue", {
+        method: "POST",
+        headers: {"Content-Type": "application/json"},
+        body: JSON.stringify({client: clientId, ids: [...ids]})
+    }).catch(error => console.error("Error al informar la cola:", error));
+}
+
+function removeTrack(i) {
+    const removed = playlist.removeAt(i);
+    queuePlaylistOp({op: "remove", ids: [removed.id]});
+    if (current === i) stop();
+    if (current > i) current--;
+    if (nextTrack === i) nextTrack = -1;
+    if (nextTrack > i) nextTrack--;
+    render();
+    updateTotalTime();
+}
+
+function updateTotalTime() {
+    let sum = playlist.totalDuration;
+    document.getElementById("totaltime").textContent = "Total: " + fmt(sum);
+}
+
+function togglePlay() {
+    if (playerState !== PlayerState.PLAYING) {
+        return;
+    }
+
+    if (paused) {
+        audio.play()
+            .then(() => {
+                paused = false;
+            })
+            .catch(error => {
+                console.error("Error al reanudar reproducción:", error);
+                alert(`Error al reanudar reproducción: ${error}`);
+            });
+    } else {
+        audio.pause();
+        paused = true;
+    }
+}
+
+function stop() {
+    if (playerState === PlayerState.IDLE) return;
+
+    audio.pause();
+    audio.currentTime = 0;
+    playerState = PlayerState.IDLE;
+    current = -1;
+    paused = true;
+    updateCurrentInfo();
+    render();
+}
+
+function next() {
+    if (current + 1 < playlist.length) {
+        playTrack(current + 1);
+    } else if (nextTrack >= 0) {
+        playTrack(nextTrack);
+    }
+}
+
+function prev() {
+    if (current - 1 >= 0) {
+        playTrack(current - 1);
+    }
+}
+
+function updateCurrentInfo() {
+    if (current >= 0) {
+        document.getElementById("current").textContent = playlist.at(current).title;
+    } else {
+        document.getElementById("current").textContent = "Ninguna pista";
+        document.getElementById("timeRemaining").textContent = "--:--";
+    }
+}
+
+function updateNextTrack() {
+    if (current + 1 < playlist.length) {
+        nextTrack = current + 1;
+        document.getElementById("nexttrack").textContent = playlist.at(nextTrack).title;
+    } else {
+        nextTrack = -1;
+        document.getElementById("nexttrack").textContent = "Ninguna pista seleccionada";
+    }
+    render();
+}
+
+// Actualizar tiempo restante
+audio.ontimeupdate = function() {
+    if (!audio.duration) return;
+
+    // Actualizar tiempo restante grande
+    const remaining = Math.max(0, audio.duration - audio.currentTime);
+    document.getElementById("timeRemaining").textContent = fmt(remaining);
+
+    // Actualizar tiempo restante pequeño
+    document.getElementById("lefttime").textContent = "Restante: " + fmt(remaining);
+
+    // Actualizar barra de progreso
+    const progress = (audio.currentTime / audio.duration) * 100;
+    document.getElementById("progress-bar").style.width = progress + "%";
+};
+
+// Manejar el final de la reproducción para pasar a la siguiente pista
+audio.onended = function() {
+    if (playerState === PlayerState.PLAYING) {
+        next();
+    }
+};
+
+// Lista guardada en el servidor: se carga al abrir y cada cambio se manda como
+// parche (operaciones sobre IDs), juntando los cambios que llegan seguidos
+let playlistId = null, playlistVersion = 0;
+let pendingOps = [], syncTimer = null;
+
+function queuePlaylistOp(op) {
+    pendingOps.push(op);
+    clearTimeout(syncTimer);
+    syncTimer = setTimeout(flushPlaylistOps, 300);
+}
+
+function flushPlaylistOps() {
+    if (playlistId === null || pendingOps.length === 0) return;
+    const ops = pendingOps;
+    pendingOps = [];
+    fetch(`/playlists/${playlistId}`, {
+        method: "PATCH",
+        headers: {"Content-Type": "application/json"},
+        body: JSON.stringify({ops, client: clientId})
+    })
+    .then(r => r.json())
+    .then(d => {
+        if (d.error) {
+            // El servidor rechazó el parche entero: lo que se ve ya no es lo
+            // guardado, así que se vuelve a traer la lista completa
+            console.error("Error al guardar la lista:", d.error);
+            syncPlaylist(true);
+            return;
+        }
+        playlistVersion = Math.max(playlistVersion, d.version);
+        reportQueue(); // La lista cambió: quizás también lo que viene
+    })
+    .catch(error => {
+        // Reintentar más tarde, antes que los cambios que lleguen mientras
+        console.error("Error de red al guardar la lista:", error);
+        pendingOps = ops.concat(pendingOps);
+        clearTimeout(syncTimer);
+        syncTimer = setTimeout(flushPlaylistOps, 5000);
+    });
+}
+
+async function loadSavedPlaylist() {
+    try {
+        const {playlists} = await (await fetch("/playlists")).json();
+        const saved = playlists.length ? playlists[0] : await (await fetch("/playlists", {
+            method: "POST",
+            headers: {"Content-Type": "application/json"},
+            body: JSON.stringify({name: "Mi lista"})
+        })).json();
+        const d = await (await fetch(`/playlists/${saved.id}`)).json();
+        if (d.error) throw new Error(d.error);
+        playlistId = d.id;
+        applySavedPlaylist(d);
+        flushPlaylistOps();
+    } catch (error) {
+        console.error("Error al cargar la lista guardada:", error);
+    }
+}
+
+// keep decide qué pistas que sólo están en esta pestaña se conservan (al
+// cargar, todas: se agregaron mientras llegaba la lista)
+function applySavedPlaylist(d, keep = () => true) {
+    playlistVersion = d.version;
+    const currentId = current >= 0 ? playlist.at(current).id : null;
+    const nextId = nextTrack >= 0 ? playlist.at(nextTrack).id : null;
+
+    // Lo guardado primero, y después lo que se haya agregado mientras cargaba
+    const savedIds = new Set(d.tracks.map(t => t.id));
+    const known = new Set([...playlist].map(t => t.id));
+    const addedMeanwhile = [...playlist].filter(t => !savedIds.has(t.id) && keep(t.id));
+    playlist.reset(d.tracks.map(t => playlist.get(t.id) || {
+        id: t.id,
+        title: t.title || `Cargando... (${t.id})`,
+        duration: t.duration,
+        audio_url: ""
+    }).concat(addedMeanwhile));
+    if (currentId && !playlist.has(currentId)) stop();
+    restorePositions(playlist.has(currentId) ? currentId : null, nextId);
+
+    // Sólo las pistas sin metadatos en el servidor necesitan extraerse
+    const missing = d.tracks.filter(t => !t.title && !known.has(t.id)).map(t => t.id);
+    if (missing.length) resolveTracks(missing);
+}
+
+// current y nextTrack son posiciones: después de cambios que no vienen de
+// esta pestaña se recalculan a partir de los IDs
+function restorePositions(currentId, nextId) {
+    current = currentId ? playlist.indexOf(currentId) : -1;
+    nextTrack = nextId ? playlist.indexOf(nextId) : -1;
+    render();
+    updateTotalTime();
+}
+
+// Aplica operaciones de otro cliente (las mismas que acepta PATCH)
+function applyPlaylistOps(ops) {
+    const currentId = current >= 0 ? playlist.at(current).id : null;
+    const nextId = nextTrack >= 0 ? playlist.at(nextTrack).id : null;
+    const missing = [];
+    for (const op of ops) {
+        if (op.op === "add") {
+            const after = op.after === null ? -1 : playlist.indexOf(op.after);
+            let index = after >= 0 || op.after === null ? after + 1 : playlist.length;
+            for (const t of op.tracks) {
+                const track = {id: t.id, title: t.title || `Cargando... (${t.id})`, duration: t.duration, audio_url: ""};
+                if (!playlist.insert(track, index)) continue;
+                index++;
+                if (!t.title) missing.push(t.id);
+            }
+        } else if (op.op === "remove") {
+            for (const id of op.ids) {
+                const i = playlist.indexOf(id);
+                if (i >= 0) playlist.removeAt(i);
+            }
+        } else if (op.op === "move") {
+            const from = playlist.indexOf(op.id);
+            if (from < 0) continue;
+            const before = op.before === null ? playlist.length : playlist.indexOf(op.before);
+            if (before < 0) continue;
+            playlist.move(from, before > from ? before - 1 : before);
+        } else if (op.op === "clear") {
+            playlist.reset([]);
+        }
+    }
+    if (currentId && !playlist.has(currentId)) stop();
+    restorePositions(playlist.has(currentId) ? currentId : null, nextId);
+    if (missing.length) resolveTracks(missing);
+}
+
+// Trae lo que falte desde la versión que se tiene (o la lista entera). Con
+// full se descarta lo que esta pestaña cambió y el servidor no tiene, salvo
+// las pistas que todavía esperan para mandarse
+async function syncPlaylist(full = false) {
+    if (playlistId === null) return;
+    try {
+        const path = full ? `/playlists/${playlistId}` : `/playlists/${playlistId}/changes?since=${playlistVersion}`;
+        const d = await (await fetch(path)).json();
+        if (d.error) throw new Error(d.error);
+        if (full) {
+            const pending = new Set(pendingOps.filter(op => op.op === "add").flatMap(op => op.tracks.map(t => t.id)));
+            applySavedPlaylist(d, id => pending.has(id));
+            reportQueue();
+            return;
+        }
+        if (d.reset) {
+            applySavedPlaylist(d);
+            return;
+        }
+        // Incluye los parches propios: aplicarlos otra vez no cambia nada
+        for (const patch of d.patches) applyPlaylistOps(patch.ops);
+        playlistVersion = Math.max(playlistVersion, d.version);
+    } catch (error) {
+        console.error("Error al sincronizar la lista:", error);
+    }
+}
+
+// Canal de eventos del servidor (/events): metadatos y URLs nuevas de las
+// pistas, precargas terminadas y cambios de la lista hechos en otra pestaña.
+// EventSource se reconecta solo y el servidor reenvía lo que se perdió.
+const clientId = Math.random().toString(36).slice(2);
+
+function connectEvents() {
+    const source = new EventSource("/events");
+
+    source.addEventListener("track", e => {
+        const d = JSON.parse(e.data);
+        const track = playlist.update(d.id, {title: d.title, duration: d.duration, audio_url: d.audio_url});
+        if (!track) return;
+        renderTrack(track);
+        updateTotalTime();
+        if (playlist.indexOf(d.id) === nextTrack) {
+            document.getElementById("nexttrack").textContent = track.title;
+        }
+    });
+
+    source.addEventListener("prefetch", e => {
+        const d = JSON.parse(e.data);
+        if (d.status === "error" && playlist.has(d.id)) {
+            console.warn(`No se pudo precargar ${d.id}`);
+        }
+    });
+
+    source.addEventListener("playlist", e => {
+        const d = JSON.parse(e.data);
+        if (d.id !== playlistId) return;
+        if (d.client === clientId) {
+            playlistVersion = Math.max(playlistVersion, d.version);
+        } else if (d.version === playlistVersion + 1) {
+            applyPlaylistOps(d.ops);
+            playlistVersion = d.version;
+        } else if (d.version > playlistVersion) {
+            syncPlaylist(); // Faltan parches intermedios
+        }
+    });
+
+    // El servidor no tiene todo lo que se perdió (o se reinició)
+    source.addEventListener("reset", () => syncPlaylist());
+}
+
+loadSavedPlaylist();
+connectEvents();
+
+// Hacer lista ordenable. Sólo las filas dibujadas son arrastrables: los
+// índices de Sortable son relativos a la primera fila a la vista, y mientras
+// dura el arrastre la lista virtual no toca el DOM
+new Sortable(sortableList, {
+    animation: 150,
+    draggable: ".track",
+    onStart: function() {
+        playlistView.freeze();
+    },
+    onEnd: function(evt) {
+        const oldIndex = playlistView.start + evt.oldDraggableIndex;
+        const newIndex = playlistView.start + evt.newDraggableIndex;
+        if (oldIndex === newIndex) {
+            playlistView.unfreeze();
+            return;
+        }
+        const moved = playlist.at(oldIndex);
+        playlist.move(oldIndex, newIndex);
+        const before = playlist.at(newIndex + 1);
+        queuePlaylistOp({op: "move", id: moved.id, before: before ? before.id : null});
+
+        if (oldIndex === current) current = -1;
+        else if (oldIndex < current) current--;
+
+        if (oldIndex === nextTrack) nextTrack = -1;
+        else if (oldIndex < nextTrack) nextTrack--;
+
+        playlistView.unfreeze();
+        updateCurrentInfo();
+    }
+});
+
+// Funcionalidad del menú contextual (clic derecho)
+const contextMenu = document.getElementById('contextMenu');
+let selectedText = '';
+
+// Evento para mostrar el menú contextual
+document.addEventListener('contextmenu', function(e) {
+    e.preventDefault();
+
+    // Obtener el texto seleccionado
+    selectedText = window.getSelection().toString();
+
+    // Mostrar el menú en la posición del ratón
+    contextMenu.style.display = 'block';
+    contextMenu.style.left = e.pageX + 'px';
+    contextMenu.style.top = e.pageY + 'px';
+
+    // Deshabilitar la opción de copiar si no hay texto seleccionado
+    document.getElementById('copyOption').style.opacity = selectedText ? '1' : '0.5';
+    document.getElementById('copyOption').style.pointerEvents = selectedText ? 'auto' : 'none';
+});
+
+// Ocultar el menú al hacer clic en cualquier parte
+document.addEventListener('click', function() {
+    contextMenu.style.display = 'none';
+});
+
+// Función para copiar
+document.getElementById('copyOption').addEventListener('click', function() {
+    if (selectedText) {
+        navigator.clipboard.writeText(selectedText).then(function() {
+            console.log('Texto copiado');
+        }).catch(function(err) {
+            console.error('Error al copiar: ', err);
+        });
+    }
+});
+
+// Función para pegar
+document.getElementById('pasteOption').addEventListener('click', function() {
+    navigator.clipboard.readText().then(function(text) {
+        // Intentar pegar en el elemento activo (input o textarea)
+        let activeElement = document.activeElement;
+        if (activeElement.tagName === 'INPUT' || activeElement.tagName === 'TEXTAREA') {
+            let start = activeElement.selectionStart;
+            let end = activeElement.selectionEnd;
+            activeElement.value = activeElement.value.substring(0, start) + text + activeElement.value.substring(end);
+            activeElement.selectionStart = activeElement.selectionEnd = start + text.length;
+        }
+    }).catch(function(err) {
+        console.error('Error al pegar: ', err);
+    });
+});
@@ -0,0 +1,108 @@
+// Modelo de la lista de reproducción: las pistas por ID (Map) y el orden como
+// array de IDs, con un índice ID -> posición. Saber si un ID ya está, buscar
+// una pista o su posición es O(1); mover una fila sólo reindexa el tramo entre
+// la posición vieja y la nueva, y quitar una deja el reindexado para cuando
+// se pida una posición.
+class PlaylistModel {
+    constructor() {
+        this.byId = new Map();
+        this.order = [];
+        this.positions = new Map();
+        this.staleFrom = Infinity; // Posiciones a partir de aquí sin actualizar
+        this.totalDuration = 0;
+    }
+
+    get length() {
+        return this.order.length;
+    }
+
+    has(id) {
+        return this.byId.has(id);
+    }
+
+    get(id) {
+        return this.byId.get(id);
+    }
+
+    at(index) {
+        return this.byId.get(this.order[index]);
+    }
+
+    indexOf(id) {
+        if (!this.byId.has(id)) return -1;
+        this.reindex(this.staleFrom, this.order.length - 1);
+        return this.positions.get(id);
+    }
+
+    reindex(from, to) {
+        for (let i = from; i <= to; i++) this.positions.set(this.order[i], i);
+        if (to >= this.order.length - 1 && from <= this.staleFrom) this.staleFrom = Infinity;
+    }
+
+    // Agrega al final; false si el ID ya estaba
+    add(track) {
+        if (this.byId.has(track.id)) return false;
+        this.byId.set(track.id, track);
+        this.positions.set(track.id, this.order.length);
+        this.order.push(track.id);
+        this.totalDuration += track.duration || 0;
+        return true;
+    }
+
+    // Inserta en una posición (p. ej. cambios de otra pestaña); false si ya estaba
+    insert(track, index) {
+        if (this.byId.has(track.id)) return false;
+        this.byId.set(track.id, track);
+        this.order.splice(index, 0, track.id);
+        this.totalDuration += track.duration || 0;
+        this.staleFrom = Math.min(this.staleFrom, index);
+        return true;
+    }
+
+    // Cambia campos de una pista (título, duración, audio...) sin importar
+    // dónde esté ahora; devuelve la pista o undefined si ya no está
+    update(id, fields) {
+        const track = this.byId.get(id);
+        if (!track) return undefined;
+        if ("duration" in fields) this.totalDuration += (fields.duration || 0) - (track.duration || 0);
+        Object.assign(track, fields);
+        return track;
+    }
+
+    removeAt(index) {
+        const [id] = this.order.splice(index, 1);
+        const track = this.byId.get(id);
+        this.byId.delete(id);
+        this.positions.delete(id);
+        this.totalDuration -= track.duration || 0;
+        this.staleFrom = Math.min(this.staleFrom, index);
+        return track;
+    }
+
+    // Corre sólo las filas entre las dos posiciones (splice movería todo el resto)
+    move(from, to) {
+        const id = this.order[from];
+        const step = from < to ? 1 : -1;
+        for (let i = from; i !== to; i += step) this.order[i] = this.order[i + step];
+        this.order[to] = id;
+        if (this.staleFrom === Infinity) {
+            this.reindex(Math.min(from, to), Math.max(from, to));
+        } else {
+            this.staleFrom = Math.min(this.staleFrom, from, to);
+        }
+    }
+
+    // Reemplaza toda la lista (p. ej. al cargar la guardada)
+    reset(tracks) {
+        this.byId.clear();
+        this.order = [];
+        this.positions.clear();
+        this.staleFrom = Infinity;
+        this.totalDuration = 0;
+        tracks.forEach(track => this.add(track));
+    }
+
+    [Symbol.iterator]() {
+        return this.order.map(id => this.byId.get(id))[Symbol.iterator]();
+    }
+}
@@ -0,0 +1,117 @@
+// Lista virtualizada: sólo existen en el DOM las filas visibles (más un margen)
+// y dos espaciadores que ocupan la altura del resto, así una lista de miles de
+// pistas se dibuja y se desplaza igual que una de diez. Las filas se reciclan
+// y se rellenan con renderRow(li, index); los eventos se manejan por
+// delegación en el contenedor (li.dataset.index dice qué fila es).
+class VirtualList {
+    constructor(container, {count, renderRow, overscan = 10}) {
+        this.container = container;
+        this.count = count;
+        this.renderRow = renderRow;
+        this.overscan = overscan;
+        this.rowHeight = 0;
+        this.start = 0;
+        this.end = 0;
+        this.rows = [];
+        this.frozen = false;
+        this.scheduled = false;
+
+        container.innerHTML = "";
+        this.topSpacer = this.makeSpacer();
+        this.bottomSpacer = this.makeSpacer();
+        container.append(this.topSpacer, this.bottomSpacer);
+        container.addEventListener("scroll", () => this.schedule(), {passive: true});
+        window.addEventListener("resize", () => this.schedule());
+    }
+
+    makeSpacer() {
+        const li = document.createElement("li");
+        li.className = "spacer";
+        li.setAttribute("aria-hidden", "true");
+        return li;
+    }
+
+    // Agrupa los pedidos de un mismo cuadro en un solo dibujado
+    schedule() {
+        if (this.scheduled) return;
+        this.scheduled = true;
+        requestAnimationFrame(() => {
+            this.scheduled = false;
+            this.refresh();
+        });
+    }
+
+    // Mientras Sortable arrastra una fila no se puede tocar el DOM
+    freeze() {
+        this.frozen = true;
+    }
+
+    unfreeze() {
+        this.frozen = false;
+        this.refresh();
+    }
+
+    measure() {
+        // La altura de fila sale de la primera fila dibujada (las filas son de
+        // una sola línea, ver .track en app.css)
+        if (this.rowHeight || !this.rows.length) return;
+        this.rowHeight = this.rows[0].offsetHeight;
+        if (this.rowHeight) this.refresh();
+    }
+
+    // Vuelve a calcular qué filas se ven y las redibuja: O(filas visibles)
+    refresh() {
+        if (this.frozen) return;
+        const total = this.count();
+        const rowHeight = this.rowHeight || 50;
+        const viewport = this.container.clientHeight || 400;
+        const first = Math.floor(this.container.scrollTop / rowHeight);
+        const start = Math.max(0, Math.min(first, total) - this.overscan);
+        const end = Math.min(total, first + Math.ceil(viewport / rowHeight) + this.overscan);
+
+        // Reciclar los <li>: sobran se quitan, faltan se crean
+        while (this.rows.length > end - start) this.rows.pop().remove();
+        while (this.rows.length < end - start) {
+            const li = document.createElement("li");
+            this.rows.push(li);
+        }
+        this.rows.forEach((li, offset) => {
+            li.dataset.index = start + offset;
+            this.renderRow(li, start + offset);
+            // Dejar cada fila justo después de la anterior (las nuevas aún no
+            // están en el DOM y Sortable pudo haber movido las otras)
+            const previous = offset ? this.rows[offset - 1] : this.topSpacer;
+            if (previous.nextSibling !== li) {
+                this.container.insertBefore(li, previous.nextSibling);
+            }
+        });
+        this.start = start;
+        this.end = end;
+        this.topSpacer.style.height = `${start * rowHeight}px`;
+        this.bottomSpacer.style.height = `${(total - end) * rowHeight}px`;
+        this.measure();
+    }
+
+    // Redibuja una sola fila si está a la vista (p. ej. llegaron sus metadatos)
+    updateRow(index) {
+        if (this.frozen || index < this.start || index >= this.end) return;
+        this.renderRow(this.rows[index - this.start], index);
+    }
+
+    // Índice en la lista de una fila del DOM (o -1 si no es una fila)
+    indexOf(element) {
+        const li = element && element.closest("li[data-index]");
+        return li ? Number(li.dataset.index) : -1;
+    }
+
+    scrollToIndex(index) {
+        const rowHeight = this.rowHeight || 50;
+        const top = index * rowHeight;
+        const viewport = this.container.clientHeight || 400;
+        if (top < this.container.scrollTop) {
+            this.container.scrollTop = top;
+        } else if (top + rowHeight > this.container.scrollTop + viewport) {
+            this.container.scrollTop = top + rowHeight - viewport;
+        }
+    }
+}
@@ -0,0 +1,53 @@
+# CT crea sus carpetas (data/, downloads/) al importarse: las pruebas usan
+# una carpeta temporal y el extractor falso, sin red
+import os, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="choclotube-tests-")
+os.environ.setdefault("CHOCLOTUBE_DATA_DIR", os.path.join(WORKDIR, "data"))
+os.environ.setdefault("CHOCLOTUBE_EXTRACTOR", "fake")
+os.chdir(WORKDIR)
+sys.path.insert(0, ROOT)
+
+import pytest
+
+import CT
+
+class Backend:
+    # Extractor falso, caché de metadatos y single-flight propios de cada
+    # prueba; `failing` son IDs cuya extracción falla siempre
+    def __init__(self, tmp_path, latency: float, url_ttl: int):
+        self.failing = set()
+        backend = self
+
+        class Extractor(CT.FakeExtractor):
+            def extract_audio(self, url: str) -> dict:
+                info = super().extract_audio(url)
+                if info["id"] in backend.failing:
+                    raise CT.ExtractionError(f"Video no disponible: {info['id']}")
+                return info
+
+        self.extractor = Extractor(latency=latency, url_ttl=url_ttl)
+        self.metadata_cache = CT.MetadataCache(str(tmp_path / "metadata.sqlite3"), 64)
+        self.flight = CT.SingleFlight()
+
+    def close(self):
+        self.metadata_cache.close()
+        self.extractor.close()
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    # Con url_ttl corto (p. ej. el margen de vencimiento + unos segundos) se
+    # prueban las URLs a punto de vencer
+    def make(latency: float = 0.05, url_ttl: int = 6 * 3600) -> Backend:
+        b = Backend(tmp_path, latency, url_ttl)
+        monkeypatch.setattr(CT, "extractor", b.extractor)
+        monkeypatch.setattr(CT, "metadata_cache", b.metadata_cache)
+        monkeypatch.setattr(CT, "extraction_flight", b.flight)
+        made.append(b)
+        return b
+
+    made = []
+    yield make
+    for b in made:
+        b.close()
@@ -0,0 +1,50 @@
+# /extract_audio/batch: IDs repetidos se extraen una vez, un video que falla
+# no tumba el lote y cada línea dice a qué entrada corresponde (llegan en el
+# orden en que terminan, no en el de la lista)
+import asyncio, json
+
+import httpx
+
+import CT
+
+A, B, C, BAD = "batchaaaaa1", "batchaaaaa2", "batchaaaaa3", "batchaaaaa4"
+
+def post_batch(urls: list) -> list:
+    async def run():
+        transport = httpx.ASGITransport(app=CT.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/extract_audio/batch", json={"urls": urls})
+        assert response.status_code == 200
+        return [json.loads(line) for line in response.text.splitlines()]
+    return asyncio.run(run())
+
+def test_duplicates_failures_and_order(backend):
+    b = backend(latency=0.05)
+    b.failing.add(BAD)
+    # C ya está en caché: termina primero aunque va último en la lista
+    asyncio.run(CT.resolve_audio(C))
+    urls = [A, f"https://youtu.be/{A}", B, "no es un enlace", BAD,
+            f"https://www.youtube.com/watch?v={B}&t=10", C]
+    lines = post_batch(urls)
+
+    assert lines[0] == {"input": "no es un enlace", "error": "URL no válida: no es un enlace"}
+    results = lines[1:]
+    ids = [r["id"] for r in results]
+    assert sorted(ids) == sorted([A, B, BAD, C])  # Una línea por ID, sin repetir
+    assert ids[0] == C
+    by_id = {r["id"]: r for r in results}
+    assert "error" in by_id[BAD] and "audio_url" not in by_id[BAD]
+    for vid in (A, B, C):
+        assert by_id[vid]["audio_url"] and by_id[vid]["title"] == f"Pista de prueba {vid}"
+    # A, B y BAD se extrajeron una vez cada uno; C salió de la caché
+    assert b.extractor.calls == 4
+
+def test_rejects_a_body_without_a_list(backend):
+    backend()
+
+    async def run():
+        transport = httpx.ASGITransport(app=CT.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/extract_audio/batch", json={"urls": A})
+
+    assert asyncio.run(run()).status_code == 400
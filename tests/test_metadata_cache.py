@@ -0,0 +1,55 @@
+# Caché de metadatos por ID: la URL de audio se reutiliza hasta su
+# "expire=" menos URL_EXPIRY_MARGIN; más cerca del vencimiento se re-extrae
+# sin perder título y duración
+import asyncio
+
+import CT
+
+VID = "metadataaa1"
+
+def resolve(vid: str = VID) -> dict:
+    return asyncio.run(CT.resolve_audio(vid))
+
+def test_cached_url_is_reused(backend):
+    b = backend(latency=0.01, url_ttl=CT.URL_EXPIRY_MARGIN + 120)
+    first = resolve()
+    assert resolve() == first
+    assert b.extractor.calls == 1
+    assert b.metadata_cache.stats()["hits"] == 1
+
+def test_url_inside_the_safety_margin_is_refetched(backend):
+    # Todavía no venció, pero vence antes del margen: no es segura de usar
+    b = backend(latency=0.01, url_ttl=CT.URL_EXPIRY_MARGIN - 60)
+    first = resolve()
+    second = resolve()
+    assert b.extractor.calls == 2
+    assert b.metadata_cache.stats()["stale_hits"] == 1
+    assert second["title"] == first["title"]
+    assert CT.url_expiry(second["audio_url"]) >= CT.url_expiry(first["audio_url"])
+
+def test_stale_hit_keeps_title_and_duration(backend):
+    b = backend(latency=0.01, url_ttl=CT.URL_EXPIRY_MARGIN - 60)
+    first = resolve()
+    cached = b.metadata_cache.get(VID)
+    assert cached == dict(first, audio_url="")
+
+def test_rejected_url_is_forgotten(backend):
+    b = backend(latency=0.01)
+    resolve()
+    b.metadata_cache.expire_url(VID)  # googlevideo respondió 403
+    resolve()
+    assert b.extractor.calls == 2
+
+def test_entries_survive_a_restart(backend, tmp_path):
+    b = backend(latency=0.01)
+    first = resolve()
+    reopened = CT.MetadataCache(str(tmp_path / "metadata.sqlite3"), 64)
+    try:
+        assert reopened.get(VID) == first
+    finally:
+        reopened.close()
+
+def test_url_expiry_formats():
+    assert CT.url_expiry("https://rr1.googlevideo.com/videoplayback?id=x&expire=1700000000&ei=y") == 1700000000
+    assert CT.url_expiry("https://manifest.googlevideo.com/api/manifest/dash/expire/1700000000/ei/y") == 1700000000
+    assert CT.url_expiry("https://example.com/audio.webm") is None
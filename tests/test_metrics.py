@@ -0,0 +1,29 @@
+# /metrics: lo que sólo crece va como counter con _total, lo demás como gauge
+import CT
+
+def metric_types(values: dict) -> dict:
+    lines = []
+    CT.metric_lines("choclotube", values, lines)
+    return dict(line[len("# TYPE "):].split() for line in lines if line.startswith("# TYPE "))
+
+def test_counters_and_gauges():
+    types = metric_types({
+        "stream": {"active": 1, "bytes_proxied": 10, "resumes": 0, "errors": 2},
+        "disk_cache": {"enabled": True, "used_bytes": 5, "hits": 3, "hit_ratio": 0.5},
+    })
+    assert types == {
+        "choclotube_stream_active": "gauge",
+        "choclotube_stream_bytes_proxied_total": "counter",
+        "choclotube_stream_resumes_total": "counter",
+        "choclotube_stream_errors_total": "counter",
+        "choclotube_disk_cache_enabled": "gauge",
+        "choclotube_disk_cache_used_bytes": "gauge",
+        "choclotube_disk_cache_hits_total": "counter",
+        "choclotube_disk_cache_hit_ratio": "gauge",
+    }
+
+def test_every_stats_value_has_a_type():
+    types = metric_types(CT.stats_snapshot())
+    assert types["choclotube_extractor_completed_total"] == "counter"
+    assert types["choclotube_extractor_in_flight"] == "gauge"
+    assert not any(name.endswith("_total") and kind == "gauge" for name, kind in types.items())
@@ -0,0 +1,55 @@
+# Un parche armado antes de ver los cambios de otro cliente no tiene que
+# rechazarse entero porque una operación apunte a una pista ya quitada
+import pytest
+
+import CT
+
+A, B, C, D = "trackaaaaa1", "trackaaaaa2", "trackaaaaa3", "trackaaaaa4"
+
+@pytest.fixture
+def store(tmp_path):
+    store = CT.PlaylistStore(str(tmp_path / "playlists.sqlite3"))
+    pid = store.create("Prueba")["id"]
+    store.patch(pid, [{"op": "add", "tracks": [{"id": A}, {"id": B}, {"id": C}]}])
+    yield store, pid
+    store.close()
+
+def test_stale_ops_are_skipped(store):
+    store, pid = store
+    store.patch(pid, [{"op": "remove", "ids": [B]}])  # Otro cliente
+    version, applied = store.patch(pid, [
+        {"op": "move", "id": B, "before": A},
+        {"op": "move", "id": C, "before": B},
+        {"op": "remove", "ids": [B]},
+        {"op": "add", "tracks": [{"id": D}], "after": B},
+        {"op": "move", "id": C, "before": A},
+    ])
+    assert store.get(pid)["track_ids"] == [C, A, D]
+    assert [op["op"] for op in applied] == ["add", "move"]
+    assert version == 3
+
+def test_malformed_op_still_rejects_the_patch(store):
+    store, pid = store
+    with pytest.raises(CT.PlaylistError):
+        store.patch(pid, [{"op": "remove", "ids": [A]}, {"op": "add", "tracks": [{"id": "no"}]}])
+    assert store.get(pid)["track_ids"] == [A, B, C]
+
+def test_bad_duration_is_a_playlist_error(store):
+    store, pid = store
+    with pytest.raises(CT.PlaylistError):
+        store.patch(pid, [{"op": "add", "tracks": [{"id": D, "title": "D", "duration": "3:20"}]}])
+    assert store.get(pid)["track_ids"] == [A, B, C]
+
+def test_metadata_is_kept_only_for_saved_patches(store, monkeypatch, tmp_path):
+    store, pid = store
+    cache = CT.MetadataCache(str(tmp_path / "metadata.sqlite3"), 16)
+    monkeypatch.setattr(CT, "metadata_cache", cache)
+    with pytest.raises(CT.PlaylistError):
+        store.patch(pid, [
+            {"op": "add", "tracks": [{"id": D, "title": "Pista D", "duration": 200}]},
+            {"op": "rename", "name": ""},
+        ])
+    assert cache.describe_many([D]) == {}
+    store.patch(pid, [{"op": "add", "tracks": [{"id": D, "title": "Pista D", "duration": "200"}]}])
+    assert cache.describe_many([D]) == {D: {"title": "Pista D", "duration": 200}}
+    cache.close()
@@ -0,0 +1,57 @@
+# Una pista precargada que el <audio> pide con "Range: bytes=0-" tiene que
+# quedar en la caché de disco igual que por el camino normal de /stream
+import asyncio, os
+
+import httpx
+import pytest
+
+import CT
+
+@pytest.fixture
+def disk_cache(monkeypatch, tmp_path):
+    cache = CT.AudioDiskCache(str(tmp_path / "downloads"), 64 * 1024 * 1024,
+                              str(tmp_path / "audio_index.sqlite3"), str(tmp_path / "audio-parts"))
+    monkeypatch.setattr(CT, "audio_disk_cache", cache)
+    yield cache
+    cache.close()
+
+def test_prefetched_full_stream_is_cached(disk_cache):
+    vid = "prefetchaa1"
+
+    async def run():
+        CT._http_client = None
+        try:
+            CT.prefetch_buffer.schedule(vid)
+            await asyncio.gather(*CT.prefetch_buffer._pending.values())
+            assert CT.prefetch_buffer.get(vid) is not None
+            hits = CT.prefetch_buffer.hits
+            transport = httpx.ASGITransport(app=CT.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get(f"/stream/{vid}", headers={"Range": "bytes=0-"})
+            assert CT.prefetch_buffer.hits == hits + 1
+            return response
+        finally:
+            if CT._http_client is not None:
+                await CT._http_client.aclose()
+
+    response = asyncio.run(run())
+    assert response.status_code == 206
+    assert len(response.content) == int(response.headers["content-length"])
+    entry = disk_cache.lookup(vid)
+    assert entry is not None and entry["size"] == len(response.content)
+    with open(entry["path"], "rb") as f:
+        assert f.read() == response.content
+    # En la carpeta pública sólo el audio terminado: ni el índice ni el .part
+    assert os.listdir(disk_cache.directory) == [entry["file"]]
+    assert os.listdir(disk_cache.parts_dir) == []
+
+def test_prefetch_presence_check_does_not_count(disk_cache):
+    async def run():
+        CT.prefetch_buffer.schedule("prefetchaa2")  # No está en disco: se precarga
+        task = CT.prefetch_buffer._pending.pop("prefetchaa2")
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    stats = disk_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (0, 0)
@@ -0,0 +1,30 @@
+# La copia en SQLite de la caché de búsquedas no crece sin límite en un
+# servidor que no se reinicia: lo vencido se borra al guardar, una vez por TTL
+import time
+
+import CT
+
+def rows(cache) -> list:
+    return [r[0] for r in cache._db.execute("SELECT key FROM searches ORDER BY key")]
+
+def test_expired_rows_are_pruned_while_running(tmp_path):
+    cache = CT.SearchCache(60, 8, str(tmp_path / "search.sqlite3"))
+    try:
+        cache.put("vieja", {"results": [], "end": {}})
+        # Una hora después, sin reiniciar
+        cache._db.execute("UPDATE searches SET stored = stored - 3600")
+        cache._pruned -= 3600
+        cache.put("nueva", {"results": [], "end": {}})
+        assert rows(cache) == ["nueva"]
+    finally:
+        cache.close()
+
+def test_prune_runs_once_per_ttl(tmp_path):
+    cache = CT.SearchCache(60, 8, str(tmp_path / "search.sqlite3"))
+    try:
+        cache._db.execute("INSERT INTO searches (key, results, stored) VALUES ('vieja', '{}', ?)",
+                          (time.time() - 3600,))
+        cache.put("nueva", {"results": [], "end": {}})
+        assert rows(cache) == ["nueva", "vieja"]  # Recién se podó al arrancar
+    finally:
+        cache.close()
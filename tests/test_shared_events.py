@@ -0,0 +1,76 @@
+# Con varios workers, un cambio que atiende un worker tiene que llegarles a
+# las pestañas conectadas a /events en los demás, con IDs que sirvan para
+# reconectarse en cualquiera
+import asyncio, sqlite3, threading, time
+
+import pytest
+
+import CT
+
+@pytest.fixture
+def hubs(tmp_path):
+    path = str(tmp_path / "events.sqlite3")
+    a = CT.SharedEventHub(path, 16, 8, 0.1)
+    b = CT.SharedEventHub(path, 16, 8, 0.1)
+    yield a, b
+    a.close()
+    b.close()
+
+def flush(hub):
+    # Los eventos se guardan en el hilo propio de cada hub
+    hub._io.submit(lambda: None).result()
+
+def events(queue) -> list:
+    messages = []
+    while not queue.empty():
+        messages.append(queue.get_nowait())
+    return [m.split("\n")[0] + " " + m.split("\n")[1] for m in messages]
+
+def test_events_reach_other_workers(hubs):
+    a, b = hubs
+    listener = b.subscribe()
+    a.publish("playlist", {"id": 1})
+    a.publish("track", {"id": "x"})
+    flush(a)
+    assert events(listener) == []  # Hasta la próxima lectura
+    asyncio.run(b.catch_up())
+    assert events(listener) == ["id: 1 event: playlist", "id: 2 event: track"]
+
+def test_reconnect_on_another_worker_replays_missed_events(hubs):
+    a, b = hubs
+    for i in range(3):
+        a.publish("track", {"id": i})
+    flush(a)
+    asyncio.run(a.catch_up())
+    # El cliente vio el 1 en a y se reconecta a b, que todavía no leyó nada
+    asyncio.run(b.catch_up())
+    assert events(b.subscribe(1)) == ["id: 2 event: track", "id: 3 event: track"]
+
+def test_history_survives_restart(tmp_path, hubs):
+    a, _ = hubs
+    for i in range(10):
+        a.publish("track", {"id": i})
+    flush(a)
+    c = CT.SharedEventHub(str(tmp_path / "events.sqlite3"), 16, 8, 0.1)
+    try:
+        assert events(c.subscribe(7)) == ["id: 8 event: track", "id: 9 event: track", "id: 10 event: track"]
+        assert events(c.subscribe(1)) == ["id: 10 event: reset"]  # Ya no se guarda
+    finally:
+        c.close()
+
+def test_publish_does_not_wait_for_a_locked_database(tmp_path, hubs):
+    # Otro worker escribiendo: el evento espera su turno en el hilo del hub,
+    # no en el event loop que llamó a publish
+    a, b = hubs
+    other = sqlite3.connect(str(tmp_path / "events.sqlite3"), check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.5, other.rollback).start()
+    started = time.perf_counter()
+    a.publish("track", {"id": "x"})
+    assert time.perf_counter() - started < 0.1
+    flush(a)
+    other.close()
+    assert time.perf_counter() - started >= 0.4
+    listener = b.subscribe(0)
+    asyncio.run(b.catch_up())
+    assert events(listener) == ["id: 1 event: track"]
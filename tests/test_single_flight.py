@@ -0,0 +1,52 @@
+# Varios clientes que piden el mismo video a la vez (p. ej. addVideoById y
+# playTrack compitiendo) comparten una sola extracción, también cuando falla
+import asyncio
+
+import pytest
+
+import CT
+
+VID = "flightaaaa1"
+
+def resolve_all(count: int) -> list:
+    async def run():
+        return await asyncio.gather(*(CT.resolve_audio(VID) for _ in range(count)), return_exceptions=True)
+    return asyncio.run(run())
+
+def test_concurrent_lookups_share_one_extraction(backend):
+    b = backend(latency=0.2)
+    results = resolve_all(20)
+    assert b.extractor.calls == 1
+    assert b.flight.coalesced == 19
+    assert all(r == results[0] and r["audio_url"] for r in results)
+    # Cada cliente recibe su propia copia
+    results[0]["title"] = "otro"
+    assert results[1]["title"] != "otro"
+    assert b.flight.stats()["in_flight"] == 0
+
+def test_error_reaches_every_waiter(backend):
+    b = backend(latency=0.2)
+    b.failing.add(VID)
+    results = resolve_all(10)
+    assert b.extractor.calls == 1
+    assert all(isinstance(r, CT.ExtractionError) for r in results)
+    assert b.flight.stats()["in_flight"] == 0
+    # El error no queda guardado: el próximo pedido vuelve a intentar
+    b.failing.clear()
+    assert asyncio.run(CT.resolve_audio(VID))["audio_url"]
+    assert b.extractor.calls == 2
+
+def test_cancelled_client_does_not_cancel_the_others(backend):
+    b = backend(latency=0.2)
+
+    async def run():
+        first = asyncio.ensure_future(CT.resolve_audio(VID))
+        second = asyncio.ensure_future(CT.resolve_audio(VID))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run())["audio_url"]
+    assert b.extractor.calls == 1
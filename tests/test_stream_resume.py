@@ -0,0 +1,144 @@
+# /stream contra un googlevideo falso local que corta la conexión a mitad del
+# cuerpo: la reanudación tiene que entregar exactamente los bytes del archivo
+# original, sin re-extraer por un corte de red y sin mezclar archivos.
+import asyncio, re, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import CT
+
+SIZE = 200000
+CUT = 50000
+
+class Upstream:
+    # Sirve /<nombre> con soporte de Range; cut[nombre] corta la próxima
+    # respuesta después de esos bytes y expired[nombre] responde con ese
+    # código a las reanudaciones (Range que no empieza en 0)
+    def __init__(self):
+        self.files = {}
+        self.cut = {}
+        self.expired = {}
+        self.requests = []
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                name = self.path.lstrip("/").split("?")[0]
+                upstream.requests.append((name, self.headers.get("Range")))
+                status = upstream.expired.get(name)
+                if status is not None and not (self.headers.get("Range") or "").startswith("bytes=0-"):
+                    self.send_response(status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                data = upstream.files[name]
+                start, end = 0, len(data) - 1
+                m = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+                if m:
+                    start = int(m.group(1))
+                    end = min(int(m.group(2)), end) if m.group(2) else end
+                self.send_response(206 if m else 200)
+                if m:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                self.send_header("Content-Type", "audio/webm")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                body = data[start:end + 1]
+                cut = upstream.cut.pop(name, None)
+                if cut is not None:
+                    self.wfile.write(body[:cut])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+                    return
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/{name}?expire={int(time.time()) + 3600}"
+
+class Extractor:
+    # Cada extracción devuelve la URL que diga next_url
+    def __init__(self, next_url: str):
+        self.next_url = next_url
+        self.calls = 0
+
+    def extract_audio(self, url: str) -> dict:
+        self.calls += 1
+        return {"title": "Prueba", "duration": 10, "url": self.next_url}
+
+@pytest.fixture
+def upstream():
+    server = Upstream()
+    server.files["a"] = bytes(i % 251 for i in range(SIZE))
+    server.files["b"] = bytes((i * 7) % 253 for i in range(SIZE - 50000))  # Otro archivo, otro tamaño
+    yield server
+    server.server.shutdown()
+
+def fetch(vid: str, range_header: str = "bytes=0-"):
+    async def run():
+        CT._http_client = None
+        try:
+            transport = httpx.ASGITransport(app=CT.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get(f"/stream/{vid}", headers={"Range": range_header})
+                return response.status_code, response.headers, response.content
+        finally:
+            if CT._http_client is not None:
+                await CT._http_client.aclose()
+    return asyncio.run(run())
+
+def prepare(monkeypatch, vid: str, url: str, next_url: str) -> Extractor:
+    extractor = Extractor(next_url)
+    monkeypatch.setattr(CT, "extractor", extractor)
+    CT.metadata_cache.put(vid, "Prueba", 10, url)
+    return extractor
+
+def test_cut_resumes_same_url_without_extracting(monkeypatch, upstream):
+    extractor = prepare(monkeypatch, "resumeaaaa1", upstream.url("a"), upstream.url("b"))
+    upstream.cut["a"] = CUT
+    status, headers, body = fetch("resumeaaaa1")
+    assert status == 206
+    assert int(headers["content-length"]) == SIZE
+    assert body == upstream.files["a"]
+    assert extractor.calls == 0
+    assert upstream.requests == [("a", "bytes=0-"), ("a", f"bytes={CUT}-{SIZE - 1}")]
+
+def test_expired_url_reextracts_and_resumes(monkeypatch, upstream):
+    extractor = prepare(monkeypatch, "resumeaaaa2", upstream.url("a"), upstream.url("a") + "&nueva=1")
+    upstream.cut["a"] = CUT
+    upstream.expired["a"] = 403
+    # La URL nueva también es "a": se saca el 403 al re-extraer
+    extractor.extract_audio = lambda url, extract=extractor.extract_audio: (upstream.expired.clear(), extract(url))[1]
+    status, headers, body = fetch("resumeaaaa2")
+    assert status == 206
+    assert body == upstream.files["a"]
+    assert extractor.calls == 1
+
+def test_resume_on_another_file_is_aborted(monkeypatch, upstream):
+    extractor = prepare(monkeypatch, "resumeaaaa3", upstream.url("a"), upstream.url("b"))
+    upstream.cut["a"] = CUT
+    upstream.expired["a"] = 403
+    status, headers, body = fetch("resumeaaaa3")
+    assert int(headers["content-length"]) == SIZE
+    # Sólo los bytes del archivo original, nada de "b"
+    assert body == upstream.files["a"][:CUT]
+    assert extractor.calls == 1
+
+def test_transient_error_on_resume_keeps_the_url(monkeypatch, upstream):
+    extractor = prepare(monkeypatch, "resumeaaaa4", upstream.url("a"), upstream.url("b"))
+    upstream.cut["a"] = CUT
+    upstream.expired["a"] = 503
+    status, headers, body = fetch("resumeaaaa4")
+    assert body == upstream.files["a"][:CUT]
+    assert extractor.calls == 0
+    assert CT.metadata_cache.get("resumeaaaa4")["audio_url"]
@@ -0,0 +1,92 @@
+# Renovación de URLs en segundo plano: una pista de la cola se re-extrae un
+# rato antes de que venza su URL, y un error inesperado no detiene el loop
+import asyncio, sqlite3, time
+
+import CT
+
+A, B = "refreshaaa1", "refreshaaa2"
+
+async def wait_for(condition, timeout: float = 5):
+    started = time.monotonic()
+    while not condition():
+        assert time.monotonic() - started < timeout, "no pasó a tiempo"
+        await asyncio.sleep(0.02)
+
+def test_track_is_refreshed_before_its_url_expires(backend):
+    # URL que sale de la ventana segura en 3-4 s ("expire" va en segundos
+    # enteros); con lead=2 se renueva entre 1 y 3 s después de resuelta
+    b = backend(latency=0.01, url_ttl=CT.URL_EXPIRY_MARGIN + 4)
+    refresher = CT.UrlRefresher(lead=2, interval=0.01)
+
+    async def run():
+        first = await CT.resolve_audio(A)
+        started = time.monotonic()
+        await refresher.report("pestaña", [A])
+        await wait_for(lambda: refresher.refreshed >= 1)
+        waited = time.monotonic() - started
+        refresher.close()
+        return first, waited
+
+    first, waited = asyncio.run(run())
+    assert 0.8 < waited < 3.5
+    assert b.extractor.calls == 2
+    assert refresher.failed == refresher.skipped == 0
+    assert b.metadata_cache.url_expires(A) > CT.url_expiry(first["audio_url"])
+
+def test_track_without_url_is_resolved_right_away(backend):
+    b = backend(latency=0.01)
+    refresher = CT.UrlRefresher(lead=900, interval=0.01)
+
+    async def run():
+        started = time.monotonic()
+        await refresher.report("pestaña", [B])
+        await wait_for(lambda: refresher.refreshed >= 1)
+        waited = time.monotonic() - started
+        # La URL nueva vence en horas: lo próximo queda para mucho después
+        assert refresher.stats()["next_in_seconds"] > 3600
+        refresher.close()
+        return waited
+
+    assert asyncio.run(run()) < 0.5
+    assert b.extractor.calls == 1
+
+def test_tracks_left_out_of_the_queue_are_not_refreshed(backend):
+    b = backend(latency=0.01, url_ttl=CT.URL_EXPIRY_MARGIN + 1)
+    refresher = CT.UrlRefresher(lead=1, interval=0.01)
+
+    async def run():
+        await CT.resolve_audio(A)
+        await refresher.report("pestaña", [A])
+        await refresher.report("pestaña", [])  # Ya sonó o se quitó
+        await asyncio.sleep(1.5)
+        refresher.close()
+
+    asyncio.run(run())
+    assert b.extractor.calls == 1
+    assert refresher.stats()["tracked"] == 0
+
+def test_unexpected_error_does_not_stop_the_refresher(backend, monkeypatch):
+    b = backend(latency=0.01)
+    refresher = CT.UrlRefresher(lead=1, interval=0.01)
+    url_expires = b.metadata_cache.url_expires
+    errors = []
+
+    def flaky(vid):
+        if not errors:
+            errors.append(vid)
+            raise sqlite3.OperationalError("database is locked")
+        return url_expires(vid)
+
+    async def run():
+        await refresher.report("pestaña", [A])
+        # Primera vuelta: _refresh falla antes de extraer
+        monkeypatch.setattr(b.metadata_cache, "url_expires", flaky)
+        monkeypatch.setattr(CT, "REFRESH_RETRY", 0.05)
+        refresher._wake.set()
+        await wait_for(lambda: refresher.refreshed >= 1)
+        assert not refresher._task.done()
+        refresher.close()
+
+    asyncio.run(run())
+    assert errors == [A]
+    assert b.extractor.calls == 1
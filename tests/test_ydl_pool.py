@@ -0,0 +1,54 @@
+# Búsquedas y listas de YtDlpExtractor: una instancia que falló a mitad de
+# camino no vuelve al pool; cortar el generador antes de tiempo sí la devuelve
+import pytest
+
+import CT
+
+class BrokenYDL:
+    closed = False
+
+    def __init__(self, entries=None, error=None):
+        self.entries = entries or []
+        self.error = error
+
+    def extract_info(self, url, download=False, process=True):
+        if self.error is not None:
+            raise self.error
+        return {"_type": "playlist", "entries": iter(self.entries)}
+
+    def close(self):
+        self.closed = True
+
+def extractor_with(profile, ydl):
+    extractor = CT.YtDlpExtractor(2)
+    extractor.pools[profile]._new = lambda: ydl
+    return extractor
+
+@pytest.mark.parametrize("profile", ["search", "playlist"])
+def test_failed_instance_is_discarded(profile):
+    ydl = BrokenYDL(error=RuntimeError("opener roto"))
+    extractor = extractor_with(profile, ydl)
+    gen = extractor.search("q", 5) if profile == "search" else extractor.playlist("https://www.youtube.com/playlist?list=PLx")
+    with pytest.raises(RuntimeError):
+        next(gen)
+    assert ydl.closed
+    assert extractor.pools[profile].stats()["idle"] == 0
+    assert extractor.pools[profile].stats()["discarded"] == 1
+
+def test_video_error_keeps_instance():
+    ydl = BrokenYDL(error=CT.load_yt_dlp().utils.DownloadError("privado"))
+    extractor = extractor_with("search", ydl)
+    with pytest.raises(CT.load_yt_dlp().utils.DownloadError):
+        next(extractor.search("q", 5))
+    assert not ydl.closed
+    assert extractor.pools["search"].stats()["idle"] == 1
+
+@pytest.mark.parametrize("profile", ["search", "playlist"])
+def test_closed_generator_returns_instance(profile):
+    ydl = BrokenYDL(entries=[{"id": str(i)} for i in range(10)])
+    extractor = extractor_with(profile, ydl)
+    gen = extractor.search("q", 5) if profile == "search" else extractor.playlist("https://www.youtube.com/playlist?list=PLx")
+    assert next(gen) == {"id": "0"}
+    gen.close()
+    assert not ydl.closed
+    assert extractor.pools[profile].stats()["idle"] == 1